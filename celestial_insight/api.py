@@ -2,8 +2,16 @@ from ninja_extra import NinjaExtraAPI
 
 from mentors.api import AsyncMentorController
 from tarot.api import AsyncTarotController
+from tarot.llm_scheduler import LLMOverloadedError
 from users.api import UsersController
 
 api = NinjaExtraAPI(urls_namespace="main_api")
 
 api.register_controllers(UsersController, AsyncTarotController, AsyncMentorController)
+
+
+@api.exception_handler(LLMOverloadedError)
+def llm_overloaded(request, exc: LLMOverloadedError):
+    response = api.create_response(request, {"detail": str(exc)}, status=exc.status_code)
+    response["Retry-After"] = str(exc.retry_after)
+    return response
@@ -0,0 +1,36 @@
+from collections.abc import Callable, Iterator
+
+from django.db.models import Model, QuerySet
+
+BULK_CHUNK_SIZE = 500
+
+
+def iter_chunks(queryset: QuerySet, chunk_size: int = BULK_CHUNK_SIZE) -> Iterator[list[Model]]:
+    """
+    Yield `queryset` as lists of at most `chunk_size` objects, walking the primary key.
+
+    Each chunk is a separate indexed query, so memory stays flat and the rows can be
+    updated between chunks (unlike while a server-side cursor is open).
+    """
+    queryset = queryset.order_by("pk")
+    chunk = list(queryset[:chunk_size])
+    while chunk:
+        yield chunk
+        chunk = list(queryset.filter(pk__gt=chunk[-1].pk)[:chunk_size])
+
+
+def bulk_update_chunked(
+    queryset: QuerySet, fields: list[str], update: Callable[[Model], None], chunk_size: int = BULK_CHUNK_SIZE
+) -> int:
+    """
+    Apply `update(obj)` to every object of `queryset` and save `fields` with one `bulk_update` per chunk.
+
+    Returns the number of updated rows. Like `bulk_update`, this neither calls `save()` nor
+    sends model signals, so callers invalidate whatever caches those would have.
+    """
+    updated = 0
+    for chunk in iter_chunks(queryset, chunk_size):
+        for obj in chunk:
+            update(obj)
+        updated += queryset.model.objects.bulk_update(chunk, fields)
+    return updated
@@ -0,0 +1,133 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.http import HttpRequest, HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+
+# Cache alias of the version stamps, kept apart from the culled entries (see `CACHES`)
+VERSIONS_CACHE = "versions"
+
+# Aliases whose entries every process must see: the version stamps and the `/users/me` snapshots
+SHARED_CACHES = ("default", VERSIONS_CACHE, "profiles")
+
+# Backends whose entries only the process that wrote them can see
+PROCESS_LOCAL_CACHES = frozenset(
+    {"django.core.cache.backends.locmem.LocMemCache", "django.core.cache.backends.dummy.DummyCache"}
+)
+
+
+def check_shared_cache(app_configs, **kwargs) -> list[checks.CheckMessage]:
+    """
+    The version stamps below invalidate process-local snapshots in every process, which only
+    works when they are stored in a cache all processes share.
+    """
+    backends = {settings.CACHES[alias]["BACKEND"] for alias in SHARED_CACHES}
+    if not backends & PROCESS_LOCAL_CACHES:
+        return []
+    backend = ", ".join(sorted(backends & PROCESS_LOCAL_CACHES))
+    msg = f"The cache backend ({backend}) is not shared between processes."
+    hint = "Use a shared backend such as DatabaseCache or RedisCache (CACHE_BACKEND)."
+    if settings.WEB_CONCURRENCY > 1:
+        return [checks.Error(msg, hint=f"WEB_CONCURRENCY is {settings.WEB_CONCURRENCY}. {hint}", id="caching.E001")]
+    return [
+        checks.Warning(
+            msg,
+            hint=f"Catalog, mentor and profile changes made by the admin or run_insight_worker go unseen. {hint}",
+            id="caching.W001",
+        )
+    ]
+
+
+def new_version() -> str:
+    return f"{time.time_ns():x}"
+
+
+# Version stamps this process read last, with the `time.monotonic()` of the read
+_stamps: dict[str, tuple[str, float]] = {}
+
+
+def _remembered_version(key: str) -> str | None:
+    stamp = _stamps.get(key)
+    if stamp is not None and time.monotonic() - stamp[1] < settings.VERSION_STAMP_MAX_AGE:
+        return stamp[0]
+    return None
+
+
+def _remember_version(key: str, version: str) -> str:
+    _stamps[key] = (version, time.monotonic())
+    return version
+
+
+def get_version(key: str) -> str:
+    """
+    Return the version stamp stored under `key`, creating one if the cache has none.
+
+    The shared stamp is read at most every `VERSION_STAMP_MAX_AGE` seconds per process.
+    """
+    version = _remembered_version(key)
+    if version is not None:
+        return version
+    stamps = caches[VERSIONS_CACHE]
+    version = stamps.get(key)
+    if version is None:
+        stamps.add(key, new_version(), timeout=None)
+        version = stamps.get(key)
+    return _remember_version(key, version)
+
+
+async def aget_version(key: str) -> str:
+    version = _remembered_version(key)
+    if version is not None:
+        return version
+    stamps = caches[VERSIONS_CACHE]
+    version = await stamps.aget(key)
+    if version is None:
+        await stamps.aadd(key, new_version(), timeout=None)
+        version = await stamps.aget(key)
+    return _remember_version(key, version)
+
+
+def bump_version(key: str) -> str:
+    """Replace the version stamp under `key`, invalidating everything derived from the old one."""
+    version = new_version()
+    caches[VERSIONS_CACHE].set(key, version, timeout=None)
+    return _remember_version(key, version)
+
+
+def make_etag(*parts) -> str:
+    """
+    Build a strong ETag from the parts that fully determine a response body.
+
+    Versions among the parts must be shared stamps (`get_version`), so every process gives the
+    same response the same ETag and none keeps confirming one that is out of date.
+    """
+    digest = hashlib.blake2b("\x1f".join(map(str, parts)).encode(), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+def conditional_response(
+    request: HttpRequest, response: HttpResponse, etag: str, max_age: int | None = None
+) -> HttpResponseNotModified | None:
+    """
+    Answer `If-None-Match` for a cacheable GET endpoint.
+
+    Returns a `304 Not Modified` when the client already holds `etag`, otherwise sets
+    the `ETag` and `Cache-Control` headers on the pending response and returns None.
+    """
+    if max_age is None:
+        max_age = settings.CATALOG_CACHE_MAX_AGE
+
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in parse_etags(if_none_match)):
+        response = HttpResponseNotModified()
+        not_modified = True
+    else:
+        not_modified = False
+
+    response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=max_age, must_revalidate=True)
+    return response if not_modified else None
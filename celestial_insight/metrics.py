@@ -0,0 +1,10 @@
+import math
+from collections.abc import Iterable
+
+
+def percentile(values: Iterable[float], pct: float) -> float:
+    """Nearest-rank percentile of `values`."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[max(math.ceil(pct / 100 * len(ordered)) - 1, 0)]
@@ -120,12 +120,131 @@ WSGI_APPLICATION = "celestial_insight.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
+# DATABASE_ENGINE selects the backend: "sqlite" (default) or "postgresql"
+DATABASE_ENGINE = os.getenv("DATABASE_ENGINE", "sqlite")
+
+if DATABASE_ENGINE == "postgresql":
+    # Async views run the ORM in a thread pool, where persistent per-thread connections pile
+    # up; with the psycopg pool, closing a connection at the end of a request returns it to
+    # the pool instead. Pooling requires CONN_MAX_AGE = 0, so persistent connections (with
+    # health checks) are only used when the pool is disabled with DATABASE_POOL_MAX_SIZE=0.
+    DATABASE_POOL_MIN_SIZE = int(os.getenv("DATABASE_POOL_MIN_SIZE", "2"))
+    DATABASE_POOL_MAX_SIZE = int(os.getenv("DATABASE_POOL_MAX_SIZE", "20"))
+    DATABASE_POOL_TIMEOUT = float(os.getenv("DATABASE_POOL_TIMEOUT", "10"))  # Seconds to wait for a free connection
+
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.getenv("POSTGRES_DB", "celestial_insight"),
+            "USER": os.getenv("POSTGRES_USER", "postgres"),
+            "PASSWORD": os.getenv("POSTGRES_PASSWORD", ""),
+            "HOST": os.getenv("POSTGRES_HOST", "localhost"),
+            "PORT": os.getenv("POSTGRES_PORT", "5432"),
+            "CONN_MAX_AGE": 0 if DATABASE_POOL_MAX_SIZE else int(os.getenv("CONN_MAX_AGE", "60")),
+            "CONN_HEALTH_CHECKS": True,  # With the pool, connections are checked on checkout
+            "OPTIONS": {
+                "pool": {
+                    "min_size": DATABASE_POOL_MIN_SIZE,
+                    "max_size": DATABASE_POOL_MAX_SIZE,
+                    "timeout": DATABASE_POOL_TIMEOUT,
+                    "max_idle": 300,
+                }
+                if DATABASE_POOL_MAX_SIZE
+                else False,
+            },
+        },
+    }
+    if os.getenv("POSTGRES_REPLICA_HOST"):
+        DATABASES["replica"] = {
+            **DATABASES["default"],
+            "HOST": os.getenv("POSTGRES_REPLICA_HOST"),
+            "PORT": os.getenv("POSTGRES_REPLICA_PORT", DATABASES["default"]["PORT"]),
+            "TEST": {"MIRROR": "default"},
+        }
+else:
+    # Single-node SQLite profile. In WAL mode readers no longer block the writer (and vice
+    # versa), and synchronous=NORMAL only risks the last commits on power loss, not corruption.
+    # IMMEDIATE transactions take the write lock upfront, so concurrent writers wait up to
+    # SQLITE_BUSY_TIMEOUT seconds instead of failing with "database is locked" mid-transaction.
+    SQLITE_PRAGMAS = (
+        "PRAGMA journal_mode=WAL;"
+        "PRAGMA synchronous=NORMAL;"
+        "PRAGMA mmap_size=268435456;"  # 256 MiB
+        "PRAGMA cache_size=-65536;"  # 64 MiB (negative values are KiB)
+        "PRAGMA temp_store=MEMORY;"
+    )
+    SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "20"))
+
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "db.sqlite3",
+            "OPTIONS": {
+                "init_command": SQLITE_PRAGMAS,
+                "transaction_mode": "IMMEDIATE",
+                "timeout": SQLITE_BUSY_TIMEOUT,
+            },
+        },
+        # The same file on read-only connections, for the endpoints routed by `ReadReplicaRouter`
+        "replica": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / "db.sqlite3",
+            "OPTIONS": {
+                "init_command": SQLITE_PRAGMAS + "PRAGMA query_only=ON;",
+                "timeout": SQLITE_BUSY_TIMEOUT,
+            },
+            "TEST": {"MIRROR": "default"},
+        },
+    }
+
+# Read-only endpoints marked with `replica_reads` query the "replica" alias when it is configured
+DATABASE_ROUTERS = ["celestial_insight.db.ReadReplicaRouter"]
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+# The version stamps of the card catalog and the mentor directory, the ETags derived from them and the
+# `/users/me` snapshots must be seen by every process (uvicorn workers, the admin, run_insight_worker),
+# so the default is the database cache (`manage.py createcachetable`); CACHE_BACKEND and CACHE_LOCATION
+# select another shared backend, e.g. django.core.cache.backends.redis.RedisCache and redis://host:6379
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "django.core.cache.backends.db.DatabaseCache")
+CACHE_LOCATION = os.getenv("CACHE_LOCATION", "django_cache")
+
+# The database cache keeps each alias below in a table of its own, other backends share CACHE_LOCATION
+_database_cache = CACHE_BACKEND == "django.core.cache.backends.db.DatabaseCache"
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": CACHE_LOCATION,
+    },
+    # Only the handful of version stamps, which never expire: the database cache culls a table once it
+    # holds MAX_ENTRIES rows, which a table of their own never reaches (on Redis, avoid allkeys-* eviction)
+    "versions": {
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": "django_cache_versions" if _database_cache else CACHE_LOCATION,
+        "KEY_PREFIX": "versions",
+        "TIMEOUT": None,
+    },
+    # The `/users/me` snapshots, one per active user, culled and expired on their own
+    "profiles": {
+        "BACKEND": CACHE_BACKEND,
+        "LOCATION": "django_cache_profiles" if _database_cache else CACHE_LOCATION,
+        "KEY_PREFIX": "profiles",
+    },
+    # django-admin-interface reads its theme a dozen times per admin page; a theme edit shows in the
+    # other processes once their copy expires (TIMEOUT, 5 minutes)
+    "admin_interface": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "admin_interface",
     },
 }
+# Seconds a process keeps serving a version stamp before it reads the shared one again, so the
+# catalog and the mentor directory stay in memory on the hot path; an invalidation made by another
+# process is noticed at most this late
+VERSION_STAMP_MAX_AGE = float(os.getenv("VERSION_STAMP_MAX_AGE", "1"))
+# Worker processes uvicorn is started with (it reads the same variable); a process-local cache
+# backend is rejected by `manage.py check` when there is more than one
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -193,11 +312,58 @@ STATIC_URL = "static/"
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+TEST_RUNNER = "celestial_insight.test_runner.TestRunner"
+
 X_FRAME_OPTIONS = "SAMEORIGIN"
 SILENCED_SYSTEM_CHECKS = ["security.W019"]
 
 NINJA_EXTRA = {"THROTTLE_RATES": {"burst": "6/min", "sustained": "100/day"}}
 
+# Seconds clients may reuse catalog responses (cards, mentors) before revalidating with If-None-Match
+CATALOG_CACHE_MAX_AGE = int(os.getenv("CATALOG_CACHE_MAX_AGE", "60"))
+
+# Cache of question validation results; set the backend to an empty string to disable it
+VALIDATION_CACHE_BACKEND = os.getenv("VALIDATION_CACHE_BACKEND", "tarot.validation_cache.MemoryValidationCache")
+VALIDATION_CACHE_TTL = int(os.getenv("VALIDATION_CACHE_TTL", str(60 * 60 * 24)))
+VALIDATION_CACHE_MAX_ENTRIES = int(os.getenv("VALIDATION_CACHE_MAX_ENTRIES", "10000"))
+
+# Seconds a `/users/me` snapshot is served from the cache; token and profile changes invalidate it earlier
+PROFILE_SNAPSHOT_TTL = int(os.getenv("PROFILE_SNAPSHOT_TTL", "30"))
+
+# How many questions are decided without the support agent: off, reject, balanced or aggressive
+QUESTION_PREVALIDATION = os.getenv("QUESTION_PREVALIDATION", "balanced")
+
+# Model behind each tier, as "<provider>:<model>"; tarot.model_router picks a tier per agent run
+LLM_MODEL_TIERS = {
+    "fast": os.getenv("LLM_MODEL_FAST", "openai:gpt-4o-mini"),
+    "standard": os.getenv("LLM_MODEL_STANDARD", "openai:gpt-4o"),
+    "premium": os.getenv("LLM_MODEL_PREMIUM", "openai:gpt-4o"),
+}
+# Tiers of the question validation and of insights not routed to a faster or stronger one
+VALIDATION_MODEL_TIER = os.getenv("VALIDATION_MODEL_TIER", "fast")
+INSIGHT_MODEL_TIER = os.getenv("INSIGHT_MODEL_TIER", "standard")
+# Tiers tried in order when a tier's model call fails
+LLM_TIER_FALLBACKS = {
+    "fast": ["standard"],
+    "standard": ["fast"],
+    "premium": ["standard", "fast"],
+}
+
+# Agent runs in flight per process; the rest wait in a queue served round-robin per user, and are
+# turned away with 429 (user's share full) or 503 (queue full, or no slot within the timeout)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_QUEUE_MAX_SIZE = int(os.getenv("LLM_QUEUE_MAX_SIZE", "64"))
+LLM_QUEUE_MAX_PER_USER = int(os.getenv("LLM_QUEUE_MAX_PER_USER", "4"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "20"))
+
+# Hedged insight runs: a run slower than the LLM_HEDGE_PERCENTILE latency of the latest runs on its tier
+# gets a second, identical request (once LLM_HEDGE_MIN_SAMPLES runs were timed). The first answer wins;
+# at most LLM_HEDGE_BUDGET of the runs are hedged, which caps the extra spend
+LLM_HEDGING = os.getenv("LLM_HEDGING", "false").lower() == "true"
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LLM_HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "0.1"))
+
 AUTH_USER_MODEL = "auth.User"
 
 HEADLESS_ONLY = True
@@ -3,6 +3,9 @@ from django.db.models import Count, Q
 from django.utils.html import mark_safe
 from django.utils.text import slugify
 
+from celestial_insight.bulk import bulk_update_chunked
+
+from .cache import invalidate_mentors
 from .models import Mentor
 
 
@@ -51,12 +54,12 @@ class MentorAdmin(admin.ModelAdmin):
     @admin.action(description="Populate empty slugs for selected mentors")
     def populate_empty_slugs(self, request, queryset):
         # Filter only mentors with empty slug
-        mentors_to_update = queryset.filter(Q(slug__isnull=False) | Q(slug__exact=""))
-        updated_count = 0
-        for mentor in mentors_to_update:
-            mentor.slug = slugify(mentor.name)
-            mentor.save()
-            updated_count += 1
+        mentors_to_update = queryset.filter(Q(slug__isnull=True) | Q(slug__exact="")).only("id", "name", "slug")
+        updated_count = bulk_update_chunked(
+            mentors_to_update, ["slug"], lambda mentor: setattr(mentor, "slug", slugify(mentor.name))
+        )
+        if updated_count:
+            invalidate_mentors()  # bulk_update skips the post_save signal
         self.message_user(
             request, f"Successfully populated {updated_count} slugs)", level="success" if updated_count else "warning"
         )
@@ -78,5 +81,5 @@ class MentorAdmin(admin.ModelAdmin):
         ordering="preferred_by_count",
     )
     def preferred_by_count(self, obj):
-        """Count profiles that prefer this mentor."""
-        return obj.preferred_by_profiles.count()
+        """Count profiles that prefer this mentor (annotated in `get_queryset`)."""
+        return obj.preferred_by_count
@@ -1,8 +1,11 @@
 from django.shortcuts import aget_object_or_404
 from ninja_extra import NinjaExtraAPI, api_controller, http_get, http_post, permissions
 
-from mentors.models import Mentor
-from mentors.schemas import MentorDetailSchema, MentorSchema
+from celestial_insight.caching import conditional_response, make_etag
+from celestial_insight.db import replica_reads
+from mentors import cache as mentor_cache
+from mentors.cache import aget_mentor, aget_mentor_directory, aget_mentors_version
+from mentors.schemas import MentorCacheStatsSchema, MentorDetailSchema, MentorSchema
 from users.models import UserProfile
 
 api = NinjaExtraAPI()
@@ -11,29 +14,51 @@ api = NinjaExtraAPI()
 @api_controller("/mentors", tags=["Mentors"], permissions=[permissions.IsAuthenticatedOrReadOnly])
 class AsyncMentorController:
     @http_get("/", response=list[MentorSchema])
-    async def list_mentors(self, is_active: bool | None = None):
+    @replica_reads
+    async def list_mentors(self, request, is_active: bool | None = None):
         """
         List mentors with optional filters for `is_active`.
         """
-        mentors = Mentor.objects.all()
-        if is_active is not None:
-            mentors = mentors.filter(is_active=is_active)
+        etag = make_etag("mentors", await aget_mentors_version(), is_active)
+        if not_modified := conditional_response(request, self.context.response, etag):
+            return not_modified
 
-        return mentors
+        directory = await aget_mentor_directory()
+        return directory.filter(is_active)
 
     @http_get("/{mentor_slug}", response=MentorDetailSchema)
-    async def get_mentor(self, mentor_slug: str):
+    @replica_reads
+    async def get_mentor(self, request, mentor_slug: str):
         """
         Retrieve details of a single mentor by slug field.
         """
-        return await aget_object_or_404(Mentor, slug=mentor_slug)
+        etag = make_etag("mentor", await aget_mentors_version(), mentor_slug)
+        if not_modified := conditional_response(request, self.context.response, etag):
+            return not_modified
+
+        return await aget_mentor(slug=mentor_slug)
+
+    @http_get("/cache/stats", response=MentorCacheStatsSchema, permissions=[permissions.IsAdminUser])
+    async def get_cache_stats(self, request):
+        """
+        Hit rate of the mentor directory cache of this process.
+        """
+        directory = await aget_mentor_directory()
+        stats = mentor_cache.stats
+        return {
+            "entries": len(directory.mentors),
+            "hits": stats.hits,
+            "misses": stats.misses,
+            "loads": stats.loads,
+            "hit_rate": stats.hit_rate,
+        }
 
     @http_post("/{mentor_slug}", response=MentorDetailSchema)
     async def pick_mentor(self, request, mentor_slug: str):
         """
         Pick preferred mentor by slug field.
         """
-        mentor = await aget_object_or_404(Mentor, slug=mentor_slug)
+        mentor = await aget_mentor(slug=mentor_slug)
         user_profile = await aget_object_or_404(UserProfile, user=request.user)
         user_profile.preferred_mentor = mentor
         await user_profile.asave()
@@ -0,0 +1,111 @@
+import threading
+from dataclasses import dataclass
+
+from asgiref.sync import sync_to_async
+from django.http import Http404
+
+from celestial_insight.caching import aget_version, bump_version, get_version
+from celestial_insight.db import read_primary
+
+from .models import Mentor
+
+MENTORS_VERSION_CACHE_KEY = "mentors:version"
+
+
+@dataclass
+class MentorCacheStats:
+    hits: int = 0  # Lookups served from the loaded directory
+    misses: int = 0  # Lookups that had to (re)load it from the database
+    loads: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class MentorDirectory:
+    """
+    Snapshot of every mentor, indexed by id and slug and split by `is_active`.
+
+    The instances are shared by all requests of the process and must be treated as read-only.
+    """
+
+    __slots__ = ("active", "by_id", "by_slug", "inactive", "mentors", "version")
+
+    def __init__(self, mentors: tuple[Mentor, ...], version: str):
+        self.version = version
+        self.mentors = mentors
+        self.by_id = {mentor.id: mentor for mentor in mentors}
+        self.by_slug = {mentor.slug: mentor for mentor in mentors}
+        self.active = tuple(mentor for mentor in mentors if mentor.is_active)
+        self.inactive = tuple(mentor for mentor in mentors if not mentor.is_active)
+
+    def filter(self, is_active: bool | None = None) -> tuple[Mentor, ...]:
+        if is_active is None:
+            return self.mentors
+        return self.active if is_active else self.inactive
+
+    def get(self, *, mentor_id: int | None = None, slug: str | None = None) -> Mentor:
+        """Return the mentor with the given id or slug or raise Http404."""
+        mentor = self.by_id.get(mentor_id) if slug is None else self.by_slug.get(slug)
+        if mentor is None:
+            msg = "No Mentor matches the given query."
+            raise Http404(msg)
+        return mentor
+
+
+stats = MentorCacheStats()
+_directory: MentorDirectory | None = None
+_directory_lock = threading.Lock()
+
+
+async def aget_mentors_version() -> str:
+    """Version stamp of the mentor directory; changes whenever any mentor is saved or deleted."""
+    return await aget_version(MENTORS_VERSION_CACHE_KEY)
+
+
+def get_mentor_directory() -> MentorDirectory:
+    """
+    Return the process-local mentor directory, loading all mentors in one query when the
+    shared version stamp has moved.
+    """
+    global _directory  # noqa: PLW0603
+
+    version = get_version(MENTORS_VERSION_CACHE_KEY)
+    directory = _directory
+    if directory is not None and directory.version == version:
+        stats.hits += 1
+        return directory
+
+    stats.misses += 1
+    with _directory_lock:
+        if _directory is None or _directory.version != version:
+            with read_primary():
+                _directory = MentorDirectory(tuple(Mentor.objects.order_by("id")), version)
+            stats.loads += 1
+        return _directory
+
+
+async def aget_mentor_directory() -> MentorDirectory:
+    """Async variant of `get_mentor_directory`; a reload runs in a worker thread."""
+    version = await aget_mentors_version()
+    directory = _directory
+    if directory is not None and directory.version == version:
+        stats.hits += 1
+        return directory
+    return await sync_to_async(get_mentor_directory)()
+
+
+async def aget_mentor(*, mentor_id: int | None = None, slug: str | None = None) -> Mentor:
+    """Cached replacement for `aget_object_or_404(Mentor, ...)` by id or slug."""
+    directory = await aget_mentor_directory()
+    return directory.get(mentor_id=mentor_id, slug=slug)
+
+
+def invalidate_mentors() -> None:
+    """Drop the local directory and bump the shared version stamp so every worker reloads on next access."""
+    global _directory  # noqa: PLW0603
+
+    bump_version(MENTORS_VERSION_CACHE_KEY)
+    _directory = None
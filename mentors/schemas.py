@@ -17,3 +17,11 @@ class MentorSchema(Schema):
 class MentorDetailSchema(MentorSchema):
     created_at: datetime
     updated_at: datetime
+
+
+class MentorCacheStatsSchema(Schema):
+    entries: int
+    hits: int
+    misses: int
+    loads: int
+    hit_rate: float
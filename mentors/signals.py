@@ -0,0 +1,11 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_mentors
+from .models import Mentor
+
+
+@receiver([post_save, post_delete], sender=Mentor)
+def invalidate_mentor_directory(sender, **kwargs):
+    transaction.on_commit(invalidate_mentors, using=kwargs.get("using"))
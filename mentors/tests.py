@@ -1 +1,107 @@
-# Create your tests here.
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from celestial_insight.bulk import BULK_CHUNK_SIZE
+from celestial_insight.db import read_replica
+from users.models import UserProfile
+
+from . import cache as mentor_cache
+from .cache import get_mentor_directory, invalidate_mentors
+from .models import Mentor
+
+
+class MentorDirectoryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username="admin")
+        cls.zora = Mentor.objects.create(name="Madame Zora", mystical_level=5)
+        cls.sage = Mentor.objects.create(name="Old Sage", mystical_level=1)
+        Mentor.objects.filter(id=cls.sage.id).update(slug="")
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def hold_stale_directory(self, directory) -> None:
+        # Another process only sees the shared stamp move; its directory is still loaded
+        mentor_cache._directory = directory
+
+    def test_admin_edit_invalidates_the_directory_of_every_process(self):
+        stale = get_mentor_directory()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f"/admin/mentors/mentor/{self.zora.id}/change/",
+                {"name": "Madame Zora", "mystical_level": 9, "specialization": "", "avatar_url": "", "is_active": ""},
+            )
+        assert response.status_code == 302
+        self.hold_stale_directory(stale)
+
+        directory = get_mentor_directory()
+        assert directory is not stale
+        assert directory.get(mentor_id=self.zora.id).mystical_level == 9
+        assert directory.filter(is_active=True) == (directory.get(mentor_id=self.sage.id),)
+
+    def test_admin_bulk_action_invalidates_the_directory(self):
+        stale = get_mentor_directory()
+
+        self.client.post(
+            "/admin/mentors/mentor/",
+            {"action": "populate_empty_slugs", "_selected_action": [self.sage.id]},
+        )
+        self.hold_stale_directory(stale)
+
+        assert get_mentor_directory().get(slug="old-sage") == self.sage
+
+    def test_directory_is_loaded_from_the_primary(self):
+        invalidate_mentors()
+
+        # Only the default alias is available to the test: a query on the replica would fail it
+        with read_replica():
+            directory = get_mentor_directory()
+
+        assert directory.get(mentor_id=self.zora.id) == self.zora
+
+    def test_directory_is_reused_while_the_stamp_holds(self):
+        assert get_mentor_directory() is get_mentor_directory()
+
+
+class MentorAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username="admin")
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_changelist_queries_do_not_grow_with_the_mentors(self):
+        mentor = Mentor.objects.create(name="Mentor 0", mystical_level=0)
+        UserProfile.objects.filter(user=self.admin).update(preferred_mentor=mentor)
+        self.client.get(
+            "/admin/mentors/mentor/"
+        )  # Loads what later requests take from a cache, such as the admin theme
+        with CaptureQueriesContext(connections["default"]) as one_row:
+            self.client.get("/admin/mentors/mentor/")
+        Mentor.objects.bulk_create(Mentor(name=f"Mentor {index}", mystical_level=index) for index in range(1, 5))
+
+        with self.assertNumQueries(len(one_row)):
+            response = self.client.get("/admin/mentors/mentor/")
+        assert response.context["cl"].result_count == 5
+
+    def test_slug_action_writes_in_chunks(self):
+        Mentor.objects.bulk_create(
+            Mentor(name=f"Mentor {index}", mystical_level=1) for index in range(BULK_CHUNK_SIZE + 1)
+        )
+        Mentor.objects.update(slug="")
+
+        with mock.patch.object(Mentor.objects, "bulk_update", wraps=Mentor.objects.bulk_update) as bulk_update:
+            self.client.post(
+                "/admin/mentors/mentor/",
+                {"action": "populate_empty_slugs", "select_across": 1, "_selected_action": [0]},
+            )
+
+        assert [len(call.args[0]) for call in bulk_update.call_args_list] == [BULK_CHUNK_SIZE, 1]
+        assert not Mentor.objects.filter(slug="").exists()
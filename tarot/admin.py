@@ -1,28 +1,37 @@
-import csv
 import random
 
 from django.contrib import admin
 from django.db import models
 from django.db.models import Q
 from django.forms import Textarea, TextInput
-from django.http import HttpResponse
 from django.urls import reverse
 from django.utils.html import format_html
 from django.utils.text import slugify
 from django.utils.translation import gettext as _
 
+from celestial_insight.bulk import bulk_update_chunked
 from mentors.models import Mentor
 
-from .models import Card, Reading, ReadingCard
+from .catalog import get_catalog, invalidate_catalog
+from .enums import ReadingStatusEnum
+from .exports import export_response, stream_readings_csv, stream_readings_ndjson
+from .models import Card, HedgeUsage, InsightJob, Reading, ReadingCard
 
 MAX_QUESTION_LENGTH = 25
 
+STATUS_COLORS = {
+    ReadingStatusEnum.COMPLETED: "green",
+    ReadingStatusEnum.VALIDATED: "orange",
+    ReadingStatusEnum.FAILED: "red",
+}
+
 
 @admin.register(Card)
 class CardAdmin(admin.ModelAdmin):
     list_display = ("name", "suit", "number", "keyword_links")
     search_fields = ("name", "keywords", "description")
     list_filter = ("suit",)
+    list_select_related = ("suit",)
     ordering = ("suit", "number")
     readonly_fields = (
         "slug",
@@ -40,7 +49,7 @@ class CardAdmin(admin.ModelAdmin):
         if obj.image:
             return format_html(
                 '<img src="{}" style="max-height: 150px;"/>',
-                obj.image.url,
+                obj.thumbnail or obj.image.url,
             )
         return "No image"
 
@@ -65,13 +74,14 @@ class CardAdmin(admin.ModelAdmin):
     @admin.action(description="Populate empty slugs for selected cards")
     def populate_empty_slugs(self, request, queryset):
         # Filter only cards with empty slug
-        cards_to_update = queryset.filter(Q(slug__isnull=False) | Q(slug__exact=""))
-        updated_count = 0
-
-        for card in cards_to_update:
-            card.slug = slugify(card.name)
-            card.save()
-            updated_count += 1
+        cards_to_update = (
+            queryset.filter(Q(slug__isnull=True) | Q(slug__exact="")).select_related(None).only("id", "name", "slug")
+        )
+        updated_count = bulk_update_chunked(
+            cards_to_update, ["slug"], lambda card: setattr(card, "slug", slugify(card.name))
+        )
+        if updated_count:
+            invalidate_catalog()  # bulk_update skips the post_save signal
 
         self.message_user(
             request,
@@ -82,15 +92,17 @@ class CardAdmin(admin.ModelAdmin):
 
 @admin.action(description="Export selected readings to CSV")
 def export_readings_to_csv(modeladmin, request, queryset):
-    response = HttpResponse(content_type="text/csv")
-    response["Content-Disposition"] = 'attachment; filename="readings.csv"'
+    return export_response(stream_readings_csv(queryset), "text/csv", "readings.csv")
 
-    writer = csv.writer(response)
-    writer.writerow(["Date", "Question", "Notes", "Reading Type"])
-    for reading in queryset:
-        writer.writerow([reading.date, reading.question, reading.notes, reading.reading_type])
 
-    return response
+@admin.action(description="Export selected readings with their cards to CSV")
+def export_readings_with_cards_to_csv(modeladmin, request, queryset):
+    return export_response(stream_readings_csv(queryset, with_cards=True), "text/csv", "readings.csv")
+
+
+@admin.action(description="Export selected readings with their cards to NDJSON")
+def export_readings_to_ndjson(modeladmin, request, queryset):
+    return export_response(stream_readings_ndjson(queryset, with_cards=True), "application/x-ndjson", "readings.ndjson")
 
 
 class ReadingCardInline(admin.TabularInline):
@@ -103,6 +115,20 @@ class ReadingCardInline(admin.TabularInline):
         models.TextField: {"widget": Textarea(attrs={"rows": 3, "style": "width: 95%;"})},
     }
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("card")
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name == "card":
+            # Build the card options once per form from the catalog; otherwise every inline
+            # row re-runs the card query (and a suit query per option for the labels)
+            formfield.choices = [
+                ("", "---------"),
+                *((card.id, f"{card.name} ({card.suit.name})") for card in get_catalog().cards),
+            ]
+        return formfield
+
     def get_extra(self, request, obj=None, **kwargs):
         """
         Dynamically calculate the number of empty rows to display.
@@ -115,19 +141,25 @@ class ReadingCardInline(admin.TabularInline):
 
 @admin.register(Reading)
 class ReadingAdmin(admin.ModelAdmin):
-    list_display = ("id", "date", "mentor", "theme_in_notes", "reading_type", "progress_status")
+    list_display = ("id", "date", "mentor", "theme", "reading_type", "progress_status")
     search_fields = ("question", "notes", "reading_type")
-    list_filter = ("date", "mentor", "reading_type")
+    list_filter = ("status", "date", "mentor", "reading_type", "theme")
+    list_select_related = ("mentor", "user")  # `Reading.__str__` (the row checkbox label) shows the user
     ordering = ("-date",)
-    actions = ["assign_random_mentor", export_readings_to_csv]
+    actions = [
+        "assign_random_mentor",
+        export_readings_to_csv,
+        export_readings_with_cards_to_csv,
+        export_readings_to_ndjson,
+    ]
     inlines = [ReadingCardInline]
-    readonly_fields = ("date", "theme_in_notes")
+    readonly_fields = ("date", "status")
     fieldsets = (
-        ("Basic Information", {"fields": ("date", "mentor", "reading_type")}),
+        ("Basic Information", {"fields": ("date", "status", "mentor", "reading_type")}),
         (
             "Reading Details",
             {
-                "fields": ("question", "notes", "theme_in_notes", "celestial_insight"),
+                "fields": ("question", "theme", "notes", "celestial_insight"),
             },
         ),
     )
@@ -135,33 +167,46 @@ class ReadingAdmin(admin.ModelAdmin):
     @admin.action(description=_("Assign random mentor to selected readings"))
     def assign_random_mentor(self, request, queryset):
         # Get all active mentors
-        mentors = list(Mentor.objects.filter(active=True))
+        mentors = list(Mentor.objects.filter(is_active=True))
         if not mentors:
             self.message_user(request, _("No mentors available to assign."), level="error")
             return
 
-        updated_count = 0
-        for reading in queryset:
-            if reading.mentor is None:  # Only assign if no mentor is set
-                reading.mentor = random.choice(mentors)  # noqa: S311
-                reading.save()
-                updated_count += 1
+        # Only assign if no mentor is set
+        updated_count = bulk_update_chunked(
+            queryset.filter(mentor__isnull=True).select_related(None).only("id", "mentor"),
+            ["mentor"],
+            lambda reading: setattr(reading, "mentor", random.choice(mentors)),  # noqa: S311
+        )
 
         if updated_count:
             self.message_user(request, _(f"Random mentors assigned to {updated_count} readings."), level="success")  # noqa: INT001
         else:
             self.message_user(request, _("No readings needed a mentor."), level="info")
 
-    @admin.display(description="Theme in Notes")
-    def theme_in_notes(self, obj):
-        if "Theme:" in obj.notes:
-            return obj.notes.split("Theme:", 1)[1].strip().capitalize()
-        return "No theme detected"
-
-    @admin.display(description="Progress Status")
+    @admin.display(description="Progress Status", ordering="status")
     def progress_status(self, obj):
-        if obj.celestial_insight and obj.cards.exists():
-            return format_html('<span style="color:green;">Completed</span>')
-        if obj.notes and "Theme:" in obj.notes:
-            return format_html('<span style="color:orange;">Validated</span>')
-        return format_html('<span style="color:red;">Invalid</span>')
+        color = STATUS_COLORS.get(obj.status, "gray")
+        return format_html('<span style="color:{};">{}</span>', color, obj.get_status_display())
+
+
+@admin.register(InsightJob)
+class InsightJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "reading", "user", "status", "attempts", "run_after", "finished_at")
+    list_filter = ("status",)
+    list_select_related = ("reading__user", "user")
+    raw_id_fields = ("reading", "user")
+    readonly_fields = ("token_hold", "locked_at", "locked_by", "created_at", "finished_at", "last_error")
+
+
+@admin.register(HedgeUsage)
+class HedgeUsageAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "agent", "tier", "model", "request_tokens", "response_tokens", "cut_off")
+    list_filter = ("agent", "tier", "cut_off")
+
+    # Written by the model router only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
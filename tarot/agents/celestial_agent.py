@@ -1,8 +1,12 @@
-from typing import Literal
+import functools
+from typing import ClassVar, Literal
 
-from pydantic import BaseModel, Field
+from django.conf import settings
+from pydantic import BaseModel, Field, create_model, field_validator
 from pydantic_ai import Agent
 
+from tarot.spreads import Spread
+
 from .common import ReadingDependencies
 
 Orientation = Literal["upright", "reversed"]
@@ -21,10 +25,62 @@ class CelestialInsightResponse(BaseModel):
     cards: list[CardResponse] = Field(description="List of cards with names, orientations, and interpretations.")
 
 
+class SpreadInsightResponse(CelestialInsightResponse):
+    """Base of the result types `spread_result_type` generates for a deck and a spread."""
+
+    card_type: ClassVar[type[CardResponse]] = CardResponse
+    positions: ClassVar[tuple[str, ...]] = ()
+
+    @field_validator("cards")
+    @classmethod
+    def fill_spread(cls, cards: list[CardResponse]) -> list[CardResponse]:
+        # Raised errors go back to the model, which corrects its answer within the same run
+        if len({card.name for card in cards}) < len(cards):
+            msg = "Each card can appear only once in a spread; replace the repeated cards."
+            raise ValueError(msg)
+        if tuple(card.role for card in cards) != cls.positions:
+            msg = f"Lay out one card per position, in this order: {', '.join(cls.positions)}."
+            raise ValueError(msg)
+        return cards
+
+
+@functools.lru_cache(maxsize=64)
+def spread_result_type(card_names: tuple[str, ...], spread: Spread) -> type[SpreadInsightResponse]:
+    """
+    Result type allowing only the cards of the deck (by their unique name) and exactly one card
+    per position of `spread`, so invented cards and miscounted spreads fail validation instead of
+    the lookup. `card_names` must not be empty.
+    """
+    card_type = create_model(
+        "SpreadCard",
+        __base__=CardResponse,
+        name=(Literal[card_names], Field(description="The name of the card, exactly as in the deck.")),
+        role=(Literal[spread.positions], Field(description="The position of the card in the spread.")),
+    )
+    result_type = create_model(
+        "CelestialInsightResponse",
+        __base__=SpreadInsightResponse,
+        cards=(
+            list[card_type],
+            Field(
+                min_length=spread.size,
+                max_length=spread.size,
+                description=f"Exactly {spread.size} distinct cards, one for each position of the spread, in order.",
+            ),
+        ),
+    )
+    result_type.card_type = card_type
+    result_type.positions = spread.positions
+    return result_type
+
+
 celestial_agent = Agent(
-    "openai:gpt-4o",
+    settings.LLM_MODEL_TIERS[settings.INSIGHT_MODEL_TIER],
+    name="celestial_agent",
+    defer_model_check=True,  # Built on first use; runs get their model from tarot.model_router
     deps_type=ReadingDependencies,
-    result_type=CelestialInsightResponse,
+    result_type=CelestialInsightResponse,  # Runs pass the `spread_result_type` of their reading
+    result_retries=2,
     system_prompt=(
         "You are a wise and mystical guide providing spiritual insights. "
         "For the given question and spread type, provide mystical guidance that is both profound and practical. "
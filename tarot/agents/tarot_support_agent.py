@@ -1,3 +1,7 @@
+import hashlib
+import json
+
+from django.conf import settings
 from pydantic import BaseModel, Field
 from pydantic_ai import Agent
 
@@ -13,18 +17,33 @@ class QuestionValidationResult(BaseModel):
     spread_type: ReadingTypeEnum | None = Field(description="The determined or suggested spread type for the reading.")
 
 
+SYSTEM_PROMPT = (
+    "You are a wise and mystical guide providing spiritual insights. "
+    "Your role is to validate questions for tarot readings and determine "
+    "the appropriate spread type based on the question's theme. "
+    "Select spreads from the provided list: single_card, three_card_spread, celtic_cross_spread, "
+    "love_spread, career_path_spread, relationship_spread, horseshoe_spread. "
+    "Ensure your theme and spread suggestions align with the question and are appropriate for the seeker. "
+    "Additionally, return a boolean field 'is_valid' to indicate if the question is appropriate for a tarot reading."
+    "If the question is not valid, return a reason for the negative validation result."
+)
+
+
+def prompt_version(system_prompt: str, result_type: type[BaseModel]) -> str:
+    """Fingerprint of what an agent is asked and must answer; it changes with either."""
+    fingerprint = json.dumps([system_prompt, result_type.model_json_schema()], sort_keys=True)
+    return hashlib.sha256(fingerprint.encode()).hexdigest()[:16]
+
+
+# Part of the validation cache keys: editing the system prompt or the result type bypasses the
+# results cached for the old ones
+VALIDATION_PROMPT_VERSION = prompt_version(SYSTEM_PROMPT, QuestionValidationResult)
+
 tarot_support_agent = Agent(
-    "openai:gpt-4-turbo",
+    settings.LLM_MODEL_TIERS[settings.VALIDATION_MODEL_TIER],
+    name="tarot_support_agent",
+    defer_model_check=True,  # Built on first use; runs get their model from tarot.model_router
     deps_type=ReadingDependencies,
     result_type=QuestionValidationResult,
-    system_prompt=(
-        "You are a wise and mystical guide providing spiritual insights. "
-        "Your role is to validate questions for tarot readings and determine "
-        "the appropriate spread type based on the question's theme. "
-        "Select spreads from the provided list: single_card, three_card_spread, celtic_cross_spread, "
-        "love_spread, career_path_spread, relationship_spread, horseshoe_spread. "
-        "Ensure your theme and spread suggestions align with the question and are appropriate for the seeker. "
-        "Additionally, return a boolean field 'is_valid' to indicate if the question is appropriate for a tarot reading."  # noqa: E501
-        "If the question is not valid, return a reason for the negative validation result."
-    ),
+    system_prompt=SYSTEM_PROMPT,
 )
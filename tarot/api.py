@@ -3,18 +3,39 @@ import logging
 from ninja import Query
 from ninja_extra import NinjaExtraAPI, api_controller, http_get, http_post, permissions
 
+from celestial_insight.caching import conditional_response, make_etag
+from celestial_insight.db import replica_reads
+
+from .catalog import aget_catalog
 from .enums import ReadingTypeEnum
 from .filters import CardFilterSchema, ReadingFilterSchema
+from .llm_scheduler import get_scheduler
+from .model_router import stats_summary
+from .pagination import DEFAULT_PAGE_SIZE
 from .schemas import (
     CardSchema,
     CardSchemaShort,
     CelestialInsightResponseSchema,
+    InsightJobSchema,
+    LLMSchedulerStatsSchema,
+    ModelTierStatsSchema,
     ReadingCardSchema,
+    ReadingPageSchema,
     ReadingSchema,
-    ReadingSchemaShort,
+    ValidationCacheStatsSchema,
 )
 from .services.card_service import get_card, list_cards, list_cards_in_reading
-from .services.reading_service import create_reading, generate_insight, get_reading, list_readings
+from .services.job_service import enqueue_insight, get_job
+from .services.reading_service import (
+    create_full_reading,
+    create_reading,
+    generate_insight,
+    get_reading,
+    list_readings,
+    stream_insight,
+)
+from .sse import sse_event, sse_response
+from .validation_cache import get_validation_cache
 
 api = NinjaExtraAPI()
 
@@ -25,12 +46,22 @@ logger = logging.getLogger(__name__)
 class AsyncTarotController:
     # CARDS
     @http_get("/cards", response=list[CardSchemaShort])
-    async def list_tarot_cards(self, filters: CardFilterSchema = Query(...)):
-        return await list_cards(filters)
+    @replica_reads
+    async def list_tarot_cards(self, request, filters: CardFilterSchema = Query(...)):
+        catalog = await aget_catalog()
+        etag = make_etag("cards", catalog.version, filters.model_dump_json())
+        if not_modified := conditional_response(request, self.context.response, etag):
+            return not_modified
+        return await list_cards(filters, catalog)
 
     @http_get("/cards/{card_slug}", response=CardSchema)
-    async def get_tarot_card(self, card_slug: str):
-        return await get_card(card_slug)
+    @replica_reads
+    async def get_tarot_card(self, request, card_slug: str):
+        catalog = await aget_catalog()
+        etag = make_etag("card", catalog.version, card_slug)
+        if not_modified := conditional_response(request, self.context.response, etag):
+            return not_modified
+        return await get_card(card_slug, catalog)
 
     # READINGS
     @http_post("/readings", response=ReadingSchema | str)
@@ -39,9 +70,25 @@ class AsyncTarotController:
     ):
         return await create_reading(request, question, mentor_id, reading_type)
 
-    @http_get("/readings/my", response=list[ReadingSchemaShort])
-    async def list_tarot_readings(self, request, filters: ReadingFilterSchema = Query(...)):
-        return await list_readings(request, filters)
+    @http_post("/readings/full", response=CelestialInsightResponseSchema | str)
+    async def create_full_tarot_reading(
+        self, request, question: str, mentor_id: int, reading_type: ReadingTypeEnum | None = None
+    ):
+        """
+        Create a reading and generate its celestial insight in a single round trip.
+        """
+        return await create_full_reading(request, question, mentor_id, reading_type)
+
+    @http_get("/readings/my", response=ReadingPageSchema)
+    @replica_reads
+    async def list_tarot_readings(
+        self,
+        request,
+        filters: ReadingFilterSchema = Query(...),
+        cursor: str | None = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ):
+        return await list_readings(request, filters, cursor, limit)
 
     @http_get("/readings/{reading_id}", response=ReadingSchema)
     async def get_tarot_reading(self, request, reading_id: int):
@@ -51,6 +98,80 @@ class AsyncTarotController:
     async def list_tarot_cards_in_reading(self, request, reading_id: int):
         return await list_cards_in_reading(reading_id)
 
-    @http_post("/readings/{reading_id}/insight", response=CelestialInsightResponseSchema | str)
-    async def generate_tarot_insight(self, request, reading_id: int):
-        return await generate_insight(request, reading_id)
+    @http_post(
+        "/readings/{reading_id}/insight",
+        response={200: CelestialInsightResponseSchema | str, 202: InsightJobSchema},
+    )
+    async def generate_tarot_insight(self, request, reading_id: int, background: bool | None = None):
+        """
+        Generate the celestial insight; with `background=true`, queue it and answer `202` with the job to poll.
+        """
+        if not background:
+            return await generate_insight(request, reading_id)
+
+        job = await enqueue_insight(request, reading_id)
+        if isinstance(job, str):
+            return job
+        return 202, job
+
+    @http_post("/readings/{reading_id}/insight/stream", response=str)
+    async def stream_tarot_insight(self, request, reading_id: int):
+        """
+        Stream the celestial insight as Server-Sent Events (`text`, `card`, then `done` or `error`).
+        """
+        events = await stream_insight(request, reading_id)
+        if isinstance(events, str):
+            return events
+
+        async def serialize():
+            async for event, data in events:
+                if event == "done":
+                    data = CelestialInsightResponseSchema.from_orm(data).model_dump(mode="json")  # noqa: PLW2901
+                yield sse_event(event, data)
+
+        return sse_response(serialize())
+
+    # INSIGHT JOBS
+    @http_get("/insight-jobs/{job_id}", response=InsightJobSchema, permissions=[permissions.IsAuthenticated])
+    async def get_insight_job(self, request, job_id: int, wait: float = 0):
+        """
+        Poll a queued insight job; `wait` (seconds, max 30) long-polls until the job finishes.
+        """
+        return await get_job(request, job_id, wait)
+
+    # VALIDATION CACHE
+    @http_get(
+        "/validation-cache/stats",
+        response={200: ValidationCacheStatsSchema, 404: str},
+        permissions=[permissions.IsAdminUser],
+    )
+    async def get_validation_cache_stats(self, request):
+        """
+        Hit rate and tokens saved by the question validation cache of this process.
+        """
+        cache = get_validation_cache()
+        if cache is None:
+            return 404, "The validation cache is disabled."
+        return {
+            "backend": type(cache).__name__,
+            "entries": await cache.asize(),
+            "hits": cache.stats.hits,
+            "misses": cache.stats.misses,
+            "hit_rate": cache.stats.hit_rate,
+            "tokens_saved": cache.stats.tokens_saved,
+        }
+
+    # MODEL ROUTING
+    @http_get("/model-tiers/stats", response=list[ModelTierStatsSchema], permissions=[permissions.IsAdminUser])
+    async def get_model_tier_stats(self, request):
+        """
+        Runs, failures, fallbacks, latency and token usage per agent and model tier in this process.
+        """
+        return stats_summary()
+
+    @http_get("/llm-scheduler/stats", response=LLMSchedulerStatsSchema, permissions=[permissions.IsAdminUser])
+    async def get_llm_scheduler_stats(self, request):
+        """
+        Slots in use, queue depth, rejections and wait times of the agent run scheduler of this process.
+        """
+        return get_scheduler().summary()
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class TarotConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "tarot"
+
+    def ready(self):
+        from django.core import checks
+
+        from celestial_insight.caching import check_shared_cache
+
+        from . import signals  # noqa: F401
+
+        checks.register(check_shared_cache, checks.Tags.caches)
@@ -0,0 +1,191 @@
+import threading
+from dataclasses import dataclass
+
+from asgiref.sync import sync_to_async
+from django.http import Http404
+
+from celestial_insight.caching import aget_version, bump_version, get_version
+from celestial_insight.db import read_primary
+from tarot.models import Card, Suit
+from tarot.search import CardSearchIndex, tokenize
+
+CATALOG_VERSION_CACHE_KEY = "tarot:catalog:version"
+
+
+@dataclass(frozen=True, slots=True)
+class SuitRecord:
+    id: int
+    name: str
+    arcana: str
+    description: str
+
+
+@dataclass(frozen=True, slots=True)
+class CardRecord:
+    id: int
+    name: str
+    slug: str
+    number: int | None
+    image: str | None
+    thumbnail: str | None
+    thumbnail_webp: str | None
+    image_webp: str | None
+    upright_meaning: str
+    reversed_meaning: str
+    keywords: str
+    description: str
+    suit: SuitRecord
+    keyword_list: tuple[str, ...] = ()
+
+    @property
+    def suit_id(self) -> int:
+        return self.suit.id
+
+
+class CardCatalog:
+    """
+    Immutable snapshot of the tarot deck, indexed by card id, name, slug and suit.
+
+    Cards keep the model ordering (suit, number) so list endpoints can serve them as-is.
+    """
+
+    __slots__ = (
+        "by_id",
+        "by_keyword",
+        "by_name",
+        "by_slug",
+        "by_suit",
+        "card_names",
+        "cards",
+        "search_index",
+        "suits",
+        "version",
+    )
+
+    def __init__(self, suits: tuple[SuitRecord, ...], cards: tuple[CardRecord, ...], version: str):
+        self.version = version
+        self.suits = suits
+        self.cards = cards
+        self.by_id = {card.id: card for card in cards}
+        self.by_slug = {card.slug: card for card in cards}
+        self.by_name = {card.name: card for card in cards}
+        self.card_names = tuple(self.by_name)  # Unique (see `Card.name`), for the celestial agent's result type
+        by_suit: dict[int, list[CardRecord]] = {suit.id: [] for suit in suits}
+        for card in cards:
+            by_suit.setdefault(card.suit_id, []).append(card)
+        self.by_suit = {suit_id: tuple(suit_cards) for suit_id, suit_cards in by_suit.items()}
+        by_keyword: dict[str, list[CardRecord]] = {}
+        for card in cards:
+            for keyword in card.keyword_list:
+                by_keyword.setdefault(keyword, []).append(card)
+        self.by_keyword = {keyword: tuple(keyword_cards) for keyword, keyword_cards in by_keyword.items()}
+        self.search_index = CardSearchIndex(cards)
+
+    def get(self, card_slug: str) -> CardRecord:
+        """Return the card with the given slug or raise Http404."""
+        try:
+            return self.by_slug[card_slug]
+        except KeyError:
+            msg = "No Card matches the given query."
+            raise Http404(msg) from None
+
+    def filter_cards(
+        self,
+        *,
+        suit: int | None = None,
+        name: str | None = None,
+        keywords: str | None = None,
+        keyword: str | None = None,
+    ) -> tuple[CardRecord, ...]:
+        """Mirror the `CardFilterSchema` lookups (exact suit, case-insensitive partial name/keywords)."""
+        cards = self.cards if suit is None else self.by_suit.get(suit, ())
+        if keyword:
+            keyword_ids = {card.id for card in self.by_keyword.get(keyword.strip().casefold(), ())}
+            cards = tuple(card for card in cards if card.id in keyword_ids)
+        if name:
+            name = name.casefold()
+            cards = tuple(card for card in cards if name in card.name.casefold())
+        if keywords:
+            keywords = keywords.casefold()
+            cards = tuple(card for card in cards if keywords in card.keywords.casefold())
+        return cards
+
+    def search(self, query: str, cards: tuple[CardRecord, ...] | None = None) -> tuple[CardRecord, ...]:
+        """Full-text search ranked by relevance, optionally restricted to an already filtered card set."""
+        candidates = self.cards if cards is None else cards
+        if not tokenize(query):
+            return candidates  # Nothing but stop words: no search, like an empty query
+        scores = self.search_index.scores(query)
+        matches = [card for card in candidates if card.id in scores]
+        matches.sort(key=lambda card: scores[card.id], reverse=True)
+        return tuple(matches)
+
+
+_catalog: CardCatalog | None = None
+_catalog_lock = threading.Lock()
+
+
+def _suit_record(suit: Suit) -> SuitRecord:
+    return SuitRecord(id=suit.id, name=suit.name, arcana=suit.arcana, description=suit.description)
+
+
+def _build_catalog(version: str) -> CardCatalog:
+    suits = {suit.id: _suit_record(suit) for suit in Suit.objects.order_by("id")}
+    cards = tuple(
+        CardRecord(
+            id=card.id,
+            name=card.name,
+            slug=card.slug,
+            number=card.number,
+            image=card.image.url if card.image else None,
+            thumbnail=card.thumbnail,
+            thumbnail_webp=card.thumbnail_webp,
+            image_webp=card.image_webp,
+            upright_meaning=card.upright_meaning,
+            reversed_meaning=card.reversed_meaning,
+            keywords=card.keywords,
+            description=card.description,
+            suit=suits.get(card.suit_id) or suits.setdefault(card.suit_id, _suit_record(card.suit)),
+            keyword_list=tuple(card_keyword.keyword for card_keyword in card.keyword_set.all()),
+        )
+        for card in Card.objects.select_related("suit").prefetch_related("keyword_set")
+    )
+    return CardCatalog(tuple(suits.values()), cards, version)
+
+
+def get_catalog() -> CardCatalog:
+    """
+    Return the process-local card catalog, (re)building it when the shared version stamp has moved.
+
+    The version stamp lives in the shared `versions` cache (see `CACHES`), so every process
+    notices an invalidation made by any other one, within `VERSION_STAMP_MAX_AGE` seconds.
+    """
+    global _catalog  # noqa: PLW0603
+
+    version = get_version(CATALOG_VERSION_CACHE_KEY)
+    catalog = _catalog
+    if catalog is not None and catalog.version == version:
+        return catalog
+
+    with _catalog_lock:
+        if _catalog is None or _catalog.version != version:
+            with read_primary():
+                _catalog = _build_catalog(version)
+        return _catalog
+
+
+async def aget_catalog() -> CardCatalog:
+    """Async variant of `get_catalog`; a rebuild runs in a worker thread."""
+    version = await aget_version(CATALOG_VERSION_CACHE_KEY)
+    catalog = _catalog
+    if catalog is not None and catalog.version == version:
+        return catalog
+    return await sync_to_async(get_catalog)()
+
+
+def invalidate_catalog() -> None:
+    """Drop the local catalog and bump the shared version stamp so every worker rebuilds on next access."""
+    global _catalog  # noqa: PLW0603
+
+    bump_version(CATALOG_VERSION_CACHE_KEY)
+    _catalog = None
@@ -19,3 +19,23 @@ READING_TYPE_CHOICES = [
     ("relationship_spread", _("Relationship Spread")),
     ("horseshoe_spread", _("Horseshoe Spread")),
 ]
+
+READING_STATUS_CHOICES = [
+    ("created", _("Created")),
+    ("validated", _("Validated")),
+    ("completed", _("Completed")),
+    ("failed", _("Failed")),
+]
+
+JOB_STATUS_CHOICES = [
+    ("pending", _("Pending")),
+    ("running", _("Running")),
+    ("succeeded", _("Succeeded")),
+    ("failed", _("Failed")),
+]
+
+MODEL_TIER_CHOICES = [
+    ("fast", _("Fast")),
+    ("standard", _("Standard")),
+    ("premium", _("Premium")),
+]
@@ -9,3 +9,30 @@ class ReadingTypeEnum(StrEnum):
     CAREER_PATH_SPREAD = "career_path_spread"
     RELATIONSHIP_SPREAD = "relationship_spread"
     HORSESHOE_SPREAD = "horseshoe_spread"
+
+
+class ReadingStatusEnum(StrEnum):
+    CREATED = "created"
+    VALIDATED = "validated"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class JobStatusEnum(StrEnum):
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+
+class PreValidationModeEnum(StrEnum):
+    OFF = "off"  # Every question goes to the support agent
+    REJECT = "reject"  # Only reject empty, oversized or nonsense questions locally
+    BALANCED = "balanced"  # Also accept questions with a clear intent and theme
+    AGGRESSIVE = "aggressive"  # Accept any question with a clear intent
+
+
+class ModelTierEnum(StrEnum):
+    FAST = "fast"  # Cheap, low-latency model for classification and small spreads
+    STANDARD = "standard"
+    PREMIUM = "premium"  # Strongest model, for large spreads and long questions
@@ -0,0 +1,70 @@
+import csv
+import json
+from collections.abc import AsyncIterator
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch, QuerySet
+from django.http import StreamingHttpResponse
+
+from .models import Reading, ReadingCard
+
+EXPORT_CHUNK_SIZE = 1000  # Rows fetched (and cards prefetched) per database round trip
+
+READING_FIELDS = ("id", "date", "question", "notes", "reading_type")
+CSV_HEADER = ["Date", "Question", "Notes", "Reading Type"]
+
+
+class _Echo:
+    """Pseudo-buffer whose `write` returns the line, so `csv.writer` can feed a generator."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def aiter_readings(queryset: QuerySet[Reading], *, with_cards: bool = False) -> AsyncIterator[Reading]:
+    """
+    Iterate over `queryset` in chunks instead of loading every reading at once.
+
+    With `with_cards`, each chunk's cards and card data are prefetched in two queries.
+    The iterator is asynchronous so that, under ASGI, the response streams chunk by chunk
+    instead of being loaded into a list first.
+    """
+    queryset = queryset.only(*READING_FIELDS)
+    if with_cards:
+        cards = ReadingCard.objects.select_related("card").only(
+            "reading_id", "position", "orientation", "role", "card__name"
+        )
+        queryset = queryset.prefetch_related(Prefetch("cards", queryset=cards.order_by("position")))
+    return queryset.aiterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def _card_entries(reading: Reading) -> list[dict]:
+    return [
+        {"position": card.position, "name": card.card.name, "orientation": card.orientation, "role": card.role}
+        for card in reading.cards.all()
+    ]
+
+
+async def stream_readings_csv(queryset: QuerySet[Reading], *, with_cards: bool = False) -> AsyncIterator[str]:
+    writer = csv.writer(_Echo())
+    yield writer.writerow([*CSV_HEADER, "Cards"] if with_cards else CSV_HEADER)
+    async for reading in aiter_readings(queryset, with_cards=with_cards):
+        row = [reading.date, reading.question, reading.notes, reading.reading_type]
+        if with_cards:
+            cards = _card_entries(reading)
+            row.append("; ".join(f"{card['position']}. {card['name']} ({card['orientation']})" for card in cards))
+        yield writer.writerow(row)
+
+
+async def stream_readings_ndjson(queryset: QuerySet[Reading], *, with_cards: bool = False) -> AsyncIterator[str]:
+    async for reading in aiter_readings(queryset, with_cards=with_cards):
+        row = {field: getattr(reading, field) for field in READING_FIELDS}
+        if with_cards:
+            row["cards"] = _card_entries(reading)
+        yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+
+def export_response(rows: AsyncIterator[str], content_type: str, filename: str) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(rows, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -1,9 +1,16 @@
 from datetime import datetime
 
+from django.db.models import Q
 from ninja import Field, FilterSchema
 
+from .enums import ReadingStatusEnum
+
 
 class CardFilterSchema(FilterSchema):
+    q: str | None = Field(
+        None,
+        description="Full-text search over name, keywords, description and meanings (ranked by relevance)",
+    )
     suit: int | None = Field(None, description="Filter by suit ID")
     name: str | None = Field(
         None,
@@ -15,6 +22,11 @@ class CardFilterSchema(FilterSchema):
         q="keywords__icontains",
         description="Filter by keywords (comma-separated)",
     )
+    keyword: str | None = Field(
+        None,
+        q="keyword_set__keyword",
+        description="Filter by an exact keyword",
+    )
 
 
 class ReadingFilterSchema(FilterSchema):
@@ -28,3 +40,8 @@ class ReadingFilterSchema(FilterSchema):
         q="date__gte",
         description="Filter by readings newer than this date",
     )
+    status: ReadingStatusEnum | None = Field(None, description="Filter by reading status")
+    theme: str | None = Field(None, description="Filter by theme (e.g. love, career)")
+
+    def filter_theme(self, value: str | None) -> Q:
+        return Q(theme=value.strip().lower()) if value else Q()
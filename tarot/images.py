@@ -0,0 +1,119 @@
+import hashlib
+import io
+import logging
+from pathlib import PurePosixPath
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Q
+from PIL import Image, ImageOps
+
+from .models import Card
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_DIR = "tarot_cards/derivatives"
+THUMBNAIL_SIZE = (150, 260)  # Bounding box; cards keep their aspect ratio
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+
+# Variant key -> (size label used in the file name, Pillow format, extension)
+VARIANTS = {
+    "thumbnail": ("thumb", "JPEG", "jpg"),
+    "thumbnail_webp": ("thumb", "WEBP", "webp"),
+    "image_webp": ("full", "WEBP", "webp"),
+}
+
+
+def _encode(image: Image.Image, image_format: str) -> bytes:
+    buffer = io.BytesIO()
+    if image_format == "JPEG":
+        image.save(buffer, format="JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    else:
+        image.save(buffer, format=image_format, quality=WEBP_QUALITY, method=6)
+    return buffer.getvalue()
+
+
+def _store(storage, stem: str, label: str, extension: str, content: bytes) -> str:
+    """Save `content` under a content-hashed name, so URLs can be cached forever."""
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    name = f"{DERIVATIVES_DIR}/{stem}.{label}.{digest}.{extension}"
+    if not storage.exists(name):
+        name = storage.save(name, ContentFile(content))
+    return name
+
+
+def build_image_variants(image_field) -> dict[str, str]:
+    """
+    Generate the thumbnail and WebP derivatives of a card image.
+
+    Returns a mapping of variant key to storage name, plus the `source` image name
+    the variants were generated from.
+    """
+    with image_field.open("rb") as source:
+        image = Image.open(source)
+        image.load()
+
+    image = ImageOps.exif_transpose(image).convert("RGB")
+    thumbnail = image.copy()
+    thumbnail.thumbnail(THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
+    images = {"thumb": thumbnail, "full": image}
+
+    stem = PurePosixPath(image_field.name).stem
+    variants = {"source": image_field.name}
+    for key, (label, image_format, extension) in VARIANTS.items():
+        content = _encode(images[label], image_format)
+        variants[key] = _store(image_field.storage, stem, label, extension, content)
+    return variants
+
+
+def delete_stale_variants(storage, old_variants: dict[str, str], new_variants: dict[str, str]) -> None:
+    """
+    Delete the derivatives of `old_variants` that `new_variants` dropped.
+
+    Cards with the same image share content-hashed derivatives, so names any card still
+    references are kept.
+    """
+    stale = {name for key, name in old_variants.items() if key != "source"} - set(new_variants.values())
+    if not stale:
+        return
+    in_use = Q()
+    for key in VARIANTS:
+        in_use |= Q(**{f"image_variants__{key}__in": stale})
+    for variants in Card.objects.filter(in_use).values_list("image_variants", flat=True):
+        stale -= set(variants.values())
+    for name in stale:
+        storage.delete(name)
+
+
+def refresh_card_image_variants(card, *, force: bool = False) -> bool:
+    """
+    (Re)generate the derivatives of `card.image` when the source image changed.
+
+    Stores the result with a queryset update (no extra `post_save`) and returns
+    True when the card's variants were changed.
+    """
+    old_variants = card.image_variants or {}
+    if not card.image:
+        new_variants = {}
+    elif not force and old_variants.get("source") == card.image.name:
+        return False
+    else:
+        try:
+            new_variants = build_image_variants(card.image)
+        except FileNotFoundError:
+            logger.warning("Image file %s of card %s is missing", card.image.name, card.pk)
+            return False
+        except OSError:
+            logger.warning("Could not generate image variants for card %s", card.pk, exc_info=True)
+            return False
+
+    if new_variants == old_variants:
+        return False
+
+    Card.objects.filter(pk=card.pk).update(image_variants=new_variants)
+    card.image_variants = new_variants
+    # Only once the new names are committed: a rolled back save still points at the old files
+    storage = card.image.storage
+    transaction.on_commit(lambda: delete_stale_variants(storage, old_variants, new_variants))
+    return True
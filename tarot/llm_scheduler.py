@@ -0,0 +1,230 @@
+"""
+Process-wide admission control for agent runs.
+
+At most `LLM_MAX_CONCURRENCY` runs talk to the model providers at a time. Further runs wait
+in a bounded queue that is served round-robin per user, so a user with many requests in
+flight only gets every n-th free slot. A run is rejected straight away, with a hint when to
+retry, when its user already has `LLM_QUEUE_MAX_PER_USER` runs waiting (429) or the queue is
+full (503), and after waiting `LLM_QUEUE_TIMEOUT` seconds (503).
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+from celestial_insight.metrics import percentile
+
+WAIT_WINDOW = 1000  # Latest admissions the wait-time percentiles are computed over
+MAX_RETRY_AFTER = 60  # Seconds
+HOLD_SMOOTHING = 0.2  # Weight of the latest run in the moving average of slot hold times
+
+
+class LLMOverloadedError(Exception):
+    """No model slot is available in time; the request should be retried after `retry_after` seconds."""
+
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMUserQueueFullError(LLMOverloadedError):
+    """The user already has as many runs waiting as allowed."""
+
+    status_code = 429
+
+
+@dataclass
+class SchedulerStats:
+    admitted: int = 0
+    queued: int = 0  # Admissions that had to wait for a slot
+    rejected_user: int = 0  # 429s: the user's share of the queue was full
+    rejected_full: int = 0  # 503s: the queue was full
+    timeouts: int = 0  # 503s: no slot within the queue timeout
+    peak_waiting: int = 0
+    waits: deque[float] = field(default_factory=lambda: deque(maxlen=WAIT_WINDOW))
+
+
+class _Waiter:
+    __slots__ = ("future", "granted")
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        self.granted = False
+
+
+class LLMScheduler:
+    """
+    Concurrency cap with a fair, bounded wait queue.
+
+    The state is guarded by a thread lock and waiters are woken on their own event loop, so
+    the scheduler also works when views run on a loop per request (WSGI, `runserver`).
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, max_queue_per_user: int, timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.timeout = timeout
+        self.stats = SchedulerStats()
+        self.active = 0
+        self.waiting = 0
+        self.avg_hold = 1.0  # Seconds a run holds its slot, on average
+        self._queues: OrderedDict[object, deque[_Waiter]] = OrderedDict()  # Rotation order of the waiting users
+        self._lock = threading.Lock()
+
+    def retry_after(self) -> int:
+        """Seconds until the queue has likely moved on by its current length."""
+        estimate = self.avg_hold * (self.waiting + 1) / max(self.max_concurrency, 1)
+        return min(max(math.ceil(estimate), 1), MAX_RETRY_AFTER)
+
+    def check_admission(self, user_key: object) -> None:
+        """Raise the error `acquire` would raise right now, without taking a slot."""
+        with self._lock:
+            self._check_admission(user_key)
+
+    def _check_admission(self, user_key: object) -> None:
+        if self.active < self.max_concurrency and not self.waiting:
+            return
+        if self.waiting >= self.max_queue:
+            self.stats.rejected_full += 1
+            msg = "The oracle is overwhelmed right now; try again shortly."
+            raise LLMOverloadedError(msg, self.retry_after())
+        if len(self._queues.get(user_key, ())) >= self.max_queue_per_user:
+            self.stats.rejected_user += 1
+            msg = "Too many of your readings are waiting for the oracle; try again shortly."
+            raise LLMUserQueueFullError(msg, self.retry_after())
+
+    async def acquire(self, user_key: object) -> None:
+        start = time.monotonic()
+        with self._lock:
+            if self.active < self.max_concurrency and not self.waiting:
+                self.active += 1
+                self._admitted(0.0)
+                return
+            self._check_admission(user_key)
+            waiter = _Waiter(asyncio.get_running_loop().create_future())
+            self._queues.setdefault(user_key, deque()).append(waiter)
+            self.waiting += 1
+            self.stats.queued += 1
+            self.stats.peak_waiting = max(self.stats.peak_waiting, self.waiting)
+
+        try:
+            async with asyncio.timeout(self.timeout):
+                await waiter.future
+        except BaseException as e:
+            with self._lock:
+                if waiter.granted:
+                    self._release()  # Woken just too late: pass the slot on
+                else:
+                    self._remove(user_key, waiter)
+                if isinstance(e, TimeoutError):
+                    self.stats.timeouts += 1
+                    msg = "The oracle is overwhelmed right now; try again shortly."
+                    raise LLMOverloadedError(msg, self.retry_after()) from e
+            raise
+
+        with self._lock:
+            self._admitted(time.monotonic() - start)
+
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free right away and nobody is waiting for it."""
+        with self._lock:
+            if self.active < self.max_concurrency and not self.waiting:
+                self.active += 1
+                return True
+            return False
+
+    def release(self, held: float) -> None:
+        with self._lock:
+            self.avg_hold += HOLD_SMOOTHING * (held - self.avg_hold)
+            self._release()
+
+    @asynccontextmanager
+    async def slot(self, user_key: object) -> AsyncIterator[None]:
+        """Hold a model slot for the duration of the block."""
+        await self.acquire(user_key)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def _admitted(self, wait: float) -> None:
+        self.stats.admitted += 1
+        self.stats.waits.append(wait)
+
+    def _release(self) -> None:
+        """Hand the slot to the next user in the rotation, or free it. Called with the lock held."""
+        while self._queues:
+            user_key, queue = next(iter(self._queues.items()))
+            waiter = queue.popleft()
+            self.waiting -= 1
+            if queue:
+                self._queues.move_to_end(user_key)
+            else:
+                del self._queues[user_key]
+            if not waiter.future.done():
+                waiter.granted = True
+                waiter.future.get_loop().call_soon_threadsafe(_wake, waiter.future)
+                return
+        self.active -= 1
+
+    def _remove(self, user_key: object, waiter: _Waiter) -> None:
+        queue = self._queues.get(user_key)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            self.waiting -= 1
+            if not queue:
+                del self._queues[user_key]
+
+    def summary(self) -> dict:
+        with self._lock:
+            waits = list(self.stats.waits)
+            return {
+                "max_concurrency": self.max_concurrency,
+                "active": self.active,
+                "waiting": self.waiting,
+                "waiting_users": len(self._queues),
+                "peak_waiting": self.stats.peak_waiting,
+                "admitted": self.stats.admitted,
+                "queued": self.stats.queued,
+                "rejected_user": self.stats.rejected_user,
+                "rejected_full": self.stats.rejected_full,
+                "timeouts": self.stats.timeouts,
+                "wait_p50_ms": round(percentile(waits, 50) * 1000, 1),
+                "wait_p95_ms": round(percentile(waits, 95) * 1000, 1),
+                "wait_max_ms": round(max(waits, default=0) * 1000, 1),
+                "avg_hold_ms": round(self.avg_hold * 1000, 1),
+            }
+
+
+def _wake(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+_scheduler: LLMScheduler | None = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    global _scheduler  # noqa: PLW0603
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = LLMScheduler(
+                    settings.LLM_MAX_CONCURRENCY,
+                    settings.LLM_QUEUE_MAX_SIZE,
+                    settings.LLM_QUEUE_MAX_PER_USER,
+                    settings.LLM_QUEUE_TIMEOUT,
+                )
+    return _scheduler
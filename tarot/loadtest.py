@@ -0,0 +1,279 @@
+"""
+Offline load testing of the API.
+
+`FakeLLM` stands in for the OpenAI models behind both agents, with configurable latency,
+jitter, token usage and failure rate; `run_scenario` drives the ASGI application through
+`httpx` at a fixed concurrency and records latency and database queries per request.
+"""
+
+import asyncio
+import random
+import time
+from collections import Counter
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+
+import httpx
+from django.db import connections
+from django.db.backends.signals import connection_created
+from pydantic_ai.messages import ModelMessage, ModelResponse, ToolCallPart
+from pydantic_ai.models import AgentModel
+from pydantic_ai.models.function import AgentInfo, FunctionAgentModel, FunctionModel
+from pydantic_ai.usage import Usage
+
+from celestial_insight.metrics import percentile
+
+from .agents.celestial_agent import celestial_agent
+from .agents.tarot_support_agent import tarot_support_agent
+
+
+class FakeLLMError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class FakeLLMConfig:
+    latency: float = 0.5  # Seconds per model request
+    jitter: float = 0.1  # Uniform +/- seconds around `latency`
+    request_tokens: int = 400
+    response_tokens: int = 300
+    failure_rate: float = 0.0  # Share of model requests that raise
+    slow_rate: float = 0.0  # Share of model requests in the latency tail...
+    slow_factor: float = 5.0  # ...which take this many times as long
+    seed: int = 0
+
+
+@dataclass
+class _FakeAgentModel(FunctionAgentModel):
+    usage: Usage
+
+    async def request(self, messages, model_settings):
+        response, _ = await super().request(messages, model_settings)
+        return response, Usage(**asdict(self.usage))
+
+
+class FixedUsageModel(FunctionModel):
+    """`FunctionModel` reporting a fixed token usage instead of estimating it from the messages."""
+
+    def __init__(self, function, usage: Usage):
+        super().__init__(function)
+        self.usage = usage
+
+    async def agent_model(self, *, function_tools, allow_text_result, result_tools) -> AgentModel:
+        info = AgentInfo(function_tools, allow_text_result, result_tools, None)
+        return _FakeAgentModel(self.function, self.stream_function, info, self.usage)
+
+
+class FakeLLM:
+    """Deterministic (for a given seed) stand-in for the models of both agents."""
+
+    def __init__(self, config: FakeLLMConfig, card_names: list[str]):
+        self.config = config
+        self.card_names = card_names
+        self.calls: Counter[str] = Counter()
+        self.failures: Counter[str] = Counter()
+        self._random = random.Random(config.seed)  # noqa: S311 (simulation, not security)
+        # Per response, like the provider models; the agent run counts the requests itself
+        self._usage = Usage(
+            request_tokens=config.request_tokens,
+            response_tokens=config.response_tokens,
+            total_tokens=config.request_tokens + config.response_tokens,
+        )
+
+    async def _respond(self, agent: str, args: dict, info: AgentInfo) -> ModelResponse:
+        self.calls[agent] += 1
+        jitter = self._random.uniform(-self.config.jitter, self.config.jitter)
+        latency = max(self.config.latency + jitter, 0)
+        if self._random.random() < self.config.slow_rate:
+            latency *= self.config.slow_factor
+        await asyncio.sleep(latency)
+        if self._random.random() < self.config.failure_rate:
+            self.failures[agent] += 1
+            msg = f"Fake {agent} model failure"
+            raise FakeLLMError(msg)
+        return ModelResponse(parts=[ToolCallPart.from_raw_args(info.result_tools[0].name, args)])
+
+    async def validate_question(self, messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        args = {"is_valid": True, "reason": None, "theme": "career", "spread_type": "three_card_spread"}
+        return await self._respond("validation", args, info)
+
+    async def celestial_insight(self, messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        # Lay out the spread the run asks for: its positions are the allowed roles of the result type
+        schema = info.result_tools[0].parameters_json_schema
+        role = schema["$defs"]["SpreadCard"]["properties"]["role"]
+        positions = role.get("enum") or [role["const"]]  # A single position is a `const`
+        cards = [
+            {"name": name, "orientation": orientation, "role": role, "interpretation": f"{name} speaks of change."}
+            for name, orientation, role in zip(
+                self._random.sample(self.card_names, len(positions)),
+                self._random.choices(["upright", "reversed"], k=len(positions)),
+                positions,
+                strict=True,
+            )
+        ]
+        return await self._respond("insight", {"text": "The stars align.", "cards": cards}, info)
+
+    @contextmanager
+    def installed(self) -> Iterator[None]:
+        """Serve both agents from this fake for the duration of the block."""
+        with (
+            tarot_support_agent.override(model=FixedUsageModel(self.validate_question, self._usage)),
+            celestial_agent.override(model=FixedUsageModel(self.celestial_insight, self._usage)),
+        ):
+            yield
+
+
+# Queries are counted per request: connections get an execute wrapper that increments the
+# counter of the request being served, which follows the request into sync_to_async threads.
+_query_counter: ContextVar[list[int] | None] = ContextVar("query_counter", default=None)
+
+
+def _count_query(execute, sql, params, many, context):
+    counter = _query_counter.get()
+    if counter is not None:
+        counter[0] += 1
+    return execute(sql, params, many, context)
+
+
+def _install_counter(sender, connection, **kwargs):
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_count_query)
+
+
+def install_query_counter() -> None:
+    connection_created.connect(_install_counter, dispatch_uid="loadtest_query_counter")
+    for connection in connections.all(initialized_only=True):
+        _install_counter(None, connection)
+
+
+@dataclass
+class EndpointStats:
+    latencies: list[float] = field(default_factory=list)
+    queries: list[int] = field(default_factory=list)
+    statuses: Counter[int] = field(default_factory=Counter)
+    errors: int = 0
+
+    def summary(self, elapsed: float) -> dict:
+        count = len(self.latencies)
+        return {
+            "requests": count,
+            "errors": self.errors,
+            "throughput_rps": round(count / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(self.latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(self.latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(self.latencies, 99) * 1000, 1),
+            "max_ms": round(max(self.latencies, default=0) * 1000, 1),
+            "queries_per_request": round(sum(self.queries) / count, 2) if count else 0.0,
+            "statuses": {str(status): n for status, n in sorted(self.statuses.items())},
+        }
+
+
+@dataclass(frozen=True)
+class LoadSession:
+    """The seeded state requests are made with."""
+
+    cookies: dict[str, str]  # Session of the load-test user
+    mentor_id: int
+
+
+class LoadClient:
+    """`httpx` client bound to the ASGI app that records every request under an endpoint name."""
+
+    def __init__(self, client: httpx.AsyncClient, session: LoadSession):
+        self.client = client
+        self.session = session
+        self.stats: dict[str, EndpointStats] = {}
+
+    async def request(self, endpoint: str, method: str, url: str) -> httpx.Response:
+        counter = [0]
+        token = _query_counter.set(counter)
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url)
+        finally:
+            _query_counter.reset(token)
+        elapsed = time.perf_counter() - start
+
+        stats = self.stats.setdefault(endpoint, EndpointStats())
+        stats.latencies.append(elapsed)
+        stats.queries.append(counter[0])
+        stats.statuses[response.status_code] += 1
+        # Services report failures (no tokens, invalid question, model error) as a JSON string
+        if response.is_error or isinstance(response.json(), str):
+            stats.errors += 1
+        return response
+
+
+def _question(n: int) -> str:
+    # Unique per request, so neither the validation cache nor dedup hides the model calls
+    return f"What should I focus on in my career this season, question {n}?"
+
+
+async def _cards(client: LoadClient, n: int) -> None:
+    await client.request("GET /tarot/cards", "GET", "/api/tarot/cards")
+
+
+async def _mentors(client: LoadClient, n: int) -> None:
+    await client.request("GET /mentors", "GET", "/api/mentors/")
+
+
+async def _me(client: LoadClient, n: int) -> None:
+    await client.request("GET /users/me", "GET", "/api/users/me")
+
+
+async def _my_readings(client: LoadClient, n: int) -> None:
+    await client.request("GET /tarot/readings/my", "GET", "/api/tarot/readings/my?limit=20")
+
+
+async def _create_reading(client: LoadClient, n: int) -> int | None:
+    url = f"/api/tarot/readings?question={_question(n)}&mentor_id={client.session.mentor_id}"
+    response = await client.request("POST /tarot/readings", "POST", url)
+    data = None if response.is_error else response.json()
+    return data["id"] if isinstance(data, dict) else None
+
+
+async def _reading_with_insight(client: LoadClient, n: int) -> None:
+    reading_id = await _create_reading(client, n)
+    if reading_id is not None:
+        await client.request("POST /tarot/readings/{id}/insight", "POST", f"/api/tarot/readings/{reading_id}/insight")
+
+
+async def _full_reading(client: LoadClient, n: int) -> None:
+    url = f"/api/tarot/readings/full?question={_question(n)}&mentor_id={client.session.mentor_id}"
+    await client.request("POST /tarot/readings/full", "POST", url)
+
+
+Scenario = Callable[[LoadClient, int], Awaitable[object]]
+
+SCENARIOS: dict[str, Scenario] = {
+    "cards": _cards,
+    "mentors": _mentors,
+    "me": _me,
+    "my_readings": _my_readings,
+    "create_reading": _create_reading,
+    "insight": _reading_with_insight,
+    "full_reading": _full_reading,
+}
+
+
+async def run_scenario(app, scenario: str, session: LoadSession, *, requests: int, concurrency: int) -> dict:
+    """Run `requests` iterations of `scenario` with `concurrency` in flight; returns per-endpoint summaries."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", cookies=session.cookies) as http:
+        client = LoadClient(http, session)
+        iterations = iter(range(requests))
+
+        async def worker():
+            for n in iterations:
+                await SCENARIOS[scenario](client, n)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, requests))))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "endpoints": {endpoint: stats.summary(elapsed) for endpoint, stats in client.stats.items()},
+    }
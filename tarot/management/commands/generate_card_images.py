@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from tarot.catalog import invalidate_catalog
+from tarot.images import refresh_card_image_variants
+from tarot.models import Card
+
+
+class Command(BaseCommand):
+    help = "Generate thumbnail and WebP derivatives for card images (backfill for fixtures and older uploads)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenerate variants even for cards whose derivatives are up to date.",
+        )
+
+    def handle(self, *args, **options):
+        updated = skipped = 0
+        for card in Card.objects.exclude(image="").only("id", "name", "image", "image_variants").iterator():
+            if refresh_card_image_variants(card, force=options["force"]):
+                updated += 1
+                self.stdout.write(f"Generated variants for {card.name}")
+            else:
+                skipped += 1
+
+        if updated:
+            invalidate_catalog()
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} cards, {skipped} unchanged or unreadable."))
@@ -0,0 +1,224 @@
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import tempfile
+from datetime import UTC, datetime
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_databases, teardown_databases
+
+from mentors.models import Mentor
+from tarot import model_router
+from tarot.enums import PreValidationModeEnum
+from tarot.llm_scheduler import get_scheduler
+from tarot.loadtest import SCENARIOS, FakeLLM, FakeLLMConfig, LoadSession, install_query_counter, run_scenario
+from tarot.models import Card
+from users.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the API offline against a throwaway database, with both agents served by a fake model. "
+        "Reports throughput, p50/p95/p99 latency and DB queries per request for each endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "scenarios", nargs="*", help=f"Scenarios to run, out of {', '.join(SCENARIOS)} (default: all)."
+        )
+        parser.add_argument("--requests", type=int, default=200, help="Iterations per scenario.")
+        parser.add_argument("--concurrency", type=int, default=20, help="Iterations in flight at the same time.")
+        parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per fake model request.")
+        parser.add_argument("--llm-jitter", type=float, default=0.1, help="Uniform +/- seconds around the latency.")
+        parser.add_argument("--llm-request-tokens", type=int, default=400)
+        parser.add_argument("--llm-response-tokens", type=int, default=300)
+        parser.add_argument("--llm-failure-rate", type=float, default=0.0, help="Share of model requests that fail.")
+        parser.add_argument(
+            "--llm-slow-rate", type=float, default=0.0, help="Share of model requests in the latency tail."
+        )
+        parser.add_argument(
+            "--llm-slow-factor", type=float, default=5.0, help="How many times slower tail requests are."
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--prevalidation",
+            choices=list(PreValidationModeEnum),
+            help="Override QUESTION_PREVALIDATION; 'off' sends every question to the validation model.",
+        )
+        parser.add_argument(
+            "--hedging", choices=["on", "off"], help="Override LLM_HEDGING for the celestial agent runs."
+        )
+        parser.add_argument(
+            "--output",
+            help="Where to write the JSON results (default: loadtest-results/<timestamp>-<commit>.json).",
+        )
+        parser.add_argument("--compare", help="Results file of an earlier run to print the differences against.")
+
+    def handle(self, *args, **options):
+        # The tier models get an OpenAI client when first routed to; the fake model never uses it
+        os.environ.setdefault("OPENAI_API_KEY", "loadtest-offline")
+        from celestial_insight.asgi import application
+
+        scenarios = options["scenarios"] or list(SCENARIOS)
+        if unknown := set(scenarios) - set(SCENARIOS):
+            msg = f"Unknown scenarios: {', '.join(sorted(unknown))}."
+            raise CommandError(msg)
+        baseline = self._load(options["compare"]) if options["compare"] else None
+        config = FakeLLMConfig(
+            latency=options["llm_latency"],
+            jitter=options["llm_jitter"],
+            request_tokens=options["llm_request_tokens"],
+            response_tokens=options["llm_response_tokens"],
+            failure_rate=options["llm_failure_rate"],
+            slow_rate=options["llm_slow_rate"],
+            slow_factor=options["llm_slow_factor"],
+            seed=options["seed"],
+        )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            if connection.vendor == "sqlite":
+                # A file instead of the default in-memory test database, so the pragmas and locking match production
+                settings.DATABASES["default"].setdefault("TEST", {})["NAME"] = str(Path(tmp) / "loadtest.sqlite3")
+            old_config = setup_databases(verbosity=0, interactive=False)
+            try:
+                session, card_names = self._seed()
+                llm = FakeLLM(config, card_names)
+                install_query_counter()
+                results = {}
+                prevalidation = options["prevalidation"] or settings.QUESTION_PREVALIDATION
+                # Every request comes from the one load-test user, who stands in for many: only the
+                # process-wide limits of the LLM scheduler apply
+                with (
+                    llm.installed(),
+                    override_settings(
+                        QUESTION_PREVALIDATION=prevalidation,
+                        LLM_QUEUE_MAX_PER_USER=settings.LLM_QUEUE_MAX_SIZE,
+                        LLM_HEDGING=self._hedging(options),
+                    ),
+                ):
+                    for scenario in scenarios:
+                        self.stdout.write(f"Running {scenario} ({options['requests']} x {options['concurrency']})...")
+                        results[scenario] = asyncio.run(
+                            run_scenario(
+                                application,
+                                scenario,
+                                session,
+                                requests=options["requests"],
+                                concurrency=options["concurrency"],
+                            )
+                        )
+            finally:
+                teardown_databases(old_config, verbosity=0)
+
+        report = {
+            "meta": self._meta(options, config),
+            "llm": {"calls": dict(llm.calls), "failures": dict(llm.failures)},
+            "model_tiers": model_router.stats_summary(),
+            "llm_scheduler": get_scheduler().summary(),
+            "scenarios": results,
+        }
+        output = Path(options["output"] or self._default_output(report["meta"]))
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, indent=2))
+
+        self._print(report, baseline)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {output}"))
+
+    def _seed(self) -> tuple[LoadSession, list[str]]:
+        # The sample readings in the tarot fixture belong to user 1, so the load-test user comes first
+        user = User.objects.create_user(username="loadtest", password=None)
+        call_command("loaddata", "mentor_data", "tarot_data", verbosity=0)
+        UserProfile.objects.filter(user=user).update(available_tokens=10**9)
+
+        client = Client()
+        client.force_login(user)
+        session = LoadSession(
+            cookies={name: morsel.value for name, morsel in client.cookies.items()},
+            mentor_id=Mentor.objects.filter(is_active=True).values_list("id", flat=True).first(),
+        )
+        return session, list(Card.objects.values_list("name", flat=True))
+
+    def _meta(self, options, config: FakeLLMConfig) -> dict:
+        return {
+            "timestamp": datetime.now(UTC).isoformat(timespec="seconds"),
+            "commit": self._commit(),
+            "database": connection.vendor,
+            "requests": options["requests"],
+            "concurrency": options["concurrency"],
+            "fake_llm": vars(config),
+            "prevalidation": options["prevalidation"] or settings.QUESTION_PREVALIDATION,
+            "hedging": self._hedging(options),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+        }
+
+    def _hedging(self, options) -> bool:
+        return options["hedging"] == "on" if options["hedging"] else settings.LLM_HEDGING
+
+    def _commit(self) -> str:
+        try:
+            return subprocess.run(  # noqa: S603
+                ["git", "rev-parse", "--short", "HEAD"],  # noqa: S607
+                capture_output=True,
+                text=True,
+                check=True,
+                cwd=settings.BASE_DIR,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return "unknown"
+
+    def _default_output(self, meta: dict) -> Path:
+        stamp = meta["timestamp"].replace(":", "").replace("-", "").split("+")[0]
+        return settings.BASE_DIR / "loadtest-results" / f"{stamp}-{meta['commit']}.json"
+
+    def _load(self, path: str) -> dict:
+        try:
+            return json.loads(Path(path).read_text())
+        except (OSError, ValueError) as e:
+            msg = f"Cannot read results to compare against: {e}"
+            raise CommandError(msg) from e
+
+    def _print(self, report: dict, baseline: dict | None) -> None:
+        header = (
+            f"{'endpoint':<36} {'reqs':>6} {'err':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'q/req':>6}"
+        )
+        self.stdout.write(header)
+        for scenario, result in report["scenarios"].items():
+            self.stdout.write(f"[{scenario}] {result['elapsed_s']}s")
+            for endpoint, stats in result["endpoints"].items():
+                self.stdout.write(
+                    f"  {endpoint:<34} {stats['requests']:>6} {stats['errors']:>5} {stats['throughput_rps']:>8} "
+                    f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8} {stats['queries_per_request']:>6}"
+                )
+                before = (baseline or {}).get("scenarios", {}).get(scenario, {}).get("endpoints", {}).get(endpoint)
+                if before:
+                    self.stdout.write(
+                        f"{'  vs ' + baseline['meta']['commit']:<36} {'':>6} {'':>5} "
+                        f"{self._delta(before['throughput_rps'], stats['throughput_rps']):>8} "
+                        f"{self._delta(before['p50_ms'], stats['p50_ms']):>8} "
+                        f"{self._delta(before['p95_ms'], stats['p95_ms']):>8} "
+                        f"{self._delta(before['p99_ms'], stats['p99_ms']):>8} "
+                        f"{self._delta(before['queries_per_request'], stats['queries_per_request']):>6}"
+                    )
+        self.stdout.write(f"Fake model calls: {report['llm']['calls']}, failures: {report['llm']['failures']}")
+        scheduler = report["llm_scheduler"]
+        self.stdout.write(
+            f"LLM scheduler: peak queue {scheduler['peak_waiting']}, queued {scheduler['queued']}, "
+            f"rejected {scheduler['rejected_full'] + scheduler['rejected_user']}, timeouts {scheduler['timeouts']}, "
+            f"wait p95 {scheduler['wait_p95_ms']} ms"
+        )
+
+    @staticmethod
+    def _delta(before: float, after: float) -> str:
+        if not before:
+            return "-"
+        return f"{(after - before) / before:+.0%}"
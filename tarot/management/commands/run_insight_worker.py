@@ -0,0 +1,35 @@
+import asyncio
+import os
+import signal
+import socket
+
+from django.core.management.base import BaseCommand
+
+from tarot.services.job_service import run_worker
+
+
+class Command(BaseCommand):
+    help = "Run a bounded pool of workers that drain the queued celestial insight jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=4, help="Number of jobs processed at the same time.")
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds an idle worker waits before checking the queue again.",
+        )
+
+    def handle(self, *args, **options):
+        asyncio.run(self._serve(options["concurrency"], options["poll_interval"]))
+
+    async def _serve(self, concurrency: int, poll_interval: float):
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self.stdout.write(f"Starting {concurrency} insight workers ({prefix}); press Ctrl+C to stop.")
+        await asyncio.gather(*(run_worker(f"{prefix}:{n}", stop, poll_interval) for n in range(concurrency)))
+        self.stdout.write(self.style.SUCCESS("Insight workers stopped."))
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.5 on 2026-10-17 00:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_card_keywords(apps, schema_editor):
+    Card = apps.get_model('tarot', 'Card')
+    CardKeyword = apps.get_model('tarot', 'CardKeyword')
+    rows = []
+    for card_id, keywords in Card.objects.values_list('id', 'keywords'):
+        normalized = dict.fromkeys(keyword.strip().casefold() for keyword in keywords.split(','))
+        rows.extend(CardKeyword(card_id=card_id, keyword=keyword) for keyword in normalized if keyword)
+    CardKeyword.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tarot', '0009_remove_suit_color_card_slug_reading_mentor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CardKeyword',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('keyword', models.CharField(db_index=True, max_length=255, verbose_name='Keyword')),
+                ('card', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='keyword_set', to='tarot.card', verbose_name='Card')),
+            ],
+            options={
+                'verbose_name': 'Card Keyword',
+                'verbose_name_plural': 'Card Keywords',
+                'ordering': ['keyword'],
+                'unique_together': {('card', 'keyword')},
+            },
+        ),
+        migrations.RunPython(populate_card_keywords, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-17 00:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tarot', '0010_cardkeyword'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='card',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Storage names of the generated thumbnail and WebP derivatives of the image.', verbose_name='Image Variants'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.5 on 2026-10-17 00:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mentors', '0002_mentor_slug'),
+        ('tarot', '0011_card_image_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reading',
+            index=models.Index(fields=['user', '-date', '-id'], name='reading_user_date_id_idx'),
+        ),
+    ]
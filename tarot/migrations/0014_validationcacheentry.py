@@ -0,0 +1,28 @@
+# Generated by Django 5.1.5 on 2026-10-17 00:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tarot', '0013_insightjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ValidationCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True, verbose_name='Key')),
+                ('result', models.JSONField(verbose_name='Result')),
+                ('tokens', models.PositiveIntegerField(default=0, verbose_name='Tokens')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Expires At')),
+                ('last_used_at', models.DateTimeField(db_index=True, verbose_name='Last Used At')),
+            ],
+            options={
+                'verbose_name': 'Validation Cache Entry',
+                'verbose_name_plural': 'Validation Cache Entries',
+            },
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.1.5 on 2026-10-17 00:42
+
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef
+
+THEME_PATTERN = re.compile(r'Theme:\s*([^,\n]+)')
+BATCH_SIZE = 500
+
+
+def backfill_status_and_theme(apps, schema_editor):
+    Reading = apps.get_model('tarot', 'Reading')
+    ReadingCard = apps.get_model('tarot', 'ReadingCard')
+
+    has_cards = Exists(ReadingCard.objects.filter(reading=OuterRef('pk')))
+    Reading.objects.exclude(celestial_insight='').filter(has_cards).update(status='completed')
+    Reading.objects.filter(status='created', notes__contains='Theme:').update(status='validated')
+
+    # Walk the readings in primary key order, one batch in memory at a time
+    readings = Reading.objects.filter(notes__contains='Theme:').order_by('pk').values_list('id', 'notes')
+    last_id = 0
+    while batch := list(readings.filter(pk__gt=last_id)[:BATCH_SIZE]):
+        last_id = batch[-1][0]
+        Reading.objects.bulk_update(
+            [
+                Reading(id=reading_id, theme=match.group(1).strip().lower()[:100])
+                for reading_id, notes in batch
+                if (match := THEME_PATTERN.search(notes))
+            ],
+            ['theme'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mentors', '0002_mentor_slug'),
+        ('tarot', '0014_validationcacheentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reading',
+            name='status',
+            field=models.CharField(choices=[('created', 'Created'), ('validated', 'Validated'), ('completed', 'Completed'), ('failed', 'Failed')], default='created', max_length=10, verbose_name='Status'),
+        ),
+        migrations.AddField(
+            model_name='reading',
+            name='theme',
+            field=models.CharField(blank=True, db_index=True, max_length=100, verbose_name='Theme'),
+        ),
+        migrations.RunPython(backfill_status_and_theme, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='reading',
+            index=models.Index(fields=['user', 'status', '-date', '-id'], name='reading_user_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reading',
+            index=models.Index(fields=['status', '-date'], name='reading_status_date_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.5 on 2026-10-17 01:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+MIN_TOKEN_COST = 250  # tarot.services.reading_service.MIN_TOKEN_COST when the jobs were queued
+
+
+def hold_active_job_tokens(apps, schema_editor):
+    # The tokens of queued and running jobs were only recorded in the ledger; give them their hold
+    InsightJob = apps.get_model('tarot', 'InsightJob')
+    TokenHold = apps.get_model('users', 'TokenHold')
+
+    for job in InsightJob.objects.filter(status__in=('pending', 'running'), token_hold__isnull=True):
+        job.token_hold = TokenHold.objects.create(
+            user_id=job.user_id, amount=MIN_TOKEN_COST, reference=f'insight:{job.reading_id}'
+        )
+        job.save(update_fields=['token_hold'])
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tarot', '0015_reading_status_theme'),
+        ('users', '0004_tokenhold'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='insightjob',
+            name='token_hold',
+            field=models.OneToOneField(blank=True, help_text='The tokens reserved when the job was queued, held across its attempts.', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='insight_job', to='users.tokenhold', verbose_name='Token Hold'),
+        ),
+        migrations.RunPython(hold_active_job_tokens, migrations.RunPython.noop),
+    ]
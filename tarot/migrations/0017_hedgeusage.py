@@ -0,0 +1,32 @@
+# Generated by Django 5.1.5 on 2026-10-17 01:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tarot', '0016_insightjob_token_hold'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HedgeUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('agent', models.CharField(max_length=100, verbose_name='Agent')),
+                ('tier', models.CharField(choices=[('fast', 'Fast'), ('standard', 'Standard'), ('premium', 'Premium')], max_length=10, verbose_name='Tier')),
+                ('model', models.CharField(max_length=100, verbose_name='Model')),
+                ('request_tokens', models.PositiveIntegerField(default=0, verbose_name='Request Tokens')),
+                ('response_tokens', models.PositiveIntegerField(default=0, verbose_name='Response Tokens')),
+                ('cut_off', models.BooleanField(default=False, help_text='Cancelled with a request in flight, whose usage the provider never reported.', verbose_name='Cut Off')),
+                ('estimated_tokens', models.PositiveIntegerField(default=0, help_text="Prompt tokens of the cut-off request, estimated from the winner's; its response is unknown.", verbose_name='Estimated Tokens')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created At')),
+            ],
+            options={
+                'verbose_name': 'Hedge Usage',
+                'verbose_name_plural': 'Hedge Usage',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.5 on 2026-10-17 01:45
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def rename_duplicate_cards(apps, schema_editor):
+    # Keep the first card of each name; later ones get their id appended, to be fixed in the admin
+    Card = apps.get_model('tarot', 'Card')
+
+    duplicated = Card.objects.values('name').annotate(count=Count('id')).filter(count__gt=1).values_list('name', flat=True)
+    for card in Card.objects.filter(name__in=list(duplicated)).order_by('name', 'id'):
+        if Card.objects.filter(name=card.name, id__lt=card.id).exists():
+            card.name = f'{card.name[:90]} ({card.id})'
+            card.save(update_fields=['name'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tarot', '0017_hedgeusage'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicate_cards, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='card',
+            name='name',
+            field=models.CharField(max_length=100, unique=True, verbose_name='Name'),
+        ),
+    ]
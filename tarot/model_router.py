@@ -0,0 +1,335 @@
+"""
+Per-request model tiers for the agents.
+
+`route_validation` and `route_insight` pick a tier (see `LLM_MODEL_TIERS`); `arun` and
+`arun_stream` run an agent on that tier's model once `llm_scheduler` admits the run, fall
+back along `LLM_TIER_FALLBACKS` when the model call fails, and record latency and token
+usage per agent and tier in `stats`.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import DatabaseError
+from pydantic_ai import Agent
+from pydantic_ai.models import Model, infer_model
+from pydantic_ai.result import RunResult, StreamedRunResult
+from pydantic_ai.usage import Usage
+
+from celestial_insight.metrics import percentile
+
+from .enums import ModelTierEnum, ReadingTypeEnum
+from .llm_scheduler import get_scheduler
+from .models import HedgeUsage
+
+SHORT_QUESTION = 120  # Characters up to which a single-card question goes to the fast tier
+LONG_QUESTION = 400  # Characters from which a question goes to the premium tier
+PREMIUM_MYSTICAL_LEVEL = 8  # Mentors from this level on give the most elaborate readings
+PREMIUM_SPREADS = frozenset({ReadingTypeEnum.CELTIC_CROSS_SPREAD, ReadingTypeEnum.HORSESHOE_SPREAD})
+LATENCY_WINDOW = 1000  # Latest runs per agent and tier the latency percentiles are computed over
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TierStats:
+    runs: int = 0  # Agent runs started on this tier, including fallbacks
+    failures: int = 0
+    fallbacks: int = 0  # Runs served here after the routed tier failed
+    request_tokens: int = 0
+    response_tokens: int = 0
+    hedges: int = 0  # Runs that got a second, identical request
+    hedge_wins: int = 0  # Hedged runs the second request answered first
+    hedge_tokens: int = 0  # Reported for the losing requests; paid by us, not charged to users (see `HedgeUsage`)
+    hedge_estimated_tokens: int = 0  # Prompts of losing requests cancelled in flight, which report no usage
+    failed_tokens: int = 0  # Spent by failed runs, e.g. before their result failed validation
+    latencies: deque[float] = field(default_factory=lambda: deque(maxlen=LATENCY_WINDOW))
+
+    def record(self, elapsed: float, usage: Usage) -> None:
+        self.latencies.append(elapsed)
+        self.request_tokens += usage.request_tokens or 0
+        self.response_tokens += usage.response_tokens or 0
+
+    def record_failure(self, usage: Usage) -> None:
+        # Not timed: the latency percentiles (and the hedge delay) describe answered runs
+        self.failures += 1
+        self.failed_tokens += usage.total_tokens or 0
+
+    def summary(self) -> dict:
+        succeeded = self.runs - self.failures
+        return {
+            "runs": self.runs,
+            "failures": self.failures,
+            "fallbacks": self.fallbacks,
+            "p50_ms": round(percentile(self.latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(self.latencies, 95) * 1000, 1),
+            "request_tokens": self.request_tokens,
+            "response_tokens": self.response_tokens,
+            "avg_tokens": round((self.request_tokens + self.response_tokens) / succeeded, 1) if succeeded else 0.0,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_tokens": self.hedge_tokens,
+            "hedge_estimated_tokens": self.hedge_estimated_tokens,
+            "failed_tokens": self.failed_tokens,
+        }
+
+
+stats: dict[tuple[str, ModelTierEnum], TierStats] = {}
+_models: dict[str, Model] = {}
+_models_lock = threading.Lock()
+
+
+def get_model(tier: ModelTierEnum) -> Model:
+    """The (shared) model instance configured for `tier`."""
+    name = settings.LLM_MODEL_TIERS[tier]
+    model = _models.get(name)
+    if model is None:
+        with _models_lock:
+            model = _models.get(name) or _models.setdefault(name, infer_model(name))
+    return model
+
+
+def route_validation(question: str) -> ModelTierEnum:
+    """Validation is a classification; every question goes to `VALIDATION_MODEL_TIER`."""
+    return ModelTierEnum(settings.VALIDATION_MODEL_TIER)
+
+
+def route_insight(question: str, reading_type: str, mystical_level: int = 0) -> ModelTierEnum:
+    """
+    Large spreads, long questions and the most mystical mentors get the premium tier; a short
+    single-card question the fast one; everything else `INSIGHT_MODEL_TIER`.
+    """
+    if reading_type in PREMIUM_SPREADS or len(question) >= LONG_QUESTION or mystical_level >= PREMIUM_MYSTICAL_LEVEL:
+        return ModelTierEnum.PREMIUM
+    if reading_type == ReadingTypeEnum.SINGLE_CARD and len(question) <= SHORT_QUESTION:
+        return ModelTierEnum.FAST
+    return ModelTierEnum(settings.INSIGHT_MODEL_TIER)
+
+
+def _tier_chain(tier: ModelTierEnum) -> list[ModelTierEnum]:
+    chain = [tier]
+    for fallback in settings.LLM_TIER_FALLBACKS.get(tier, []):
+        if fallback not in chain:
+            chain.append(ModelTierEnum(fallback))
+    return chain
+
+
+def _stats(agent: Agent, tier: ModelTierEnum) -> TierStats:
+    return stats.setdefault((agent.name or "agent", tier), TierStats())
+
+
+def _start(agent: Agent, tier: ModelTierEnum, attempt: int) -> TierStats:
+    tier_stats = _stats(agent, tier)
+    tier_stats.runs += 1
+    tier_stats.fallbacks += attempt > 1
+    return tier_stats
+
+
+async def arun(
+    agent: Agent,
+    tier: ModelTierEnum,
+    user_prompt: str,
+    *,
+    user_id: int | None = None,
+    hedge: bool = False,
+    **kwargs,
+) -> RunResult:
+    """
+    Run `agent` on the model of `tier`, falling back to the next tier whenever the run fails.
+
+    The run, fallbacks included, holds one slot of the LLM scheduler, queued under `user_id`.
+    With `hedge`, slow runs get a second request (see `_hedged_run`).
+    """
+    async with get_scheduler().slot(user_id):
+        return await _arun(agent, tier, user_prompt, hedge=hedge, **kwargs)
+
+
+async def _arun(agent: Agent, tier: ModelTierEnum, user_prompt: str, *, hedge: bool, **kwargs) -> RunResult:
+    chain = _tier_chain(tier)
+    for attempt, current in enumerate(chain, start=1):
+        tier_stats = _start(agent, current, attempt)
+        start = time.perf_counter()
+        usage = Usage()  # Filled in by the run even when it fails
+        try:
+            if hedge:
+                result = await _hedged_run(agent, current, tier_stats, user_prompt, usage=usage, **kwargs)
+            else:
+                result = await agent.run(user_prompt, model=get_model(current), usage=usage, **kwargs)
+            break
+        except Exception as e:
+            tier_stats.record_failure(usage)
+            if attempt == len(chain):
+                raise
+            logger.warning("%s failed on the %s tier, falling back: %s", agent.name, current, e)
+
+    tier_stats.record(time.perf_counter() - start, result.usage())
+    return result
+
+
+def _hedge_delay(tier_stats: TierStats) -> float | None:
+    """Seconds after which a run on this tier is hedged; None until enough runs were timed."""
+    if len(tier_stats.latencies) < settings.LLM_HEDGE_MIN_SAMPLES:
+        return None
+    return percentile(tier_stats.latencies, settings.LLM_HEDGE_PERCENTILE)
+
+
+def _may_hedge(tier_stats: TierStats) -> bool:
+    """Hedge within the budget, and only on a free scheduler slot: hedging must not add to a queue."""
+    within_budget = tier_stats.hedges < settings.LLM_HEDGE_BUDGET * tier_stats.runs
+    return within_budget and get_scheduler().try_acquire()
+
+
+# Writes of `HedgeUsage` rows still in flight; referenced here so they are not garbage collected
+_hedge_bookings: set[asyncio.Task] = set()
+
+
+def _book_loser(
+    agent: Agent, tier: ModelTierEnum, loser: asyncio.Task, usage: Usage, winner_usage: Usage | None
+) -> None:
+    """
+    Record the tokens of the request that lost a hedged run in `stats` and as a `HedgeUsage`.
+
+    A request cancelled in flight never reports its usage, though the provider may still bill
+    it. Only its prompt can be estimated, as the winner's per-request prompt, and that estimate
+    is kept apart from the reported tokens; whatever it had generated stays unknown.
+
+    The row is written in the background: the winner's answer never waits on (or fails with)
+    the database.
+    """
+    cut_off = loser.cancelled()
+    estimated = (winner_usage.request_tokens or 0) // max(winner_usage.requests, 1) if cut_off and winner_usage else 0
+    tier_stats = _stats(agent, tier)
+    tier_stats.hedge_tokens += usage.total_tokens or 0
+    tier_stats.hedge_estimated_tokens += estimated
+    hedge_usage = HedgeUsage(
+        agent=agent.name or "agent",
+        tier=tier,
+        model=settings.LLM_MODEL_TIERS[tier],
+        request_tokens=usage.request_tokens or 0,
+        response_tokens=usage.response_tokens or 0,
+        cut_off=cut_off,
+        estimated_tokens=estimated,
+    )
+    task = asyncio.create_task(_save_hedge_usage(hedge_usage))
+    _hedge_bookings.add(task)
+    task.add_done_callback(_hedge_bookings.discard)
+
+
+async def _save_hedge_usage(hedge_usage: HedgeUsage) -> None:
+    try:
+        await hedge_usage.asave()
+    except DatabaseError:
+        logger.exception("Could not record the usage of a losing hedge request")
+
+
+async def flush_hedge_usage() -> None:
+    """Wait until the `HedgeUsage` rows of the hedged runs finished so far are written."""
+    await asyncio.gather(*_hedge_bookings)
+
+
+async def _hedged_run(
+    agent: Agent, tier: ModelTierEnum, tier_stats: TierStats, user_prompt: str, *, usage: Usage, **kwargs
+) -> RunResult:
+    """
+    Run `agent`, and once the run takes longer than the `LLM_HEDGE_PERCENTILE` latency of
+    recent runs on the tier, start an identical one. The first to succeed wins and the other
+    is cancelled.
+
+    Hedges are capped at `LLM_HEDGE_BUDGET` of the tier's runs. The result carries the
+    winner's usage only, so the user pays what an unhedged run would have cost; the loser's
+    tokens are recorded by `_book_loser`. `usage` is filled in by the first request.
+    """
+    model = get_model(tier)
+    usages: dict[asyncio.Task, Usage] = {}
+
+    def start(usage: Usage) -> asyncio.Task:
+        task = asyncio.create_task(agent.run(user_prompt, model=model, usage=usage, **kwargs))
+        usages[task] = usage
+        return task
+
+    primary = start(usage)
+    delay = _hedge_delay(tier_stats)
+    try:
+        if delay is None or (await asyncio.wait({primary}, timeout=delay))[0] or not _may_hedge(tier_stats):
+            return await primary
+    except BaseException:
+        primary.cancel()
+        raise
+
+    tier_stats.hedges += 1
+    hedge_start = time.monotonic()
+    secondary = start(Usage())
+    pending = {primary, secondary}
+    winner = None
+    try:
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((task for task in done if not task.cancelled() and task.exception() is None), None)
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        get_scheduler().release(time.monotonic() - hedge_start)
+
+    if winner is None:
+        _book_loser(agent, tier, secondary, usages[secondary], None)
+        return primary.result()  # Both failed: raise the first request's error
+    loser = secondary if winner is primary else primary
+    result = winner.result()
+    tier_stats.hedge_wins += winner is secondary
+    _book_loser(agent, tier, loser, usages[loser], result.usage())
+    return result
+
+
+@asynccontextmanager
+async def arun_stream(
+    agent: Agent, tier: ModelTierEnum, user_prompt: str, *, user_id: int | None = None, **kwargs
+) -> AsyncIterator[StreamedRunResult]:
+    """
+    Streaming variant of `arun`, holding the scheduler slot until the stream is closed. Only a
+    failure to start the stream falls back to the next tier; once the first response arrived,
+    errors propagate to the caller. The run only counts as answered when the caller read the
+    stream to its end.
+    """
+    chain = _tier_chain(tier)
+    async with AsyncExitStack() as stack:
+        await stack.enter_async_context(get_scheduler().slot(user_id))
+        for attempt, current in enumerate(chain, start=1):
+            tier_stats = _start(agent, current, attempt)
+            start = time.perf_counter()
+            usage = Usage()
+            try:
+                result = await stack.enter_async_context(
+                    agent.run_stream(user_prompt, model=get_model(current), usage=usage, **kwargs)
+                )
+                break
+            except Exception as e:
+                tier_stats.record_failure(usage)
+                if attempt == len(chain):
+                    raise
+                logger.warning("%s failed to stream on the %s tier, falling back: %s", agent.name, current, e)
+
+        try:
+            yield result
+        except BaseException:
+            tier_stats.record_failure(result.usage())
+            raise
+        # Leaving the block before the stream ended (e.g. on a streamed card that did not fit) is a failure too
+        if result.is_complete:
+            tier_stats.record(time.perf_counter() - start, result.usage())
+        else:
+            tier_stats.record_failure(result.usage())
+
+
+def stats_summary() -> list[dict]:
+    return [
+        {"agent": agent, "tier": tier, "model": settings.LLM_MODEL_TIERS[tier], **tier_stats.summary()}
+        for (agent, tier), tier_stats in sorted(stats.items())
+    ]
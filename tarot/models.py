@@ -1,11 +1,20 @@
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 from django_extensions.db.fields import AutoSlugField
 
 from mentors.models import Mentor
-from tarot.choices import ARCANA_CHOICES, ORIENTATION_CHOICES, READING_TYPE_CHOICES
+from tarot.choices import (
+    ARCANA_CHOICES,
+    JOB_STATUS_CHOICES,
+    MODEL_TIER_CHOICES,
+    ORIENTATION_CHOICES,
+    READING_STATUS_CHOICES,
+    READING_TYPE_CHOICES,
+)
+from users.models import TokenHold
 
 
 class Suit(models.Model):
@@ -23,11 +32,18 @@ class Suit(models.Model):
 
 
 class Card(models.Model):
-    name = models.CharField(_("Name"), max_length=100)
+    name = models.CharField(_("Name"), max_length=100, unique=True)  # The celestial agent draws cards by name
     slug = AutoSlugField(populate_from="name")
     description = models.TextField(_("Description"))
     number = models.PositiveSmallIntegerField(_("Number"), null=True, blank=True)
     image = models.ImageField(_("Image"), upload_to="tarot_cards/", blank=True)
+    image_variants = models.JSONField(
+        _("Image Variants"),
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text=_("Storage names of the generated thumbnail and WebP derivatives of the image."),
+    )
     upright_meaning = models.TextField(_("Upright Meaning"))
     reversed_meaning = models.TextField(_("Reversed Meaning"))
 
@@ -52,16 +68,64 @@ class Card(models.Model):
     def __str__(self):
         return f"{self.name} ({self.suit.name})"
 
+    def variant_url(self, variant: str) -> str | None:
+        """URL of a generated image derivative, or None until it has been generated."""
+        name = self.image_variants.get(variant) if self.image_variants else None
+        return self.image.storage.url(name) if name else None
+
+    @property
+    def thumbnail(self) -> str | None:
+        return self.variant_url("thumbnail")
+
+    @property
+    def thumbnail_webp(self) -> str | None:
+        return self.variant_url("thumbnail_webp")
+
+    @property
+    def image_webp(self) -> str | None:
+        return self.variant_url("image_webp")
+
     def preview_image(self):
         if self.image:
             return format_html(
                 '<img src="{}" style="max-height: 100px;"/>',
-                self.image.url,
+                self.thumbnail or self.image.url,
             )
         return _("No image")
 
     preview_image.short_description = _("Card Image")
 
+    @property
+    def keyword_list(self) -> list[str]:
+        """Normalized (lower-cased, de-duplicated) keywords parsed from the comma-separated field."""
+        return list(
+            dict.fromkeys(keyword.strip().casefold() for keyword in self.keywords.split(",") if keyword.strip())
+        )
+
+    def sync_keywords(self):
+        """Replace the card's `CardKeyword` rows with the current `keywords` value."""
+        CardKeyword.objects.filter(card=self).delete()
+        CardKeyword.objects.bulk_create(CardKeyword(card=self, keyword=keyword) for keyword in self.keyword_list)
+
+
+class CardKeyword(models.Model):
+    card = models.ForeignKey(
+        Card,
+        on_delete=models.CASCADE,
+        related_name="keyword_set",
+        verbose_name=_("Card"),
+    )
+    keyword = models.CharField(_("Keyword"), max_length=255, db_index=True)
+
+    class Meta:
+        ordering = ["keyword"]
+        unique_together = ("card", "keyword")
+        verbose_name = _("Card Keyword")
+        verbose_name_plural = _("Card Keywords")
+
+    def __str__(self):
+        return self.keyword
+
 
 class Reading(models.Model):
     reading_type = models.CharField(
@@ -71,6 +135,8 @@ class Reading(models.Model):
     question = models.TextField(_("Question"), blank=True)
     notes = models.TextField(_("Notes"), blank=True)
     celestial_insight = models.TextField(_("Celestial Insight"), blank=True, default="")
+    status = models.CharField(_("Status"), max_length=10, choices=READING_STATUS_CHOICES, default="created")
+    theme = models.CharField(_("Theme"), max_length=100, blank=True, db_index=True)
 
     mentor = models.ForeignKey(
         Mentor,
@@ -90,6 +156,13 @@ class Reading(models.Model):
         null=True,
     )
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-date", "-id"], name="reading_user_date_id_idx"),
+            models.Index(fields=["user", "status", "-date", "-id"], name="reading_user_status_date_idx"),
+            models.Index(fields=["status", "-date"], name="reading_status_date_idx"),
+        ]
+
     def __str__(self):
         return _("Reading for {user} on {date}").format(user=self.user, date=self.date)
 
@@ -138,3 +211,97 @@ class ReadingCard(models.Model):
             position=self.position,
             role=role,
         )
+
+
+class InsightJob(models.Model):
+    """A queued celestial insight generation, drained by the `run_insight_worker` command."""
+
+    reading = models.ForeignKey(
+        Reading,
+        on_delete=models.CASCADE,
+        related_name="insight_jobs",
+        verbose_name=_("Reading"),
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="insight_jobs",
+        verbose_name=_("User"),
+    )
+    token_hold = models.OneToOneField(
+        TokenHold,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="insight_job",
+        verbose_name=_("Token Hold"),
+        help_text=_("The tokens reserved when the job was queued, held across its attempts."),
+    )
+    status = models.CharField(_("Status"), max_length=10, choices=JOB_STATUS_CHOICES, default="pending")
+    attempts = models.PositiveSmallIntegerField(_("Attempts"), default=0)
+    max_attempts = models.PositiveSmallIntegerField(_("Max Attempts"), default=3)
+    run_after = models.DateTimeField(_("Run After"), default=timezone.now)
+    locked_at = models.DateTimeField(_("Locked At"), null=True, blank=True)
+    locked_by = models.CharField(_("Locked By"), max_length=100, blank=True)
+    last_error = models.TextField(_("Last Error"), blank=True)
+    created_at = models.DateTimeField(_("Created At"), auto_now_add=True)
+    finished_at = models.DateTimeField(_("Finished At"), null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["status", "run_after"], name="insightjob_status_run_idx"),
+        ]
+        verbose_name = _("Insight Job")
+        verbose_name_plural = _("Insight Jobs")
+
+    def __str__(self):
+        return _("Insight job {id} for reading {reading_id} ({status})").format(
+            id=self.id, reading_id=self.reading_id, status=self.status
+        )
+
+
+class ValidationCacheEntry(models.Model):
+    key = models.CharField(_("Key"), max_length=64, unique=True)
+    result = models.JSONField(_("Result"))
+    tokens = models.PositiveIntegerField(_("Tokens"), default=0)
+    expires_at = models.DateTimeField(_("Expires At"), db_index=True)
+    last_used_at = models.DateTimeField(_("Last Used At"), db_index=True)
+
+    class Meta:
+        verbose_name = _("Validation Cache Entry")
+        verbose_name_plural = _("Validation Cache Entries")
+
+    def __str__(self):
+        return self.key
+
+
+class HedgeUsage(models.Model):
+    """Tokens of the losing request of a hedged agent run, spent on the house instead of charged to a user."""
+
+    agent = models.CharField(_("Agent"), max_length=100)
+    tier = models.CharField(_("Tier"), max_length=10, choices=MODEL_TIER_CHOICES)
+    model = models.CharField(_("Model"), max_length=100)
+    request_tokens = models.PositiveIntegerField(_("Request Tokens"), default=0)
+    response_tokens = models.PositiveIntegerField(_("Response Tokens"), default=0)
+    cut_off = models.BooleanField(
+        _("Cut Off"),
+        default=False,
+        help_text=_("Cancelled with a request in flight, whose usage the provider never reported."),
+    )
+    estimated_tokens = models.PositiveIntegerField(
+        _("Estimated Tokens"),
+        default=0,
+        help_text=_("Prompt tokens of the cut-off request, estimated from the winner's; its response is unknown."),
+    )
+    created_at = models.DateTimeField(_("Created At"), auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name = _("Hedge Usage")
+        verbose_name_plural = _("Hedge Usage")
+
+    def __str__(self):
+        return _("{tokens} tokens lost by {agent} on the {tier} tier").format(
+            tokens=self.request_tokens + self.response_tokens, agent=self.agent, tier=self.tier
+        )
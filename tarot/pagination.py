@@ -0,0 +1,45 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q, QuerySet
+from ninja.errors import HttpError
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(date: datetime, pk: int) -> str:
+    """Opaque cursor pointing just past the row with this (date, id)."""
+    return base64.urlsafe_b64encode(f"{date.isoformat()}|{pk}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        date, pk = raw.rsplit("|", 1)
+        return datetime.fromisoformat(date), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HttpError(400, "Invalid pagination cursor.") from None
+
+
+async def apaginate_by_date(queryset: QuerySet, cursor: str | None = None, limit: int = DEFAULT_PAGE_SIZE) -> dict:
+    """
+    Keyset-paginate `queryset` newest first on (date, id).
+
+    Each page is a single indexed range scan, so its cost does not depend on how deep
+    into the result set the cursor points.
+    """
+    limit = min(max(limit, 1), MAX_PAGE_SIZE)
+    queryset = queryset.order_by("-date", "-id")
+    if cursor:
+        date, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(date__lt=date) | Q(date=date, id__lt=pk))
+
+    items = [item async for item in queryset[: limit + 1]]
+    has_next = len(items) > limit
+    items = items[:limit]
+    return {
+        "items": items,
+        "next": encode_cursor(items[-1].date, items[-1].id) if has_next else None,
+    }
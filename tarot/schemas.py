@@ -16,6 +16,9 @@ class CardSchemaShort(Schema):
     slug: str
     number: int | None
     image: str | None
+    thumbnail: str | None = None
+    thumbnail_webp: str | None = None
+    image_webp: str | None = None
     upright_meaning: str
     reversed_meaning: str
     keywords: str
@@ -38,14 +41,23 @@ class ReadingSchemaShort(Schema):
     id: int
     reading_type: str
     date: datetime
+    status: str
+    theme: str = ""
     question: str | None = None
     notes: str | None = None
 
 
+class ReadingPageSchema(Schema):
+    items: list[ReadingSchemaShort]
+    next: str | None = None
+
+
 class ReadingSchema(Schema):
     id: int
     reading_type: str
     date: datetime
+    status: str
+    theme: str = ""
     question: str | None = None
     notes: str | None = None
     cards: list[ReadingCardSchema]
@@ -53,3 +65,61 @@ class ReadingSchema(Schema):
 
 class CelestialInsightResponseSchema(ReadingSchema):
     celestial_insight: str
+
+
+class InsightJobSchema(Schema):
+    id: int
+    reading_id: int
+    status: str
+    attempts: int
+    max_attempts: int
+    run_after: datetime
+    created_at: datetime
+    finished_at: datetime | None = None
+    last_error: str | None = None
+    result: CelestialInsightResponseSchema | None = None
+
+
+class ValidationCacheStatsSchema(Schema):
+    backend: str
+    entries: int
+    hits: int
+    misses: int
+    hit_rate: float
+    tokens_saved: int
+
+
+class ModelTierStatsSchema(Schema):
+    agent: str
+    tier: str
+    model: str
+    runs: int
+    failures: int
+    fallbacks: int
+    p50_ms: float
+    p95_ms: float
+    request_tokens: int
+    response_tokens: int
+    avg_tokens: float
+    hedges: int
+    hedge_wins: int
+    hedge_tokens: int
+    hedge_estimated_tokens: int
+    failed_tokens: int
+
+
+class LLMSchedulerStatsSchema(Schema):
+    max_concurrency: int
+    active: int
+    waiting: int
+    waiting_users: int
+    peak_waiting: int
+    admitted: int
+    queued: int
+    rejected_user: int
+    rejected_full: int
+    timeouts: int
+    wait_p50_ms: float
+    wait_p95_ms: float
+    wait_max_ms: float
+    avg_hold_ms: float
@@ -0,0 +1,78 @@
+import bisect
+import math
+import re
+from collections import defaultdict
+from collections.abc import Iterable
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .catalog import CardRecord
+
+# Relative weight of a term hit in each card field.
+FIELD_WEIGHTS = {
+    "name": 5.0,
+    "keywords": 3.0,
+    "upright_meaning": 1.0,
+    "reversed_meaning": 1.0,
+    "description": 1.0,
+}
+
+STOP_WORDS = frozenset(
+    {"a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it", "of", "on", "or", "the", "to"}
+)
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    return [token for token in _TOKEN.findall(text.casefold()) if token not in STOP_WORDS]
+
+
+class CardSearchIndex:
+    """
+    In-process inverted index over card text fields.
+
+    Each term maps to per-card weights (field weight x term frequency); queries are ranked
+    by the sum of weight x idf over all query terms, and every term must match (a term also
+    matches indexed words it is a prefix of, so "transform" finds "transformation").
+    """
+
+    __slots__ = ("_idf", "_postings", "_vocabulary")
+
+    def __init__(self, cards: Iterable["CardRecord"]):
+        postings: dict[str, dict[int, float]] = defaultdict(lambda: defaultdict(float))
+        card_count = 0
+        for card in cards:
+            card_count += 1
+            for field, weight in FIELD_WEIGHTS.items():
+                for term in tokenize(getattr(card, field)):
+                    postings[term][card.id] += weight
+
+        self._postings = {term: dict(weights) for term, weights in postings.items()}
+        self._vocabulary = sorted(self._postings)
+        self._idf = {term: math.log(1 + card_count / len(weights)) for term, weights in self._postings.items()}
+
+    def _expand(self, term: str) -> list[str]:
+        start = bisect.bisect_left(self._vocabulary, term)
+        end = bisect.bisect_left(self._vocabulary, term + "\uffff", lo=start)
+        return self._vocabulary[start:end]
+
+    def scores(self, query: str) -> dict[int, float]:
+        """Return relevance scores by card id for cards matching every term of `query`."""
+        scores: dict[int, float] | None = None
+        for term in dict.fromkeys(tokenize(query)):
+            term_scores: dict[int, float] = defaultdict(float)
+            for word in self._expand(term):
+                idf = self._idf[word]
+                for card_id, weight in self._postings[word].items():
+                    term_scores[card_id] += weight * idf
+
+            if scores is None:
+                scores = dict(term_scores)
+            else:
+                scores = {
+                    card_id: score + term_scores[card_id] for card_id, score in scores.items() if card_id in term_scores
+                }
+            if not scores:
+                break
+        return scores or {}
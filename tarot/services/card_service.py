@@ -1,18 +1,30 @@
 from django.shortcuts import aget_object_or_404
 
+from tarot.catalog import CardCatalog, aget_catalog
 from tarot.filters import CardFilterSchema
-from tarot.models import Card, Reading
+from tarot.models import Reading, ReadingCard
 
 
-async def list_cards(filters: CardFilterSchema):
-    cards = Card.objects.all()
-    return filters.filter(cards)
+async def list_cards(filters: CardFilterSchema, catalog: CardCatalog | None = None):
+    catalog = catalog or await aget_catalog()
+    cards = catalog.filter_cards(
+        suit=filters.suit, name=filters.name, keywords=filters.keywords, keyword=filters.keyword
+    )
+    if filters.q:
+        return catalog.search(filters.q, cards)
+    return cards
 
 
-async def get_card(card_slug: str):
-    return await aget_object_or_404(Card, slug=card_slug)
+async def get_card(card_slug: str, catalog: CardCatalog | None = None):
+    catalog = catalog or await aget_catalog()
+    return catalog.get(card_slug)
 
 
 async def list_cards_in_reading(reading_id: int):
-    reading = await aget_object_or_404(Reading, id=reading_id)
-    return reading.cards.all()
+    reading_cards = [
+        reading_card async for reading_card in ReadingCard.objects.filter(reading_id=reading_id).select_related("card")
+    ]
+    if not reading_cards:
+        # Only an empty result needs the extra lookup to tell "no cards yet" from "no such reading"
+        await aget_object_or_404(Reading, id=reading_id)
+    return reading_cards
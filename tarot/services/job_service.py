@@ -0,0 +1,183 @@
+import asyncio
+import contextlib
+import logging
+import random
+from datetime import timedelta
+
+from django.db.models import F, Q
+from django.shortcuts import aget_object_or_404
+from django.utils import timezone
+
+from tarot.enums import JobStatusEnum
+from tarot.llm_scheduler import LLMOverloadedError
+from tarot.models import InsightJob, Reading
+from tarot.services.reading_service import MIN_TOKEN_COST, readings_with_cards, run_insight
+from users.tokens import TokenReservation, reserve_tokens
+
+JOB_RETRY_BACKOFF = 10  # Seconds before the first retry; doubles with each attempt
+JOB_MAX_BACKOFF = 600
+JOB_LEASE_SECONDS = 300  # A running job not finished within this time is considered abandoned
+JOB_POLL_INTERVAL = 0.5  # Seconds between status checks while long-polling
+MAX_JOB_WAIT = 30  # Upper bound for the long-poll `wait` parameter
+CLAIM_BATCH = 10
+
+ACTIVE_STATUSES = (JobStatusEnum.PENDING, JobStatusEnum.RUNNING)
+FINISHED_STATUSES = (JobStatusEnum.SUCCEEDED, JobStatusEnum.FAILED)
+
+logger = logging.getLogger(__name__)
+
+
+async def enqueue_insight(request, reading_id: int) -> InsightJob | str:
+    """
+    Queue insight generation for a reading, reusing a job already pending or running for it.
+
+    The upfront tokens are reserved once, when the job is created, and held until the job
+    succeeds or finally fails (then they are refunded).
+    """
+    reading = await aget_object_or_404(Reading, id=reading_id, user=request.user)
+
+    job = await InsightJob.objects.filter(reading=reading, status__in=ACTIVE_STATUSES).afirst()
+    if job:
+        return job
+
+    reservation = await reserve_tokens(request.user, MIN_TOKEN_COST, reference=_reservation_reference(reading.id))
+    if reservation is None:
+        return "Insufficient tokens to generate celestial insight."
+
+    try:
+        return await InsightJob.objects.acreate(reading=reading, user=request.user, token_hold_id=reservation.id)
+    except Exception:
+        await reservation.refund()
+        raise
+
+
+def _reservation_reference(reading_id: int) -> str:
+    return f"insight:{reading_id}"
+
+
+async def get_job(request, job_id: int, wait: float = 0) -> InsightJob:
+    """Return the job; with `wait`, long-poll up to that many seconds for it to finish."""
+    job = await aget_object_or_404(InsightJob, id=job_id, user=request.user)
+    deadline = asyncio.get_running_loop().time() + min(max(wait, 0), MAX_JOB_WAIT)
+    while job.status not in FINISHED_STATUSES and asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(JOB_POLL_INTERVAL)
+        await job.arefresh_from_db()
+
+    job.result = None
+    if job.status == JobStatusEnum.SUCCEEDED:
+        job.result = await readings_with_cards().aget(id=job.reading_id)
+    return job
+
+
+def _abandoned(now) -> Q:
+    return Q(status=JobStatusEnum.RUNNING, locked_at__lt=now - timedelta(seconds=JOB_LEASE_SECONDS))
+
+
+def _claimable(now) -> Q:
+    return Q(status=JobStatusEnum.PENDING, run_after__lte=now) | (_abandoned(now) & Q(attempts__lt=F("max_attempts")))
+
+
+async def claim_next_job(worker_id: str) -> InsightJob | None:
+    """
+    Atomically claim the next due job (or one whose worker died mid-run, while it has
+    attempts left).
+
+    Claiming is a conditional UPDATE, so concurrent workers never run the same job;
+    this works the same on SQLite and PostgreSQL.
+    """
+    now = timezone.now()
+    await _fail_abandoned_jobs(now)
+    candidates = InsightJob.objects.filter(_claimable(now)).order_by("run_after", "id").values_list("id", flat=True)
+    async for job_id in candidates[:CLAIM_BATCH]:
+        claimed = await InsightJob.objects.filter(_claimable(now), id=job_id).aupdate(
+            status=JobStatusEnum.RUNNING,
+            locked_at=now,
+            locked_by=worker_id,
+            attempts=F("attempts") + 1,
+        )
+        if claimed:
+            return await InsightJob.objects.select_related("reading", "token_hold").aget(id=job_id)
+    return None
+
+
+async def _fail_abandoned_jobs(now) -> None:
+    """Fail the jobs whose worker died on their last attempt, refunding their reserved tokens."""
+    exhausted = InsightJob.objects.filter(_abandoned(now), attempts__gte=F("max_attempts")).select_related("token_hold")
+    async for job in exhausted[:CLAIM_BATCH]:
+        failed = await InsightJob.objects.filter(_abandoned(now), id=job.id).aupdate(
+            status=JobStatusEnum.FAILED,
+            finished_at=now,
+            last_error="The worker stopped responding on the last attempt.",
+            locked_at=None,
+            locked_by="",
+        )
+        if failed:
+            await _reservation(job).refund()
+            logger.warning("Insight job %s abandoned on its last attempt", job.id)
+
+
+def _reservation(job: InsightJob) -> TokenReservation:
+    """The hold `enqueue_insight` created (loaded with the job), shared by every attempt of the job."""
+    return TokenReservation(
+        id=job.token_hold_id,
+        user_id=job.user_id,
+        amount=job.token_hold.amount if job.token_hold_id else 0,
+        reference=_reservation_reference(job.reading_id),
+    )
+
+
+def _retry_delay(attempts: int) -> float:
+    delay = min(JOB_RETRY_BACKOFF * 2 ** (attempts - 1), JOB_MAX_BACKOFF)
+    return delay * random.uniform(0.8, 1.2)  # noqa: S311 (jitter, not security)
+
+
+async def process_job(job: InsightJob) -> None:
+    """
+    Run a claimed job and record its outcome.
+
+    The outcome is only saved while the job is still held by this claim (same worker and
+    attempt): once the lease expired and another worker reclaimed it, the reclaimer owns it.
+    """
+    reservation = _reservation(job)
+    try:
+        result = await run_insight(job.reading, reservation)
+        error = result if isinstance(result, str) else ""
+    except LLMOverloadedError as e:
+        error = str(e)  # Retried with the usual backoff, like any failed attempt
+    except Exception as e:
+        logger.exception("Insight job %s crashed", job.id)
+        error = f"Error generating celestial insight: {e}"
+
+    now = timezone.now()
+    outcome = {"last_error": error, "locked_at": None, "locked_by": ""}
+    if not error:
+        outcome |= {"status": JobStatusEnum.SUCCEEDED, "finished_at": now}
+    elif job.attempts < job.max_attempts:
+        outcome |= {
+            "status": JobStatusEnum.PENDING,
+            "run_after": now + timedelta(seconds=_retry_delay(job.attempts)),
+        }
+    else:
+        outcome |= {"status": JobStatusEnum.FAILED, "finished_at": now}
+
+    held = InsightJob.objects.filter(
+        id=job.id, status=JobStatusEnum.RUNNING, locked_by=job.locked_by, attempts=job.attempts
+    )
+    if not await held.aupdate(**outcome):
+        logger.warning("Insight job %s attempt %s lost its lease; outcome discarded", job.id, job.attempts)
+        return
+    if outcome["status"] == JobStatusEnum.FAILED:
+        await reservation.refund()
+
+    logger.info("Insight job %s attempt %s: %s", job.id, job.attempts, outcome["status"])
+
+
+async def run_worker(worker_id: str, stop: asyncio.Event, poll_interval: float = 1.0) -> None:
+    """Drain the queue one job at a time until `stop` is set."""
+    while not stop.is_set():
+        job = await claim_next_job(worker_id)
+        if job is None:
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(stop.wait(), timeout=poll_interval)
+            continue
+        await process_job(job)
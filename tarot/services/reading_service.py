@@ -1,75 +1,146 @@
+import asyncio
 import logging
 
+import pydantic_core
 from asgiref.sync import sync_to_async
-from django.db import DatabaseError, transaction
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
 from django.shortcuts import aget_object_or_404
 from pydantic import ValidationError
+from pydantic_ai.messages import ArgsDict, ModelResponse, ToolCallPart
+from pydantic_ai.usage import Usage
 
-from mentors.models import Mentor
-from tarot.agents.celestial_agent import CardResponse, celestial_agent
+from mentors.cache import aget_mentor, aget_mentor_directory
+from tarot import model_router
+from tarot.agents.celestial_agent import CardResponse, celestial_agent, spread_result_type
 from tarot.agents.common import ReadingDependencies
-from tarot.agents.tarot_support_agent import tarot_support_agent
-from tarot.enums import ReadingTypeEnum
-from tarot.models import Card, Reading, ReadingCard
-from tarot.utils import deduct_tokens
+from tarot.agents.tarot_support_agent import QuestionValidationResult, tarot_support_agent
+from tarot.catalog import CardRecord, aget_catalog
+from tarot.enums import ModelTierEnum, ReadingStatusEnum, ReadingTypeEnum
+from tarot.llm_scheduler import LLMOverloadedError, get_scheduler
+from tarot.models import Reading, ReadingCard
+from tarot.pagination import DEFAULT_PAGE_SIZE, apaginate_by_date
+from tarot.spreads import get_spread
+from tarot.validation_cache import get_validation_cache, validation_cache_key
+from tarot.validators import QuestionValidator
+from users.tokens import TokenReservation, reserve_tokens
 
 MIN_TOKEN_COST = 250  # Minimum upfront tokens required
+STREAM_DEBOUNCE = 0.05  # Seconds to group streamed chunks by before parsing the partial result
+EMPTY_DECK_ERROR = "There are no cards in the deck to draw the spread from."
 
 logger = logging.getLogger(__name__)
 
 
-async def create_reading(request, question: str, mentor_id: int, reading_type: ReadingTypeEnum | None = None):
-    has_tokens = await deduct_tokens(request.user, MIN_TOKEN_COST)
-    if not has_tokens:
-        return "Insufficient tokens to create a reading."
+async def _validate_question(question: str, user_id: int | None = None) -> tuple[QuestionValidationResult, Usage] | str:
+    """
+    Validate a question: clear-cut ones are decided locally, repeated ones answered from the
+    validation cache, and only the rest are run past the support agent (queued under `user_id`).
 
-    mentor = await aget_object_or_404(Mentor, id=mentor_id)
+    Returns the validation result with the tokens spent on it, or an error message.
+    """
+    local = QuestionValidator.pre_validate(question=question, mode=settings.QUESTION_PREVALIDATION)
+    if local.is_valid is False:
+        return f"Invalid question: {local.reason}"
+    if local.is_valid:
+        validation = QuestionValidationResult(
+            is_valid=True, reason=None, theme=local.theme, spread_type=local.spread_type
+        )
+        return validation, Usage()
 
-    await deduct_tokens(request.user, MIN_TOKEN_COST)
+    tier = model_router.route_validation(question)
+    cache = get_validation_cache()
+    key = validation_cache_key(question, settings.LLM_MODEL_TIERS[tier])
+    validation = await cache.aget(key) if cache else None
+    usage = Usage()
 
     try:
-        deps = ReadingDependencies(question=question)
-        validation_result = await tarot_support_agent.run(question, deps=deps)
-
-        if not validation_result or not validation_result.data.is_valid:
-            return f"Invalid question: {validation_result.data.reason}"
+        if validation is None:
+            validation_result = await model_router.arun(
+                tarot_support_agent, tier, question, user_id=user_id, deps=ReadingDependencies(question=question)
+            )
+            validation, usage = validation_result.data, validation_result.usage()
+            if cache:
+                await cache.aset(key, validation, usage.total_tokens or 0)
 
-        actual_usage = validation_result.usage().total_tokens
-        msg = f"Actual token usage: {actual_usage}"
-        logger.info(msg)
-
-        # Deduct the difference between actual usage and upfront tokens
-        if actual_usage and actual_usage > MIN_TOKEN_COST:
-            extra_cost = actual_usage - MIN_TOKEN_COST
-            await deduct_tokens(request.user, extra_cost)
-
-        theme = validation_result.data.theme
-        spread_type = reading_type or validation_result.data.spread_type
+        if not validation.is_valid:
+            return f"Invalid question: {validation.reason}"
 
     except AttributeError as e:
         return f"Data validation error: Missing attribute - {e}"
     except ValidationError as e:
         return f"Validation error: {e}"
 
-    return await Reading.objects.acreate(
-        user=request.user,
-        mentor=mentor,
-        question=question,
-        notes=f"Theme: {theme}, Tokens spent for validation: {validation_result.usage()}",
-        reading_type=spread_type,
-    )
+    return validation, usage
+
+
+def _validation_notes(validation: QuestionValidationResult, usage: Usage) -> str:
+    return f"Theme: {validation.theme}, Tokens spent for validation: {usage}"
+
+
+def _theme(validation: QuestionValidationResult) -> str:
+    return (validation.theme or "").strip().lower()[:100]  # Reading.theme max_length
+
+
+async def create_reading(request, question: str, mentor_id: int, reading_type: ReadingTypeEnum | None = None):
+    mentor = await aget_mentor(mentor_id=mentor_id)
+
+    reservation = await reserve_tokens(request.user, MIN_TOKEN_COST, reference="reading")
+    if reservation is None:
+        return "Insufficient tokens to create a reading."
+
+    async with reservation:
+        result = await _validate_question(question, request.user.id)
+        if isinstance(result, str):
+            return result
+
+        validation, usage = result
+        reading = await Reading.objects.acreate(
+            user=request.user,
+            mentor=mentor,
+            question=question,
+            notes=_validation_notes(validation, usage),
+            reading_type=reading_type or validation.spread_type,
+            status=ReadingStatusEnum.VALIDATED,
+            theme=_theme(validation),
+        )
+        await _commit_usage(reservation, usage)
+
+    return reading
+
+
+async def list_readings(request, filters, cursor: str | None = None, limit: int = DEFAULT_PAGE_SIZE):
+    readings = filters.filter(Reading.objects.filter(user=request.user))
+    return await apaginate_by_date(readings, cursor, limit)
 
 
-async def list_readings(request, filters):
-    readings = Reading.objects.filter(user=request.user).order_by("-date")
-    return filters.filter(readings)
+def readings_with_cards():
+    """Readings with their cards and card data prefetched: two queries regardless of the spread size."""
+    return Reading.objects.prefetch_related(
+        Prefetch("cards", queryset=ReadingCard.objects.select_related("card")),
+    )
 
 
 async def get_reading(request, reading_id: int):
-    return await aget_object_or_404(Reading, id=reading_id, user=request.user)
+    return await aget_object_or_404(readings_with_cards(), id=reading_id, user=request.user)
+
+
+def _build_reading_cards(reading: Reading, card_objects: list[tuple[CardRecord, CardResponse]]) -> list[ReadingCard]:
+    return [
+        ReadingCard(
+            reading=reading,
+            card_id=card.id,
+            position=position,
+            orientation=card_data.orientation,
+            interpretation=card_data.interpretation,
+            role=card_data.role,
+        )
+        for position, (card, card_data) in enumerate(card_objects, start=1)
+    ]
 
 
-async def _update_reading_cards_async(reading: Reading, card_objects: list[tuple[Card, CardResponse]]):
+async def _update_reading_cards_async(reading: Reading, card_objects: list[tuple[CardRecord, CardResponse]]):
     """
     Update the cards associated with a reading in an async-safe way.
     """
@@ -81,72 +152,280 @@ async def _update_reading_cards_async(reading: Reading, card_objects: list[tuple
             # Delete existing cards in bulk
             ReadingCard.objects.filter(reading=reading).delete()
 
-            # Prepare new ReadingCard objects
-            new_cards = [
-                ReadingCard(
-                    reading=reading,
-                    card=card,
-                    position=position,
-                    orientation=card_data.orientation,
-                    interpretation=card_data.interpretation,
-                )
-                for position, (card, card_data) in enumerate(card_objects, start=1)
-            ]
-
             # Bulk create the new ReadingCard objects
-            ReadingCard.objects.bulk_create(new_cards)
+            ReadingCard.objects.bulk_create(_build_reading_cards(reading, card_objects))
 
     await update_cards()
     return reading
 
 
+def _insight_prompt(reading: Reading) -> str:
+    spread = get_spread(reading.reading_type)
+    return (
+        f"Provide mystical guidance for the question: '{reading.question}' "
+        f"and create a card spread of type '{reading.reading_type}' with {spread.size} cards, "
+        f"one for each position in order: {', '.join(spread.positions)}."
+    )
+
+
+async def _insight_tier(reading: Reading) -> ModelTierEnum:
+    """Route the insight on its question, spread and mentor (read from the cached directory)."""
+    directory = await aget_mentor_directory()
+    mentor = directory.by_id.get(reading.mentor_id)
+    return model_router.route_insight(reading.question, reading.reading_type, mentor.mystical_level if mentor else 0)
+
+
+async def _commit_usage(reservation: TokenReservation, usage: Usage, portion: int | None = None) -> None:
+    """Settle (a `portion` of) the upfront tokens, charging what an agent run used beyond them."""
+    actual_usage = usage.total_tokens or 0
+    msg = f"Actual token usage: {actual_usage}"
+    logger.info(msg)
+
+    await reservation.commit(actual_usage, portion)
+
+
+async def _save_insight(
+    reading: Reading, text: str, usage: Usage, card_objects: list[tuple[CardRecord, CardResponse]]
+) -> Reading:
+    reading.celestial_insight = text
+    reading.notes += f"\n\nTokens spent for celestial insight: {usage}"
+    reading.status = ReadingStatusEnum.COMPLETED
+    await reading.asave(update_fields=["celestial_insight", "notes", "status"])
+
+    await _update_reading_cards_async(reading, card_objects)
+
+    return await readings_with_cards().aget(id=reading.id)
+
+
+async def _mark_failed(reading: Reading) -> None:
+    """Flag a failed insight attempt; a reading that already has a completed insight keeps it."""
+    await (
+        Reading.objects.filter(id=reading.id)
+        .exclude(status=ReadingStatusEnum.COMPLETED)
+        .aupdate(status=ReadingStatusEnum.FAILED)
+    )
+
+
 async def generate_insight(request, reading_id: int):
-    has_tokens = await deduct_tokens(request.user, MIN_TOKEN_COST)
-    if not has_tokens:
+    reading = await aget_object_or_404(Reading, id=reading_id, user=request.user)
+
+    reservation = await reserve_tokens(request.user, MIN_TOKEN_COST, reference=f"insight:{reading.id}")
+    if reservation is None:
         return "Insufficient tokens to generate celestial insight."
 
-    reading = await aget_object_or_404(Reading, id=reading_id, user=request.user)
+    async with reservation:
+        return await run_insight(reading, reservation)
+
 
+async def _generate_spread(reading: Reading):
+    """
+    Run the celestial agent for `reading` and resolve the cards it drew.
+
+    Returns `(text, usage, card_objects)`, or an error message.
+    """
+    tier = await _insight_tier(reading)
+    catalog = await aget_catalog()
+    if not catalog.card_names:
+        return EMPTY_DECK_ERROR
     try:
-        prompt = (
-            f"Provide mystical guidance for the question: '{reading.question}' "
-            f"and create a card spread of type '{reading.reading_type}'."
+        insight_result = await model_router.arun(
+            celestial_agent,
+            tier,
+            _insight_prompt(reading),
+            user_id=reading.user_id,
+            hedge=settings.LLM_HEDGING,
+            result_type=spread_result_type(catalog.card_names, get_spread(reading.reading_type)),
+            deps=ReadingDependencies(question=reading.question),
         )
-        insight_result = await celestial_agent.run(prompt, deps=ReadingDependencies(question=reading.question))
 
         if not insight_result:
             return f"Failed to generate celestial insight: {insight_result.error}"
 
-        actual_usage = insight_result.usage().total_tokens
-        msg = f"Actual token usage: {actual_usage}"
-        logger.info(msg)
-
-        if actual_usage and actual_usage > MIN_TOKEN_COST:
-            extra_cost = actual_usage - MIN_TOKEN_COST
-            await deduct_tokens(request.user, extra_cost)
-
         celestial_response = insight_result.data
-        cards_data = celestial_response.cards
 
+    except LLMOverloadedError:
+        raise  # Answered with 429/503 and Retry-After instead of an error message
     except Exception as e:
         return f"Error generating celestial insight: {e}"
 
-    try:
-        card_objects = []
-        for card_data in cards_data:
-            card_name = card_data.name.lower().removeprefix("the ").strip()
-            card = await Card.objects.filter(name__icontains=card_name).afirst()
-            if not card:
-                return f"Card '{card_name}' not found in the database."
-            card_objects.append((card, card_data))
+    # The result type only admits names of the catalog the run was started with
+    card_objects = [(catalog.by_name[card_data.name], card_data) for card_data in celestial_response.cards]
 
-    except DatabaseError as e:
-        return f"Error mapping cards to database: {e}"
+    return celestial_response.text, insight_result.usage(), card_objects
 
-    reading.celestial_insight = celestial_response.text
-    reading.notes += f"\n\nTokens spent for celestial insight: {insight_result.usage()}"
-    await reading.asave(update_fields=["celestial_insight", "notes"])
 
-    await _update_reading_cards_async(reading, card_objects)
+async def run_insight(reading: Reading, reservation: TokenReservation) -> Reading | str:
+    """
+    Generate and save the celestial insight for `reading`, settling the tokens reserved for it.
 
-    return reading
+    Returns the saved reading, or an error message (the reservation is then left to the caller).
+    """
+    spread = await _generate_spread(reading)
+    if isinstance(spread, str):
+        await _mark_failed(reading)
+        return spread
+
+    text, usage, card_objects = spread
+    saved = await _save_insight(reading, text, usage, card_objects)
+    await _commit_usage(reservation, usage)
+    return saved
+
+
+@sync_to_async
+def _create_reading_with_cards(reading: Reading, card_objects: list[tuple[CardRecord, CardResponse]]) -> None:
+    with transaction.atomic():
+        reading.save()
+        ReadingCard.objects.bulk_create(_build_reading_cards(reading, card_objects))
+
+
+async def create_full_reading(
+    request, question: str, mentor_id: int, reading_type: ReadingTypeEnum | None = None
+) -> Reading | str:
+    """
+    Validate a question, generate its celestial insight and save both in one request.
+
+    The mentor is fetched while the upfront tokens for both agents are reserved; the paid
+    validation only starts once the reservation succeeded, and the insight as soon as
+    validation passes. The reading is only written, together with its cards, in a single
+    transaction once it succeeded. Validation is charged as soon as it passed; the tokens
+    reserved for the insight are refunded if it fails.
+    """
+    mentor, reservation = await asyncio.gather(
+        aget_mentor(mentor_id=mentor_id),
+        reserve_tokens(request.user, 2 * MIN_TOKEN_COST, reference="reading"),
+        return_exceptions=True,
+    )
+    if isinstance(reservation, BaseException):
+        raise reservation
+    if isinstance(mentor, BaseException):
+        if reservation is not None:
+            await reservation.refund()
+        raise mentor
+    if reservation is None:
+        return "Insufficient tokens to create a reading."
+
+    async with reservation:
+        result = await _validate_question(question, request.user.id)
+        if isinstance(result, str):
+            return result
+
+        validation, validation_usage = result
+        reading = Reading(
+            user=request.user,
+            mentor=mentor,
+            question=question,
+            notes=_validation_notes(validation, validation_usage),
+            reading_type=reading_type or validation.spread_type,
+            status=ReadingStatusEnum.VALIDATED,
+            theme=_theme(validation),
+        )
+        # Validation is paid for once it passed, as on `create_reading`; a failed insight only refunds its own share
+        await _commit_usage(reservation, validation_usage, MIN_TOKEN_COST)
+        spread = await _generate_spread(reading)
+        if isinstance(spread, str):
+            return spread
+
+        text, usage, card_objects = spread
+        reading.celestial_insight = text
+        reading.notes += f"\n\nTokens spent for celestial insight: {usage}"
+        reading.status = ReadingStatusEnum.COMPLETED
+        await _create_reading_with_cards(reading, card_objects)
+        await _commit_usage(reservation, usage)
+
+    return await readings_with_cards().aget(id=reading.id)
+
+
+def _partial_result_args(message: ModelResponse) -> dict:
+    """Parse the (possibly incomplete) JSON arguments of the result tool call streamed so far."""
+    for part in message.parts:
+        if isinstance(part, ToolCallPart):
+            if isinstance(part.args, ArgsDict):
+                return part.args.args_dict
+            try:
+                args = pydantic_core.from_json(part.args.args_json or "{}", allow_partial="trailing-strings")
+            except ValueError:
+                return {}
+            return args if isinstance(args, dict) else {}
+    return {}
+
+
+async def stream_insight(request, reading_id: int):
+    """
+    Start a streamed celestial insight.
+
+    Returns an error string when the reading cannot be started, otherwise an async iterator
+    of `(event, data)` pairs: `text` deltas, each `card` as soon as it is complete and
+    resolved, and finally `done` with the saved reading (or `error`).
+    """
+    reading = await aget_object_or_404(Reading, id=reading_id, user=request.user)
+    # Turn the stream away while it can still be answered with 429/503; it queues for its slot once started
+    get_scheduler().check_admission(request.user.id)
+
+    reservation = await reserve_tokens(request.user, MIN_TOKEN_COST, reference=f"insight:{reading.id}")
+    if reservation is None:
+        return "Insufficient tokens to generate celestial insight."
+
+    return _insight_events(reading, reservation)
+
+
+async def _insight_events(reading: Reading, reservation: TokenReservation):
+    """Stream the insight events; the reserved tokens are refunded unless the insight was saved."""
+    async with reservation:
+        async for event, data in _stream_insight_events(reading, reservation):
+            if event == "error":
+                await _mark_failed(reading)
+            yield event, data
+
+
+async def _stream_insight_events(reading: Reading, reservation: TokenReservation):
+    catalog = await aget_catalog()
+    if not catalog.card_names:
+        yield "error", {"detail": EMPTY_DECK_ERROR}
+        return
+    result_type = spread_result_type(catalog.card_names, get_spread(reading.reading_type))
+    card_objects: list[tuple[CardRecord, CardResponse]] = []
+    text_sent = 0
+    tier = await _insight_tier(reading)
+
+    try:
+        async with model_router.arun_stream(
+            celestial_agent,
+            tier,
+            _insight_prompt(reading),
+            user_id=reading.user_id,
+            result_type=result_type,
+            deps=ReadingDependencies(question=reading.question),
+        ) as insight_result:
+            async for message, is_last in insight_result.stream_structured(debounce_by=STREAM_DEBOUNCE):
+                partial = _partial_result_args(message)
+
+                text = partial.get("text") or ""
+                if len(text) > text_sent:
+                    yield "text", {"delta": text[text_sent:]}
+                    text_sent = len(text)
+
+                # A card is complete once the model has started the next one (or the stream ended)
+                cards = partial.get("cards") or []
+                complete = len(cards) if is_last else len(cards) - 1
+                while len(card_objects) < complete:
+                    # Streamed cards cannot be retried: one that does not fit ends the reading
+                    try:
+                        card_data = result_type.card_type.model_validate(cards[len(card_objects)])
+                    except ValidationError:
+                        name = cards[len(card_objects)].get("name")
+                        yield "error", {"detail": f"Card '{name}' does not fit the spread."}
+                        return
+                    card = catalog.by_name[card_data.name]
+                    card_objects.append((card, card_data))
+                    resolved = {"position": len(card_objects), "card_id": card.id, "name": card.name, "slug": card.slug}
+                    yield "card", card_data.model_dump() | resolved
+
+            celestial_response = await insight_result.validate_structured_result(message)
+            usage = insight_result.usage()
+    except Exception as e:
+        yield "error", {"detail": f"Error generating celestial insight: {e}"}
+        return
+
+    saved = await _save_insight(reading, celestial_response.text, usage, card_objects)
+    await _commit_usage(reservation, usage)
+    yield "done", saved
@@ -0,0 +1,28 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .catalog import invalidate_catalog
+from .images import refresh_card_image_variants
+from .models import Card, Suit
+
+
+@receiver([post_save, post_delete], sender=Card)
+@receiver([post_save, post_delete], sender=Suit)
+def invalidate_card_catalog(sender, **kwargs):
+    """Rebuild the card catalog once the change is committed (admin edits, `loaddata`)."""
+    transaction.on_commit(invalidate_catalog, using=kwargs.get("using"))
+
+
+@receiver(post_save, sender=Card)
+def sync_card_keywords(sender, instance, update_fields=None, **kwargs):
+    """Keep the normalized `CardKeyword` table in step with `Card.keywords`."""
+    if update_fields is None or "keywords" in update_fields:
+        instance.sync_keywords()
+
+
+@receiver(post_save, sender=Card)
+def generate_card_image_variants(sender, instance, **kwargs):
+    """Build thumbnails/WebP derivatives for a newly uploaded image (fixtures use `generate_card_images`)."""
+    if not kwargs.get("raw") and refresh_card_image_variants(instance):
+        transaction.on_commit(invalidate_catalog, using=kwargs.get("using"))
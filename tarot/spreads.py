@@ -0,0 +1,55 @@
+from dataclasses import dataclass
+
+from .enums import ReadingTypeEnum
+
+
+@dataclass(frozen=True, slots=True)
+class Spread:
+    reading_type: ReadingTypeEnum
+    positions: tuple[str, ...]  # Role of each card, in the order they are laid out
+
+    @property
+    def size(self) -> int:
+        return len(self.positions)
+
+
+SPREADS = {
+    spread.reading_type: spread
+    for spread in (
+        Spread(ReadingTypeEnum.SINGLE_CARD, ("Guidance",)),
+        Spread(ReadingTypeEnum.THREE_CARD_SPREAD, ("Past", "Present", "Future")),
+        Spread(
+            ReadingTypeEnum.CELTIC_CROSS_SPREAD,
+            (
+                "Present",
+                "Challenge",
+                "Foundation",
+                "Recent Past",
+                "Crown",
+                "Near Future",
+                "Self",
+                "Environment",
+                "Hopes and Fears",
+                "Outcome",
+            ),
+        ),
+        Spread(ReadingTypeEnum.LOVE_SPREAD, ("You", "Your Partner", "The Relationship", "Challenges", "Outcome")),
+        Spread(
+            ReadingTypeEnum.CAREER_PATH_SPREAD,
+            ("Current Position", "Strengths", "Obstacles", "Advice", "Outcome"),
+        ),
+        Spread(
+            ReadingTypeEnum.RELATIONSHIP_SPREAD,
+            ("You", "The Other Person", "The Connection", "Strengths", "Challenges", "Outcome"),
+        ),
+        Spread(
+            ReadingTypeEnum.HORSESHOE_SPREAD,
+            ("Past", "Present", "Hidden Influences", "Obstacles", "External Influences", "Advice", "Outcome"),
+        ),
+    )
+}
+
+
+def get_spread(reading_type: str | None) -> Spread:
+    """The spread of `reading_type`; readings without a known type get a single card, like new readings do."""
+    return SPREADS.get(reading_type, SPREADS[ReadingTypeEnum.SINGLE_CARD])
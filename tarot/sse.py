@@ -0,0 +1,16 @@
+import json
+from collections.abc import AsyncIterator
+
+from django.http import StreamingHttpResponse
+
+
+def sse_event(event: str, data) -> str:
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_response(events: AsyncIterator[str]) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # Tell nginx-style proxies not to buffer the stream
+    return response
@@ -0,0 +1,986 @@
+import asyncio
+import contextlib
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connections, transaction
+from django.http import Http404
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image as PILImage
+from pydantic import BaseModel
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelMessage, ModelResponse, ToolCallPart
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, FunctionModel
+from pydantic_ai.usage import Usage
+
+from celestial_insight.api import llm_overloaded
+from celestial_insight.bulk import BULK_CHUNK_SIZE
+from celestial_insight.caching import VERSIONS_CACHE
+from celestial_insight.db import ReadReplicaRouter, read_replica
+from mentors.models import Mentor
+from tarot import exports, images, llm_scheduler, model_router
+from tarot.admin import export_readings_to_ndjson, export_readings_with_cards_to_csv
+from tarot.agents.celestial_agent import celestial_agent
+from tarot.agents.tarot_support_agent import (
+    SYSTEM_PROMPT,
+    VALIDATION_PROMPT_VERSION,
+    QuestionValidationResult,
+    prompt_version,
+)
+from tarot.catalog import CATALOG_VERSION_CACHE_KEY, aget_catalog, get_catalog, invalidate_catalog
+from tarot.enums import JobStatusEnum, ModelTierEnum, PreValidationModeEnum, ReadingStatusEnum
+from tarot.llm_scheduler import LLMOverloadedError, LLMScheduler, LLMUserQueueFullError
+from tarot.loadtest import FakeLLM, FakeLLMConfig, FixedUsageModel
+from tarot.models import Card, HedgeUsage, InsightJob, Reading, ReadingCard, Suit
+from tarot.schemas import ReadingCardSchema, ReadingSchema
+from tarot.services import card_service, job_service, reading_service
+from tarot.validation_cache import (
+    BaseValidationCache,
+    DatabaseValidationCache,
+    MemoryValidationCache,
+    validation_cache_key,
+)
+from tarot.validators import MAX_QUESTION_CHARACTERS, QuestionValidator
+from users.cache import PROFILES_CACHE, profile_snapshot_key
+from users.models import DEFAULT_TOKENS, UserProfile
+from users.tokens import reserve_tokens
+
+
+class CardFixturesMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.major = Suit.objects.create(name="Major Arcana", arcana="major")
+        cls.cups = Suit.objects.create(name="Cups", arcana="minor")
+        cls.fool = Card.objects.create(
+            name="The Fool",
+            suit=cls.major,
+            number=0,
+            description="A leap into the unknown.",
+            upright_meaning="Beginnings",
+            reversed_meaning="Recklessness",
+            keywords="beginnings, innocence, spontaneity",
+        )
+        cls.star = Card.objects.create(
+            name="The Star",
+            suit=cls.major,
+            number=17,
+            description="Calm after the storm.",
+            upright_meaning="Hope",
+            reversed_meaning="Despair",
+            keywords="hope, renewal, serenity",
+        )
+        cls.ace_of_cups = Card.objects.create(
+            name="Ace of Cups",
+            suit=cls.cups,
+            number=1,
+            description="An overflowing cup.",
+            upright_meaning="New feelings",
+            reversed_meaning="Emotional loss",
+            keywords="love, new feelings, compassion",
+        )
+
+
+# The test replica is a second connection, which cannot see the data of the test's transaction
+@override_settings(DATABASE_ROUTERS=[])
+class CardETagTests(CardFixturesMixin, TestCase):
+    def test_not_modified_for_current_etag(self):
+        etag = self.client.get("/api/tarot/cards").headers["ETag"]
+
+        response = self.client.get("/api/tarot/cards", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+
+    def test_edit_changes_etag(self):
+        etag = self.client.get("/api/tarot/cards").headers["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            Card.objects.filter(pk=self.fool.pk).update(description="Edited.")
+            self.fool.save()
+
+        response = self.client.get("/api/tarot/cards", headers={"If-None-Match": etag})
+
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+    def test_version_bumped_by_another_process_changes_etag(self):
+        etag = self.client.get("/api/tarot/cards").headers["ETag"]
+        # Another process only moves the shared stamp; this one still holds its catalog
+        caches[VERSIONS_CACHE].set(CATALOG_VERSION_CACHE_KEY, "bumped-elsewhere", timeout=None)
+
+        response = self.client.get("/api/tarot/cards", headers={"If-None-Match": etag})
+
+        assert response.status_code == 200
+        assert response.headers["ETag"] != etag
+
+
+@override_settings(VERSION_STAMP_MAX_AGE=60)
+class VersionStampTests(CardFixturesMixin, TestCase):
+    def setUp(self):
+        invalidate_catalog()  # The stamp this process remembers from an earlier test was rolled back
+
+    def test_catalog_is_served_without_a_query_while_the_stamp_is_fresh(self):
+        catalog = get_catalog()
+
+        with self.assertNumQueries(0):
+            assert get_catalog() is catalog
+            assert async_to_sync(aget_catalog)() is catalog
+
+    def test_stamp_moved_elsewhere_is_read_once_the_local_one_is_old(self):
+        catalog = get_catalog()
+        caches[VERSIONS_CACHE].set(CATALOG_VERSION_CACHE_KEY, "bumped-elsewhere", timeout=None)
+
+        assert get_catalog() is catalog
+        with override_settings(VERSION_STAMP_MAX_AGE=0):
+            assert get_catalog().version == "bumped-elsewhere"
+
+    def test_stamps_survive_the_churn_of_profile_snapshots(self):
+        version = get_catalog().version
+        profiles = caches[PROFILES_CACHE]
+
+        for user_id in range(profiles._max_entries + 20):
+            profiles.set(profile_snapshot_key(user_id), {}, 30)
+
+        assert caches[VERSIONS_CACHE].get(CATALOG_VERSION_CACHE_KEY) == version
+
+
+class ReplicaRoutingTests(CardFixturesMixin, TestCase):
+    databases = {"default"}  # Any query sent to the replica fails the test
+
+    def test_catalog_is_built_from_the_primary(self):
+        invalidate_catalog()
+
+        with read_replica():
+            catalog = get_catalog()
+
+        assert "hope" in catalog.by_name["The Star"].keyword_list
+
+    def test_version_stamps_are_read_from_the_primary(self):
+        caches[VERSIONS_CACHE].set(CATALOG_VERSION_CACHE_KEY, "current", timeout=None)
+
+        with read_replica():
+            assert caches[VERSIONS_CACHE].get(CATALOG_VERSION_CACHE_KEY) == "current"
+
+    def test_relations_only_span_the_primary_and_the_replica(self):
+        router = ReadReplicaRouter()
+        card, suit = Card(), Suit()
+        card._state.db, suit._state.db = "default", "replica"
+        assert router.allow_relation(card, suit)
+
+        suit._state.db = "archive"
+        assert router.allow_relation(card, suit) is None
+
+
+class CardSearchTests(CardFixturesMixin, TestCase):
+    def search(self, query: str, cards=None) -> list[str]:
+        return [card.name for card in get_catalog().search(query, cards)]
+
+    def test_ranks_name_matches_first(self):
+        assert self.search("star hope") == ["The Star"]
+        assert self.search("love")[0] == "Ace of Cups"
+
+    def test_prefix_matches(self):
+        assert self.search("begin") == ["The Fool"]
+
+    def test_every_term_must_match(self):
+        assert self.search("hope beginnings") == []
+
+    def test_only_stop_words_is_no_search(self):
+        catalog = get_catalog()
+
+        assert self.search("the of and") == [card.name for card in catalog.cards]
+        assert self.search("the", catalog.by_suit[self.cups.id]) == ["Ace of Cups"]
+
+
+class CardImageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.major = Suit.objects.create(name="Major Arcana", arcana="major")
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def image(self, color: str) -> SimpleUploadedFile:
+        buffer = io.BytesIO()
+        PILImage.new("RGB", (300, 520), color).save(buffer, format="PNG")
+        return SimpleUploadedFile(f"{color}.png", buffer.getvalue())
+
+    def create_card(self, name: str, image) -> Card:
+        with self.captureOnCommitCallbacks(execute=True):
+            card = Card.objects.create(name=name, suit=self.major, image=image)
+        card.refresh_from_db()
+        return card
+
+    def derivatives(self, card: Card) -> set[str]:
+        return {name for key, name in card.image_variants.items() if key != "source"}
+
+    def stored(self, names) -> bool:
+        return all(default_storage.exists(name) for name in names)
+
+    def replace_image(self, card: Card, image) -> None:
+        with self.captureOnCommitCallbacks(execute=True):
+            card.image = image
+            card.save()
+
+    def test_upload_generates_the_variants(self):
+        card = self.create_card("The Sun", self.image("gold"))
+
+        assert card.image_variants["source"] == card.image.name
+        assert set(card.image_variants) == {"source", *images.VARIANTS}
+        assert self.stored(self.derivatives(card))
+        with default_storage.open(card.image_variants["thumbnail"]) as thumbnail:
+            assert PILImage.open(thumbnail).size <= images.THUMBNAIL_SIZE
+        assert card.thumbnail_webp.endswith(".webp")
+
+    def test_replaced_image_deletes_the_old_variants(self):
+        card = self.create_card("The Sun", self.image("gold"))
+        old = self.derivatives(card)
+
+        self.replace_image(card, self.image("white"))
+
+        assert self.stored(self.derivatives(card))
+        assert not any(default_storage.exists(name) for name in old)
+
+    def test_rolled_back_save_keeps_the_old_variants(self):
+        card = self.create_card("The Sun", self.image("gold"))
+        old = self.derivatives(card)
+
+        with self.captureOnCommitCallbacks(execute=True), contextlib.suppress(RuntimeError), transaction.atomic():
+            card.image = self.image("white")
+            card.save()
+            raise RuntimeError
+
+        card.refresh_from_db()
+        assert self.derivatives(card) == old
+        assert self.stored(old)
+
+    def test_variants_shared_with_another_card_are_kept(self):
+        card = self.create_card("The Sun", self.image("gold"))
+        twin = self.create_card("The Sun (alternate art)", card.image.name)
+        assert self.derivatives(twin) == self.derivatives(card)
+
+        self.replace_image(card, self.image("white"))
+
+        assert self.stored(self.derivatives(twin))
+
+    def test_command_backfills_missing_variants(self):
+        card = self.create_card("The Sun", self.image("gold"))
+        Card.objects.filter(id=card.id).update(image_variants={})
+        out = io.StringIO()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("generate_card_images", stdout=out)
+            call_command("generate_card_images", stdout=out)
+
+        card.refresh_from_db()
+        assert set(card.image_variants) == {"source", *images.VARIANTS}
+        assert "Updated 1 cards, 0 unchanged or unreadable." in out.getvalue()
+        assert "Updated 0 cards, 1 unchanged or unreadable." in out.getvalue()
+
+
+class AdminChangelistTests(TestCase):
+    rows = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username="admin")
+        cls.suits = [Suit.objects.create(name=name, arcana="minor") for name in ("Cups", "Wands")]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def assert_constant_queries(self, url: str, create_row) -> None:
+        """The changelist costs as many queries for `rows` rows as for one."""
+        create_row(0)
+        self.client.get(url)  # Loads what later requests take from a cache, such as the admin theme
+        with CaptureQueriesContext(connections["default"]) as one_row:
+            assert self.client.get(url).context["cl"].result_count == 1
+        for index in range(1, self.rows):
+            create_row(index)
+
+        with self.assertNumQueries(len(one_row)):
+            assert self.client.get(url).context["cl"].result_count == self.rows
+
+    def create_reading(self, index: int) -> Reading:
+        user = User.objects.create_user(username=f"seeker-{index}")
+        mentor = Mentor.objects.create(name=f"Mentor {index}", mystical_level=index)
+        return Reading.objects.create(user=user, mentor=mentor, question=f"Question {index}?", theme="love")
+
+    def test_reading_changelist(self):
+        self.assert_constant_queries("/admin/tarot/reading/", self.create_reading)
+
+    def test_card_changelist(self):
+        self.assert_constant_queries(
+            "/admin/tarot/card/",
+            lambda index: Card.objects.create(
+                name=f"Card {index}", suit=self.suits[index % 2], number=index, keywords="hope, renewal"
+            ),
+        )
+
+    def test_insight_job_changelist(self):
+        def create_job(index: int) -> None:
+            reading = self.create_reading(index)
+            InsightJob.objects.create(reading=reading, user=reading.user)
+
+        self.assert_constant_queries("/admin/tarot/insightjob/", create_job)
+
+    def test_random_mentor_action_writes_in_chunks(self):
+        Mentor.objects.create(name="Madame Zora", mystical_level=5)
+        Reading.objects.bulk_create(Reading(question=f"Question {index}?") for index in range(BULK_CHUNK_SIZE + 1))
+
+        with mock.patch.object(Reading.objects, "bulk_update", wraps=Reading.objects.bulk_update) as bulk_update:
+            self.client.post(
+                "/admin/tarot/reading/",
+                {"action": "assign_random_mentor", "select_across": 1, "_selected_action": [0]},
+            )
+
+        assert [len(call.args[0]) for call in bulk_update.call_args_list] == [BULK_CHUNK_SIZE, 1]
+        assert not Reading.objects.filter(mentor__isnull=True).exists()
+
+    def test_slug_action_writes_in_chunks(self):
+        Card.objects.bulk_create(
+            Card(name=f"Card {index}", suit=self.suits[0], number=index) for index in range(BULK_CHUNK_SIZE + 1)
+        )
+        Card.objects.update(slug="")
+
+        with mock.patch.object(Card.objects, "bulk_update", wraps=Card.objects.bulk_update) as bulk_update:
+            self.client.post(
+                "/admin/tarot/card/",
+                {"action": "populate_empty_slugs", "select_across": 1, "_selected_action": [0]},
+            )
+
+        assert [len(call.args[0]) for call in bulk_update.call_args_list] == [BULK_CHUNK_SIZE, 1]
+        assert not Card.objects.filter(slug="").exists()
+
+
+class ReadingCardsQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="seeker")
+        suit = Suit.objects.create(name="Major Arcana", arcana="major")
+        cards = Card.objects.bulk_create(Card(name=f"Card {number}", suit=suit, number=number) for number in range(10))
+        cls.readings = {}
+        for size in (1, 10):
+            reading = Reading.objects.create(user=cls.user, question=f"{size} cards?")
+            ReadingCard.objects.bulk_create(
+                ReadingCard(reading=reading, card=card, position=position) for position, card in enumerate(cards[:size])
+            )
+            cls.readings[size] = reading
+
+    def test_reading_with_its_cards_takes_two_queries(self):
+        request = SimpleNamespace(user=self.user)
+        for size, reading in self.readings.items():
+            with self.subTest(cards=size), self.assertNumQueries(2):
+                schema = ReadingSchema.from_orm(async_to_sync(reading_service.get_reading)(request, reading.id))
+                assert [card.card.name for card in schema.cards] == [f"Card {number}" for number in range(size)]
+
+    def test_cards_of_a_reading_take_one_query(self):
+        for size, reading in self.readings.items():
+            with self.subTest(cards=size), self.assertNumQueries(1):
+                cards = async_to_sync(card_service.list_cards_in_reading)(reading.id)
+                assert len([ReadingCardSchema.from_orm(card).card.name for card in cards]) == size
+
+
+class ReadingExportTests(CardFixturesMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create_user(username="seeker")
+        cls.readings = [Reading.objects.create(user=cls.user, question=f"Question {i}") for i in range(5)]
+        ReadingCard.objects.bulk_create(
+            ReadingCard(reading=reading, card=cls.star, position=1, orientation="upright") for reading in cls.readings
+        )
+
+    def test_ndjson_export_is_streamed_in_chunks(self):
+        response = export_readings_to_ndjson(None, None, Reading.objects.order_by("id"))
+        assert response.is_async
+
+        # This thread's connection: the stream's queries are run on it, not in the event loop's thread
+        with (
+            mock.patch.object(exports, "EXPORT_CHUNK_SIZE", 2),
+            CaptureQueriesContext(connections["default"]) as queries,
+        ):
+
+            async def consume():
+                return [(json.loads(line), len(queries)) async for line in response.streaming_content]
+
+            rows = async_to_sync(consume)()
+
+        assert [row["id"] for row, _ in rows] == [reading.id for reading in self.readings]
+        assert rows[0][0]["cards"] == [{"position": 1, "name": "The Star", "orientation": "upright", "role": None}]
+        # The readings query, then each chunk's cards as the stream reaches it
+        assert [count for _, count in rows] == [2, 2, 3, 3, 4]
+
+    def test_csv_export_has_a_header_and_a_row_per_reading(self):
+        response = export_readings_with_cards_to_csv(None, None, Reading.objects.order_by("id"))
+
+        async def consume():
+            return [line async for line in response.streaming_content]
+
+        lines = async_to_sync(consume)()
+
+        assert lines[0] == b"Date,Question,Notes,Reading Type,Cards\r\n"
+        assert len(lines) == len(self.readings) + 1
+        assert lines[1].endswith(b",1. The Star (upright)\r\n")
+
+
+class InsightJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="seeker")
+        cls.reading = Reading.objects.create(user=cls.user, question="What lies ahead?")
+
+    async def abandoned_job(self, attempts: int) -> InsightJob:
+        reservation = await reserve_tokens(self.user, job_service.MIN_TOKEN_COST)
+        return await InsightJob.objects.acreate(
+            reading=self.reading,
+            user=self.user,
+            token_hold_id=reservation.id,
+            status=JobStatusEnum.RUNNING,
+            attempts=attempts,
+            max_attempts=3,
+            locked_at=timezone.now() - timedelta(seconds=job_service.JOB_LEASE_SECONDS + 1),
+            locked_by="dead-worker",
+        )
+
+    async def balance(self) -> int:
+        return await UserProfile.objects.filter(user=self.user).values_list("available_tokens", flat=True).aget()
+
+    async def test_reclaims_abandoned_job_with_attempts_left(self):
+        job = await self.abandoned_job(attempts=1)
+
+        claimed = await job_service.claim_next_job("worker")
+
+        assert claimed.id == job.id
+        assert claimed.locked_by == "worker"
+        assert claimed.attempts == 2
+
+    async def test_fails_abandoned_job_on_its_last_attempt(self):
+        job = await self.abandoned_job(attempts=3)
+        balance = await self.balance()
+
+        assert await job_service.claim_next_job("worker") is None
+
+        await job.arefresh_from_db()
+        assert job.status == JobStatusEnum.FAILED
+        assert job.attempts == 3
+        assert await self.balance() == balance + job_service.MIN_TOKEN_COST
+
+    async def test_attempts_settle_the_queued_reservation_once(self):
+        job = await self.abandoned_job(attempts=1)
+        balance = await self.balance()
+        outcomes = iter(("The stars are silent.", 400))
+        reservations = []
+
+        async def run_insight(reading, reservation):
+            reservations.append(reservation)
+            outcome = next(outcomes)
+            if isinstance(outcome, str):
+                return outcome
+            await reservation.commit(outcome)
+            return reading
+
+        with mock.patch.object(job_service, "run_insight", run_insight):
+            await job_service.process_job(await job_service.claim_next_job("worker"))
+            await InsightJob.objects.filter(id=job.id).aupdate(run_after=timezone.now())
+            await job_service.process_job(await job_service.claim_next_job("worker"))
+        # A late refund by a worker that still held the first attempt
+        await reservations[0].refund()
+
+        await job.arefresh_from_db()
+        assert job.status == JobStatusEnum.SUCCEEDED
+        assert await self.balance() == balance - (400 - job_service.MIN_TOKEN_COST)
+
+    async def test_outcome_of_a_lost_lease_is_discarded(self):
+        await self.abandoned_job(attempts=1)
+        stale = await job_service.claim_next_job("slow-worker")
+        # The slow worker overran its lease and another worker reclaimed the job
+        await InsightJob.objects.filter(id=stale.id).aupdate(
+            locked_at=timezone.now() - timedelta(seconds=job_service.JOB_LEASE_SECONDS + 1)
+        )
+        reclaimed = await job_service.claim_next_job("worker")
+
+        with mock.patch.object(job_service, "run_insight", mock.AsyncMock(return_value="The stars are silent.")):
+            await job_service.process_job(stale)
+
+        job = await InsightJob.objects.aget(id=reclaimed.id)
+        assert job.status == JobStatusEnum.RUNNING
+        assert job.locked_by == "worker"
+        assert job.last_error == ""
+
+
+# The test replica is a second connection, which cannot see the data of the test's transaction
+@override_settings(DATABASE_ROUTERS=[])
+class ReadingPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="seeker")
+        cls.readings = [Reading.objects.create(user=cls.user, question=f"Question {i}") for i in range(7)]
+        # Readings created in the same instant are ordered by id
+        now = timezone.now()
+        Reading.objects.filter(id__in=[reading.id for reading in cls.readings[:4]]).update(date=now)
+        Reading.objects.filter(id__in=[reading.id for reading in cls.readings[4:]]).update(
+            date=now + timedelta(hours=1)
+        )
+        Reading.objects.create(user=User.objects.create_user(username="oracle"), question="Not mine")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def page(self, **params) -> dict:
+        response = self.client.get("/api/tarot/readings/my", params)
+        assert response.status_code == 200
+        return response.json()
+
+    def test_pages_walk_newest_first_without_gaps_or_repeats(self):
+        ids, cursor = [], None
+        while True:
+            page = self.page(limit=3, **({"cursor": cursor} if cursor else {}))
+            assert len(page["items"]) <= 3
+            ids += [item["id"] for item in page["items"]]
+            cursor = page["next"]
+            if cursor is None:
+                break
+
+        # The later batch first, each batch from the highest id down
+        assert ids == [reading.id for reading in [*self.readings[:3:-1], *self.readings[3::-1]]]
+
+    def test_last_page_has_no_next_cursor(self):
+        page = self.page(limit=len(self.readings))
+
+        assert len(page["items"]) == len(self.readings)
+        assert page["next"] is None
+
+    def test_limit_is_clamped(self):
+        assert len(self.page(limit=0)["items"]) == 1
+        with mock.patch("tarot.pagination.MAX_PAGE_SIZE", 2):
+            assert len(self.page(limit=50)["items"]) == 2
+
+    def test_invalid_cursor_is_a_bad_request(self):
+        response = self.client.get("/api/tarot/readings/my", {"cursor": "not a cursor"})
+
+        assert response.status_code == 400
+
+
+class FullReadingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="seeker")
+        cls.mentor = Mentor.objects.create(name="Madame Zora", mystical_level=5)
+
+    def setUp(self):
+        patcher = mock.patch.object(reading_service, "_validate_question", mock.AsyncMock(return_value="Invalid."))
+        self.validate_question = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def create(self, mentor_id: int):
+        request = SimpleNamespace(user=self.user)
+        return await reading_service.create_full_reading(request, "Will I find love?", mentor_id)
+
+    async def test_validation_waits_for_the_reservation(self):
+        await UserProfile.objects.filter(user=self.user).aupdate(available_tokens=reading_service.MIN_TOKEN_COST)
+
+        assert await self.create(self.mentor.id) == "Insufficient tokens to create a reading."
+        self.validate_question.assert_not_awaited()
+
+    async def test_unknown_mentor_refunds_the_reservation(self):
+        with pytest.raises(Http404):
+            await self.create(self.mentor.id + 1)
+
+        profile = await UserProfile.objects.aget(user=self.user)
+        assert profile.available_tokens == DEFAULT_TOKENS
+        self.validate_question.assert_not_awaited()
+
+    async def test_failed_validation_refunds_the_reservation(self):
+        assert await self.create(self.mentor.id) == "Invalid."
+
+        profile = await UserProfile.objects.aget(user=self.user)
+        assert profile.available_tokens == DEFAULT_TOKENS
+
+    async def test_failed_insight_keeps_the_validation_charge(self):
+        validation = QuestionValidationResult(is_valid=True, reason=None, theme="love", spread_type="single_card")
+        self.validate_question.return_value = (validation, Usage(total_tokens=100))
+
+        with mock.patch.object(reading_service, "_generate_spread", mock.AsyncMock(return_value="No insight.")):
+            assert await self.create(self.mentor.id) == "No insight."
+
+        profile = await UserProfile.objects.aget(user=self.user)
+        assert profile.available_tokens == DEFAULT_TOKENS - reading_service.MIN_TOKEN_COST
+
+
+class LLMSchedulerTests(SimpleTestCase):
+    async def queued(self, scheduler: LLMScheduler, *acquires) -> list[asyncio.Task]:
+        waiting = scheduler.waiting
+        tasks = [asyncio.create_task(acquire) for acquire in acquires]
+        await asyncio.sleep(0)  # Let them reach the queue
+        assert scheduler.waiting == waiting + len(tasks)
+        return tasks
+
+    async def test_free_slots_are_taken_without_waiting(self):
+        scheduler = LLMScheduler(max_concurrency=2, max_queue=10, max_queue_per_user=5, timeout=5)
+
+        await scheduler.acquire("a")
+        await scheduler.acquire("a")
+
+        assert (scheduler.active, scheduler.waiting, scheduler.stats.queued) == (2, 0, 0)
+        assert not scheduler.try_acquire()
+
+    async def test_waiting_users_are_served_round_robin(self):
+        scheduler = LLMScheduler(max_concurrency=1, max_queue=10, max_queue_per_user=5, timeout=5)
+        await scheduler.acquire("holder")
+        served = []
+
+        async def run(user: str, label: str):
+            async with scheduler.slot(user):
+                served.append(label)
+
+        tasks = await self.queued(scheduler, run("a", "a1"), run("a", "a2"), run("a", "a3"), run("b", "b1"))
+        scheduler.release(0)
+        await asyncio.gather(*tasks)
+
+        assert served == ["a1", "b1", "a2", "a3"]
+        assert (scheduler.active, scheduler.waiting) == (0, 0)
+
+    async def test_full_queues_are_rejected_with_a_retry_hint(self):
+        scheduler = LLMScheduler(max_concurrency=1, max_queue=2, max_queue_per_user=1, timeout=5)
+        await scheduler.acquire("holder")
+        tasks = await self.queued(scheduler, scheduler.acquire("a"))
+
+        with pytest.raises(LLMUserQueueFullError) as user_full:
+            await scheduler.acquire("a")
+        tasks += await self.queued(scheduler, scheduler.acquire("b"))
+        with pytest.raises(LLMOverloadedError) as queue_full:
+            await scheduler.acquire("c")
+
+        assert user_full.value.status_code == 429
+        assert type(queue_full.value) is LLMOverloadedError
+        assert queue_full.value.status_code == 503
+        assert 1 <= queue_full.value.retry_after <= llm_scheduler.MAX_RETRY_AFTER
+        assert (scheduler.stats.rejected_user, scheduler.stats.rejected_full) == (1, 1)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def test_wait_times_out(self):
+        scheduler = LLMScheduler(max_concurrency=1, max_queue=10, max_queue_per_user=5, timeout=0.01)
+        await scheduler.acquire("holder")
+
+        with pytest.raises(LLMOverloadedError):
+            await scheduler.acquire("a")
+
+        assert (scheduler.stats.timeouts, scheduler.waiting) == (1, 0)
+
+    async def test_cancelled_waiter_does_not_take_the_slot(self):
+        scheduler = LLMScheduler(max_concurrency=1, max_queue=10, max_queue_per_user=5, timeout=5)
+        await scheduler.acquire("holder")
+        (task,) = await self.queued(scheduler, scheduler.acquire("a"))
+
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        scheduler.release(0)
+
+        assert (scheduler.active, scheduler.waiting) == (0, 0)
+
+    def test_overload_is_answered_with_retry_after(self):
+        response = llm_overloaded(None, LLMUserQueueFullError("Too many.", retry_after=7))
+
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "7"
+
+
+class Omen(BaseModel):
+    sign: int
+
+
+oracle = Agent(result_type=Omen, name="oracle")
+
+
+def omen(sign) -> FunctionModel:
+    def respond(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        return ModelResponse(parts=[ToolCallPart.from_raw_args(info.result_tools[0].name, {"sign": sign})])
+
+    async def stream(messages: list[ModelMessage], info: AgentInfo):
+        yield {0: DeltaToolCall(name=info.result_tools[0].name, json_args=json.dumps({"sign": sign}))}
+
+    return FunctionModel(respond, stream_function=stream)
+
+
+@override_settings(LLM_TIER_FALLBACKS={ModelTierEnum.FAST: [ModelTierEnum.STANDARD]})
+class ModelRouterTests(TestCase):
+    def setUp(self):
+        models = {ModelTierEnum.FAST: omen("no sign"), ModelTierEnum.STANDARD: omen(7)}
+        patcher = mock.patch.object(model_router, "get_model", models.__getitem__)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        model_router.stats.clear()
+        self.addCleanup(model_router.stats.clear)
+
+    def tier_stats(self, tier: ModelTierEnum) -> model_router.TierStats:
+        return model_router.stats[("oracle", tier)]
+
+    async def test_failed_attempt_is_recorded_before_falling_back(self):
+        result = await model_router.arun(oracle, ModelTierEnum.FAST, "Which omen?")
+
+        assert result.data.sign == 7
+        fast, standard = self.tier_stats(ModelTierEnum.FAST), self.tier_stats(ModelTierEnum.STANDARD)
+        # The invalid result was retried before the run gave up: both requests are paid for
+        assert fast.failures == 1
+        assert fast.failed_tokens > 0
+        assert not fast.latencies
+        assert standard.fallbacks == 1
+        assert standard.request_tokens + standard.response_tokens == result.usage().total_tokens
+
+    async def test_stream_read_to_its_end_is_answered(self):
+        async with model_router.arun_stream(oracle, ModelTierEnum.STANDARD, "Which omen?") as result:
+            async for _ in result.stream_structured():
+                pass
+
+        standard = self.tier_stats(ModelTierEnum.STANDARD)
+        assert (standard.runs, standard.failures, len(standard.latencies)) == (1, 0, 1)
+
+    async def test_stream_left_early_is_a_failure(self):
+        async with model_router.arun_stream(oracle, ModelTierEnum.STANDARD, "Which omen?"):
+            pass  # As on a streamed card that does not fit the spread
+
+        standard = self.tier_stats(ModelTierEnum.STANDARD)
+        assert (standard.runs, standard.failures, len(standard.latencies)) == (1, 1, 0)
+        assert standard.failed_tokens > 0
+
+
+@override_settings(LLM_HEDGING=True, LLM_HEDGE_MIN_SAMPLES=1, LLM_HEDGE_PERCENTILE=50, LLM_HEDGE_BUDGET=1.0)
+class HedgedInsightTests(CardFixturesMixin, TestCase):
+    usage = Usage(request_tokens=400, response_tokens=300, total_tokens=700)  # Per model request
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = User.objects.create_user(username="seeker")
+        cls.reading = Reading.objects.create(user=cls.user, question="Will it rain?", reading_type="single_card")
+
+    def setUp(self):
+        self.llm = FakeLLM(FakeLLMConfig(latency=0, jitter=0), [self.fool.name, self.star.name, self.ace_of_cups.name])
+        self.requests = 0
+        self.hang = 5  # Seconds the first request takes
+        model_router.stats.clear()
+        self.addCleanup(model_router.stats.clear)
+        # Recent insight runs on the fast tier answered within 10 ms
+        model_router._stats(celestial_agent, ModelTierEnum.FAST).latencies.append(0.01)
+
+    async def celestial_insight(self, messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        self.requests += 1
+        if self.requests == 1:
+            await asyncio.sleep(self.hang)  # The first request hangs in the latency tail
+        return await self.llm.celestial_insight(messages, info)
+
+    async def run_insight(self) -> Reading:
+        reservation = await reserve_tokens(self.user, reading_service.MIN_TOKEN_COST)
+        model = FixedUsageModel(self.celestial_insight, self.usage)
+        with mock.patch.object(model_router, "get_model", return_value=model):
+            return await reading_service.run_insight(self.reading, reservation)
+
+    def tier_stats(self) -> model_router.TierStats:
+        return model_router.stats[(celestial_agent.name, ModelTierEnum.FAST)]
+
+    async def test_run_within_the_usual_latency_is_not_hedged(self):
+        self.hang = 0
+
+        await self.run_insight()
+
+        assert (self.requests, self.tier_stats().hedges) == (1, 0)
+        assert not await HedgeUsage.objects.aexists()
+
+    @override_settings(LLM_HEDGE_BUDGET=0)
+    async def test_hedges_stay_within_the_budget(self):
+        self.hang = 0.05
+
+        await self.run_insight()
+
+        assert (self.requests, self.tier_stats().hedges) == (1, 0)
+
+    async def test_user_is_charged_for_the_winning_request_only(self):
+        reading = await self.run_insight()
+
+        assert reading.status == ReadingStatusEnum.COMPLETED
+        profile = await UserProfile.objects.aget(user=self.user)
+        assert profile.available_tokens == DEFAULT_TOKENS - self.usage.total_tokens
+        # The first request was cut off in flight: only its prompt is estimated, apart from reported usage
+        await model_router.flush_hedge_usage()
+        loss = await HedgeUsage.objects.aget()
+        assert (loss.tier, loss.request_tokens, loss.response_tokens) == (ModelTierEnum.FAST, 0, 0)
+        assert (loss.cut_off, loss.estimated_tokens) == (True, self.usage.request_tokens)
+        tier_stats = self.tier_stats()
+        assert (tier_stats.hedges, tier_stats.hedge_wins, tier_stats.hedge_tokens) == (1, 1, 0)
+        assert tier_stats.hedge_estimated_tokens == self.usage.request_tokens
+
+    async def test_failure_to_record_the_loser_leaves_the_run_answered(self):
+        with (
+            mock.patch.object(HedgeUsage, "save", side_effect=DatabaseError("database is locked")),
+            self.assertLogs("tarot.model_router", "ERROR"),
+        ):
+            reading = await self.run_insight()
+            await model_router.flush_hedge_usage()
+
+        assert reading.status == ReadingStatusEnum.COMPLETED
+        assert self.requests == 2  # No fallback run on another tier
+        tier_stats = self.tier_stats()
+        assert (tier_stats.failures, tier_stats.hedges) == (0, 1)
+
+
+class EmptyDeckTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="seeker")
+        cls.reading = Reading.objects.create(user=cls.user, question="Will it rain?")
+
+    def setUp(self):
+        patcher = mock.patch.object(model_router, "get_model")
+        self.get_model = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_insight_fails_without_running_the_agent(self):
+        async with await reserve_tokens(self.user, reading_service.MIN_TOKEN_COST) as reservation:
+            assert await reading_service.run_insight(self.reading, reservation) == reading_service.EMPTY_DECK_ERROR
+
+        await self.reading.arefresh_from_db()
+        assert self.reading.status == ReadingStatusEnum.FAILED
+        assert (await UserProfile.objects.aget(user=self.user)).available_tokens == DEFAULT_TOKENS
+        self.get_model.assert_not_called()
+
+    async def test_stream_ends_with_an_error_event(self):
+        reservation = await reserve_tokens(self.user, reading_service.MIN_TOKEN_COST)
+
+        events = [event async for event in reading_service._insight_events(self.reading, reservation)]
+
+        assert events == [("error", {"detail": reading_service.EMPTY_DECK_ERROR})]
+        self.get_model.assert_not_called()
+
+
+class ValidationCacheTests(TestCase):
+    result = QuestionValidationResult(is_valid=True, reason=None, theme="love", spread_type="love_spread")
+
+    def test_key_ignores_case_and_punctuation(self):
+        assert validation_cache_key("Will I find love?!", "openai:gpt-4o-mini") == validation_cache_key(
+            "  will i   FIND love", "openai:gpt-4o-mini"
+        )
+
+    def test_key_depends_on_model_and_prompt_version(self):
+        key = validation_cache_key("Will I find love?", "openai:gpt-4o-mini")
+
+        assert validation_cache_key("Will I find love?", "openai:gpt-4o") != key
+        with mock.patch("tarot.validation_cache.VALIDATION_PROMPT_VERSION", "edited"):
+            assert validation_cache_key("Will I find love?", "openai:gpt-4o-mini") != key
+
+    def test_prompt_version_follows_the_system_prompt_and_the_result_type(self):
+        class Annotated(QuestionValidationResult):
+            note: str
+
+        assert prompt_version(SYSTEM_PROMPT, QuestionValidationResult) == VALIDATION_PROMPT_VERSION
+        assert prompt_version(SYSTEM_PROMPT + " Be brief.", QuestionValidationResult) != VALIDATION_PROMPT_VERSION
+        assert prompt_version(SYSTEM_PROMPT, Annotated) != VALIDATION_PROMPT_VERSION
+
+    def test_backends_must_implement_the_storage(self):
+        with pytest.raises(TypeError):
+            BaseValidationCache(ttl=60, max_entries=10)
+
+    async def test_memory_cache_evicts_least_recently_used(self):
+        cache = MemoryValidationCache(ttl=60, max_entries=2)
+        await cache.aset("a", self.result, 10)
+        await cache.aset("b", self.result, 10)
+        await cache.aget("a")
+        await cache.aset("c", self.result, 10)
+
+        assert await cache.aget("b") is None
+        assert await cache.aget("a") == self.result
+        assert cache.stats.tokens_saved == 20
+
+    async def test_database_cache_expires_entries(self):
+        cache = DatabaseValidationCache(ttl=0, max_entries=10)
+        await cache.aset("a", self.result, 10)
+
+        assert await cache.aget("a") is None
+        assert cache.stats.misses == 1
+
+    def test_database_cache_hit_and_set_take_one_query_each(self):
+        cache = DatabaseValidationCache(ttl=60, max_entries=10)
+
+        with self.assertNumQueries(1):
+            async_to_sync(cache.aset)("a", self.result, 10)
+        with self.assertNumQueries(1):
+            assert async_to_sync(cache.aget)("a") == self.result
+
+    @mock.patch("tarot.validation_cache.EVICT_EVERY", 3)
+    async def test_database_cache_evicts_least_recently_used_every_few_sets(self):
+        cache = DatabaseValidationCache(ttl=60, max_entries=1)
+        await cache.aset("a", self.result, 10)
+        await cache.aset("b", self.result, 10)
+        assert await cache.asize() == 2
+
+        await cache.aset("c", self.result, 10)
+
+        assert await cache.asize() == 1
+        assert await cache.aget("c") == self.result
+
+
+class QuestionPreValidationTests(TestCase):
+    # (question, mode, expected is_valid, expected theme)
+    cases = (
+        ("Will I find love this year?", PreValidationModeEnum.BALANCED, True, "love"),
+        ("Should I ask my boss for a promotion?", PreValidationModeEnum.BALANCED, True, "career"),
+        ("How can I get out of debt?", PreValidationModeEnum.BALANCED, True, "finances"),
+        ("What is my purpose in this universe?", PreValidationModeEnum.BALANCED, True, "spirituality"),
+        ("Should I change my workout routine?", PreValidationModeEnum.BALANCED, None, None),
+        ("Will I have a lovely time at the show tomorrow?", PreValidationModeEnum.BALANCED, None, None),
+        ("Is the show tomorrow about my job?", PreValidationModeEnum.BALANCED, None, None),
+        ("Should I move to another city?", PreValidationModeEnum.BALANCED, None, None),
+        ("Should I move to another city?", PreValidationModeEnum.AGGRESSIVE, True, "general"),
+        ("Will I find love this year?", PreValidationModeEnum.REJECT, None, None),
+        ("Will I find love this year?", PreValidationModeEnum.OFF, None, None),
+        ("", PreValidationModeEnum.BALANCED, False, None),
+        ("?!?!", PreValidationModeEnum.BALANCED, False, None),
+        ("aaaaaaaaaa", PreValidationModeEnum.REJECT, False, None),
+        ("Will I " + "x" * MAX_QUESTION_CHARACTERS, PreValidationModeEnum.BALANCED, False, None),
+    )
+
+    def test_pre_validate(self):
+        for question, mode, is_valid, theme in self.cases:
+            with self.subTest(question=question[:40], mode=mode):
+                result = QuestionValidator.pre_validate(question=question, mode=mode)
+
+                assert result.is_valid is is_valid
+                assert result.theme == theme
+                assert (result.reason is not None) == (is_valid is False)
+
+    def test_phrasings_match_whole_words_only(self):
+        assert QuestionValidator.validate_question(question="How to heal my heart?")
+        assert not QuestionValidator.validate_question(question="A show tomorrow")
+        assert not QuestionValidator.validate_question(question="Swill Island")
+
+    def test_themes_match_whole_words_only(self):
+        for question, theme in (
+            ("I am in a relationship", "love"),
+            ("our romantic partners", "love"),
+            ("a workout plan", None),
+            ("a lovely day", None),
+            ("investments going up", "finances"),
+            ("homework", None),
+            ("a spiritual path", "spirituality"),
+        ):
+            with self.subTest(question=question):
+                assert QuestionValidator.detect_theme(question=question) == theme
@@ -0,0 +1,189 @@
+import hashlib
+import re
+import threading
+import time
+import unicodedata
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .agents.tarot_support_agent import VALIDATION_PROMPT_VERSION, QuestionValidationResult
+from .models import ValidationCacheEntry
+
+_NON_WORD = re.compile(r"[\W_]+")
+TOUCH_INTERVAL = 60  # Seconds within which a hit on a database entry leaves its last use as is
+EVICT_EVERY = 100  # Sets per process between two evictions from the database cache
+
+
+def normalize_question(question: str) -> str:
+    """Fold case, punctuation and whitespace: "Will I find love?!" -> "will i find love"."""
+    return _NON_WORD.sub(" ", unicodedata.normalize("NFKC", question).casefold()).strip()
+
+
+def validation_cache_key(question: str, model_name: str) -> str:
+    """
+    Key of the validation of `question` by the support agent on `model_name` (the routed
+    tier's model); changing the model, the system prompt or the result type (see
+    `VALIDATION_PROMPT_VERSION`) bypasses the results cached for the old setup.
+    """
+    key = f"{model_name}:{VALIDATION_PROMPT_VERSION}:{normalize_question(question)}"
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    tokens_saved: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class BaseValidationCache(ABC):
+    """
+    TTL + LRU cache of `QuestionValidationResult`s.
+
+    Backends implement `_aget`, `aset`, `asize` and `aclear`; hit, miss and saved-token
+    counters are kept per process.
+    """
+
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+
+    async def aget(self, key: str) -> QuestionValidationResult | None:
+        cached = await self._aget(key)
+        if cached is None:
+            self.stats.misses += 1
+            return None
+
+        result, tokens = cached
+        self.stats.hits += 1
+        self.stats.tokens_saved += tokens
+        return result
+
+    @abstractmethod
+    async def _aget(self, key: str) -> tuple[QuestionValidationResult, int] | None: ...
+
+    @abstractmethod
+    async def aset(self, key: str, result: QuestionValidationResult, tokens: int) -> None: ...
+
+    @abstractmethod
+    async def asize(self) -> int: ...
+
+    @abstractmethod
+    async def aclear(self) -> None: ...
+
+
+class MemoryValidationCache(BaseValidationCache):
+    """In-process cache; each worker process keeps its own entries."""
+
+    def __init__(self, ttl: int, max_entries: int):
+        super().__init__(ttl, max_entries)
+        self._entries: OrderedDict[str, tuple[float, str, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def _aget(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, result, tokens = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return QuestionValidationResult.model_validate_json(result), tokens
+
+    async def aset(self, key, result, tokens):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, result.model_dump_json(), tokens)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def asize(self):
+        return len(self._entries)
+
+    async def aclear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DatabaseValidationCache(BaseValidationCache):
+    """
+    Cache shared by all processes, stored in the `ValidationCacheEntry` table.
+
+    A hit or a set is a single query. The LRU order is kept to `TOUCH_INTERVAL`, and the table
+    is trimmed every `EVICT_EVERY` sets of a process, so it may briefly exceed `max_entries`.
+    """
+
+    def __init__(self, ttl: int, max_entries: int):
+        super().__init__(ttl, max_entries)
+        self._sets = 0
+
+    async def _aget(self, key):
+        now = timezone.now()
+        entry = await ValidationCacheEntry.objects.filter(key=key, expires_at__gt=now).afirst()
+        if entry is None:
+            return None
+        if entry.last_used_at <= now - timedelta(seconds=TOUCH_INTERVAL):
+            await ValidationCacheEntry.objects.filter(id=entry.id).aupdate(last_used_at=now)
+        return QuestionValidationResult.model_validate(entry.result), entry.tokens
+
+    async def aset(self, key, result, tokens):
+        now = timezone.now()
+        entry = ValidationCacheEntry(
+            key=key,
+            result=result.model_dump(mode="json"),
+            tokens=tokens,
+            expires_at=now + timedelta(seconds=self.ttl),
+            last_used_at=now,
+        )
+        await ValidationCacheEntry.objects.abulk_create(
+            [entry],
+            update_conflicts=True,
+            unique_fields=["key"],
+            update_fields=["result", "tokens", "expires_at", "last_used_at"],
+        )
+
+        self._sets += 1
+        if self._sets % EVICT_EVERY == 0:
+            await self._aevict(now)
+
+    async def _aevict(self, now) -> None:
+        """Drop expired entries and the least recently used ones beyond `max_entries`."""
+        evicted = ValidationCacheEntry.objects.order_by("-last_used_at", "-id").values_list("id", flat=True)
+        evicted_ids = [entry_id async for entry_id in evicted[self.max_entries :]]
+        await ValidationCacheEntry.objects.filter(Q(expires_at__lte=now) | Q(id__in=evicted_ids)).adelete()
+
+    async def asize(self):
+        return await ValidationCacheEntry.objects.acount()
+
+    async def aclear(self):
+        await ValidationCacheEntry.objects.all().adelete()
+
+
+_cache: BaseValidationCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_validation_cache() -> BaseValidationCache | None:
+    """Return the configured validation cache, or None when `VALIDATION_CACHE_BACKEND` is empty."""
+    global _cache  # noqa: PLW0603
+    if _cache is None and settings.VALIDATION_CACHE_BACKEND:
+        with _cache_lock:
+            if _cache is None:
+                backend = import_string(settings.VALIDATION_CACHE_BACKEND)
+                _cache = backend(settings.VALIDATION_CACHE_TTL, settings.VALIDATION_CACHE_MAX_ENTRIES)
+    return _cache
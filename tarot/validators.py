@@ -1,7 +1,60 @@
 import random
 import re
+from dataclasses import dataclass
 
-from .enums import ReadingTypeEnum
+from .enums import PreValidationModeEnum, ReadingTypeEnum
+
+MAX_QUESTION_CHARACTERS = 500
+MIN_QUESTION_LETTERS = 3
+
+# Phrasings that make a question suitable for a reading, by kind; each only matches whole words
+QUESTION_PATTERNS = {
+    "personal": ("should i", "will i", "am i", "my future", "my path", "my destiny", "my life"),
+    "decision": ("should i do", "what choice", "which path", "which option", "what should i decide"),
+    "guidance": ("what does", "how can", "what can", "why is", "what is my purpose", "how to"),
+    "emotional": ("why do i feel", "why am i", "why can't i", "why does this keep happening"),
+    "spiritual": ("what does the universe", "what do the cards", "what is the energy", "what is happening"),
+}
+
+# Words of each theme, as regular expressions for their inflections ("lovely" is not about love)
+THEME_PATTERNS = {
+    "love": (
+        "lov(?:e|ed|es|ing)",
+        "relationships?",
+        "partners?",
+        "marriage",
+        "married",
+        "soulmates?",
+        "romance",
+        "romantic",
+        "crush(?:es)?",
+    ),
+    "career": ("careers?", "jobs?", "work(?:s|ing)?", "boss", "promotions?", "business(?:es)?"),
+    "finances": ("money", "finances?", "financial", "wealth", "debts?", "invest(?:s|ing|ments?)?"),
+    "health": ("health", "healthy", "healing", "illness(?:es)?"),
+    "spirituality": ("spirit(?:s|ual|uality)?", "souls?", "universe", "purpose", "destiny"),
+}
+
+
+def _words(patterns: tuple[str, ...]) -> str:
+    return "|".join(rf"\b(?:{pattern})\b" for pattern in patterns)
+
+
+# All pattern groups compiled into a single alternation, so matching is one pass over the question
+_QUESTION_MATCHER = re.compile("|".join(_words(patterns) for patterns in QUESTION_PATTERNS.values()))
+_THEME_MATCHER = re.compile("|".join(f"(?P<{theme}>{_words(patterns)})" for theme, patterns in THEME_PATTERNS.items()))
+_LETTERS = re.compile(r"[^\W\d_]+")
+_REPEATED_CHARACTER = re.compile(r"(\S)\1{4,}")
+
+
+@dataclass(frozen=True, slots=True)
+class PreValidation:
+    """Outcome of the local checks; `is_valid` is None when only the support agent can tell."""
+
+    is_valid: bool | None
+    reason: str | None = None
+    theme: str | None = None
+    spread_type: str | None = None
 
 
 class QuestionValidator:
@@ -13,31 +66,49 @@ class QuestionValidator:
         Validates the question based on multiple patterns to determine if it's
         suitable for a tarot reading.
         """
-        question = question.lower()
-
-        # Check for personal patterns
-        personal_patterns = r"should i|will i|am i|my future|my path|my destiny|my life"
-        if re.search(personal_patterns, question):
-            return True
-
-        # Check for decision-making intent
-        decision_patterns = r"should i do|what choice|which path|which option|what should i decide"
-        if re.search(decision_patterns, question):
-            return True
-
-        # Check for seeking guidance
-        guidance_patterns = r"what does|how can|what can|why is|what is my purpose|how to"
-        if re.search(guidance_patterns, question):
-            return True
-
-        # Check for emotional or existential questions
-        emotional_patterns = r"why do i feel|why am i|why can't i|why does this keep happening"
-        if re.search(emotional_patterns, question):
-            return True
-
-        # Check for open-ended spiritual inquiries
-        spiritual_patterns = r"what does the universe|what do the cards|what is the energy|what is happening"
-        return bool(re.search(spiritual_patterns, question))
+        return bool(_QUESTION_MATCHER.search(question.lower()))
+
+    @classmethod
+    def detect_theme(cls, *, question: str) -> str | None:
+        match = _THEME_MATCHER.search(question.lower())
+        return match.lastgroup if match else None
+
+    @classmethod
+    def rejection_reason(cls, *, question: str) -> str | None:
+        """Return why the question is clearly unusable (empty, oversized or nonsense), if it is."""
+        stripped = question.strip()
+        if not stripped:
+            return "The question is empty."
+        if len(stripped) > MAX_QUESTION_CHARACTERS:
+            return f"The question is longer than {MAX_QUESTION_CHARACTERS} characters."
+
+        letters = sum(len(word) for word in _LETTERS.findall(stripped))
+        visible = len(stripped) - stripped.count(" ")
+        if letters < MIN_QUESTION_LETTERS or letters * 2 < visible or _REPEATED_CHARACTER.search(stripped):
+            return "The question does not look like a question."
+        return None
+
+    @classmethod
+    def pre_validate(cls, *, question: str, mode: PreValidationModeEnum | str) -> PreValidation:
+        """
+        Decide locally on questions that are clearly invalid or, depending on `mode`, clearly valid.
+
+        Everything else is left undecided for the support agent.
+        """
+        mode = PreValidationModeEnum(mode)
+        if mode == PreValidationModeEnum.OFF:
+            return PreValidation(is_valid=None)
+
+        if reason := cls.rejection_reason(question=question):
+            return PreValidation(is_valid=False, reason=reason)
+        if mode == PreValidationModeEnum.REJECT or not cls.validate_question(question=question):
+            return PreValidation(is_valid=None)
+
+        theme = cls.detect_theme(question=question)
+        if theme is None and mode != PreValidationModeEnum.AGGRESSIVE:
+            return PreValidation(is_valid=None)
+
+        return PreValidation(is_valid=True, theme=theme or "general", spread_type=determine_spread_type(question))
 
 
 def determine_spread_type(question: str) -> str:
@@ -1,15 +1,52 @@
 from django.contrib import admin
 
-from .models import UserProfile
+from .models import DEFAULT_TOKENS, TokenHold, TokenTransaction, UserProfile
+from .tokens import reset_balances
 
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ("user", "available_tokens")  # Fields to display in list view
+    list_select_related = ("user",)
     search_fields = ("user__username", "user__email")  # Enable search by username and email
 
     actions = ["reset_tokens"]
 
     @admin.action(description="Reset tokens to default")
     def reset_tokens(self, request, queryset):
-        queryset.update(available_tokens=1_000)
+        reset_balances(queryset, DEFAULT_TOKENS, reference=f"admin reset by {request.user.username}")
+
+
+@admin.register(TokenTransaction)
+class TokenTransactionAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "user", "kind", "amount", "reference")
+    list_filter = ("kind",)
+    list_select_related = ("user",)
+    search_fields = ("user__username", "reference")
+
+    # The ledger is append-only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(TokenHold)
+class TokenHoldAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "user", "amount", "reference", "settled_at")
+    list_select_related = ("user",)
+    search_fields = ("user__username", "reference")
+
+    # Holds only change through commits and refunds, which keep them in step with the ledger
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
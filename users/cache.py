@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+
+# Cache alias of the snapshots, apart from the version stamps their churn would cull (see `CACHES`)
+PROFILES_CACHE = "profiles"
+
+
+def profile_snapshot_key(user_id: int) -> str:
+    return f"users:profile:{user_id}"
+
+
+async def aget_profile_snapshot(user_id: int) -> dict:
+    """
+    Return the `/users/me` payload of a user, cached for `PROFILE_SNAPSHOT_TTL` seconds.
+
+    The snapshot lives in the shared `profiles` cache (see `CACHES`), never in the process, so
+    a balance changed by the insight worker or the admin is dropped for every web worker.
+    On a miss the user and its profile are loaded in a single query.
+    """
+    key = profile_snapshot_key(user_id)
+    snapshot = await caches[PROFILES_CACHE].aget(key)
+    if snapshot is None:
+        user = await User.objects.select_related("profile").aget(pk=user_id)
+        snapshot = {
+            "username": user.username,
+            "is_authenticated": True,
+            "email": user.email,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "profile": {
+                "available_tokens": user.profile.available_tokens,
+                "preferences": user.profile.preferences,
+            },
+        }
+        await caches[PROFILES_CACHE].aset(key, snapshot, settings.PROFILE_SNAPSHOT_TTL)
+    return snapshot
+
+
+def invalidate_profile(*user_ids: int) -> None:
+    """Drop the cached snapshots from the shared cache, e.g. once a token balance or the preferences changed."""
+    caches[PROFILES_CACHE].delete_many([profile_snapshot_key(user_id) for user_id in user_ids])
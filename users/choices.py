@@ -0,0 +1,8 @@
+from django.utils.translation import gettext_lazy as _
+
+TOKEN_TRANSACTION_KIND_CHOICES = [
+    ("reserve", _("Reserve")),
+    ("charge", _("Charge")),
+    ("refund", _("Refund")),
+    ("grant", _("Grant")),
+]
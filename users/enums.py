@@ -0,0 +1,8 @@
+from enum import StrEnum
+
+
+class TokenTransactionKindEnum(StrEnum):
+    RESERVE = "reserve"  # Set aside before an agent run
+    CHARGE = "charge"  # Usage beyond the reserved tokens
+    REFUND = "refund"  # Reserved tokens returned after a failure
+    GRANT = "grant"  # Manual balance adjustment
@@ -3,6 +3,8 @@ from django.db import models
 
 from mentors.models import Mentor
 
+from .choices import TOKEN_TRANSACTION_KIND_CHOICES
+
 user = get_user_model()
 
 DEFAULT_TOKENS = 1_000
@@ -23,3 +25,38 @@ class UserProfile(models.Model):
 
     def __str__(self):
         return f"{self.user.username}'s profile"
+
+
+class TokenTransaction(models.Model):
+    """Append-only record of every change to a user's token balance."""
+
+    user = models.ForeignKey(user, on_delete=models.CASCADE, related_name="token_transactions")
+    kind = models.CharField(max_length=10, choices=TOKEN_TRANSACTION_KIND_CHOICES)
+    amount = models.IntegerField(help_text="Signed: negative for debits, positive for credits.")
+    reference = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            models.Index(fields=["user", "-created_at"], name="tokentx_user_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.amount:+d} for {self.user_id}"
+
+
+class TokenHold(models.Model):
+    """Tokens reserved for one operation, until they are committed or refunded."""
+
+    user = models.ForeignKey(user, on_delete=models.CASCADE, related_name="token_holds")
+    amount = models.PositiveIntegerField(help_text="Tokens still reserved.")
+    reference = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    settled_at = models.DateTimeField(null=True, blank=True, help_text="Set once nothing is reserved anymore.")
+
+    class Meta:
+        ordering = ["-created_at", "-id"]
+
+    def __str__(self):
+        return f"{self.amount} tokens held for {self.user_id}"
@@ -12,4 +12,4 @@ class UserSchema(Schema):
     email: str | None = None
     first_name: str | None = None
     last_name: str | None = None
-    profile: UserProfileSchema
+    profile: UserProfileSchema | None = None
@@ -1,11 +1,22 @@
+from functools import partial
+
 from django.contrib.auth.models import User
+from django.db import transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
+from .cache import invalidate_profile
 from .models import UserProfile
 
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
-    if created:
+    if created and not kwargs.get("raw"):
         UserProfile.objects.create(user=instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=UserProfile)
+def invalidate_profile_snapshot(sender, instance, **kwargs):
+    user_id = instance.pk if sender is User else instance.user_id
+    transaction.on_commit(partial(invalidate_profile, user_id), using=kwargs.get("using"))
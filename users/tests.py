@@ -1 +1,203 @@
-# Create your tests here.
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connections
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from .cache import PROFILES_CACHE, profile_snapshot_key
+from .enums import TokenTransactionKindEnum
+from .models import DEFAULT_TOKENS, TokenHold, TokenTransaction, UserProfile
+from .tokens import TokenReservation, reserve_tokens, reset_balances
+
+
+class TokenLedgerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="seeker")
+
+    async def balance(self) -> int:
+        return await UserProfile.objects.filter(user=self.user).values_list("available_tokens", flat=True).aget()
+
+    async def ledger(self) -> list[tuple[str, int]]:
+        transactions = TokenTransaction.objects.filter(user=self.user).order_by("id").values_list("kind", "amount")
+        return [transaction async for transaction in transactions]
+
+    async def test_reserve_debits_the_balance(self):
+        reservation = await reserve_tokens(self.user, 300, reference="reading")
+
+        hold = await TokenHold.objects.aget(id=reservation.id)
+        assert (hold.amount, hold.reference, hold.settled_at) == (300, "reading", None)
+        assert await self.balance() == DEFAULT_TOKENS - 300
+        assert await self.ledger() == [(TokenTransactionKindEnum.RESERVE, -300)]
+
+    async def test_insufficient_funds_reserve_nothing(self):
+        assert await reserve_tokens(self.user, DEFAULT_TOKENS + 1) is None
+
+        assert await self.balance() == DEFAULT_TOKENS
+        assert await self.ledger() == []
+        assert not await TokenHold.objects.aexists()
+
+    async def test_commit_charges_usage_beyond_the_reservation(self):
+        reservation = await reserve_tokens(self.user, 300)
+
+        await reservation.commit(450)
+
+        assert await self.balance() == DEFAULT_TOKENS - 450
+        assert await self.ledger() == [
+            (TokenTransactionKindEnum.RESERVE, -300),
+            (TokenTransactionKindEnum.CHARGE, -150),
+        ]
+
+    async def test_overage_charge_stops_at_an_empty_balance(self):
+        reservation = await reserve_tokens(self.user, 300)
+
+        await reservation.commit(DEFAULT_TOKENS + 200)
+
+        assert await self.balance() == 0
+        assert (await self.ledger())[-1] == (TokenTransactionKindEnum.CHARGE, -(DEFAULT_TOKENS - 300))
+
+    async def test_commit_within_the_reservation_keeps_it(self):
+        reservation = await reserve_tokens(self.user, 300)
+
+        await reservation.commit(100)
+
+        assert await self.balance() == DEFAULT_TOKENS - 300
+        hold = await TokenHold.objects.aget(id=reservation.id)
+        assert hold.amount == 0
+        assert hold.settled_at is not None
+
+    async def test_refund_returns_what_a_portion_left(self):
+        reservation = await reserve_tokens(self.user, 500)
+
+        await reservation.commit(200, portion=250)
+        await reservation.refund()
+
+        assert await self.balance() == DEFAULT_TOKENS - 250
+        assert (await self.ledger())[-1] == (TokenTransactionKindEnum.REFUND, 250)
+
+    async def test_settled_reservation_is_never_settled_again(self):
+        reservation = await reserve_tokens(self.user, 300, reference="insight:1")
+        await reservation.refund()
+        # A second handle on the same hold, e.g. built by a later attempt of a job
+        again = TokenReservation(id=reservation.id, user_id=self.user.id, amount=300, reference="insight:1")
+
+        await again.refund()
+        await again.commit(900)
+        await reservation.refund()
+
+        assert await self.balance() == DEFAULT_TOKENS
+        assert await self.ledger() == [(TokenTransactionKindEnum.RESERVE, -300), (TokenTransactionKindEnum.REFUND, 300)]
+
+    async def test_context_manager_refunds_on_exit(self):
+        reservation = await reserve_tokens(self.user, 300)
+
+        async with reservation:
+            assert await self.balance() == DEFAULT_TOKENS - 300
+
+        assert await self.balance() == DEFAULT_TOKENS
+
+    async def test_context_manager_refunds_on_exception(self):
+        reservation = await reserve_tokens(self.user, 300)
+
+        with pytest.raises(RuntimeError):
+            async with reservation:
+                raise RuntimeError
+
+        assert await self.balance() == DEFAULT_TOKENS
+
+    async def test_context_manager_keeps_committed_tokens(self):
+        reservation = await reserve_tokens(self.user, 300)
+
+        async with reservation:
+            await reservation.commit(300)
+
+        assert await self.balance() == DEFAULT_TOKENS - 300
+        assert await self.ledger() == [(TokenTransactionKindEnum.RESERVE, -300)]
+
+    def test_reserve_commit_and_exit_round_trips(self):
+        # One transaction (a savepoint within the test's) for the balance UPDATE and the ledger and hold INSERTs
+        with self.assertNumQueries(5):
+            reservation = async_to_sync(reserve_tokens)(self.user, 300)
+
+        async def settle():
+            async with reservation:
+                await reservation.commit(300)
+
+        with self.assertNumQueries(1):  # The hold's conditional UPDATE
+            async_to_sync(settle)()
+
+    def test_reset_balances_records_each_difference_as_a_grant(self):
+        other = User.objects.create_user(username="oracle")
+        UserProfile.objects.filter(user=self.user).update(available_tokens=400)
+
+        reset_balances(UserProfile.objects.all(), DEFAULT_TOKENS, reference="reset")
+
+        assert set(UserProfile.objects.values_list("available_tokens", flat=True)) == {DEFAULT_TOKENS}
+        assert list(TokenTransaction.objects.values_list("user", "kind", "amount", "reference")) == [
+            (self.user.id, TokenTransactionKindEnum.GRANT, DEFAULT_TOKENS - 400, "reset")
+        ]
+        assert not TokenTransaction.objects.filter(user=other).exists()
+
+
+class ProfileSnapshotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="seeker")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def available_tokens(self) -> int:
+        return self.client.get("/api/users/me").json()["profile"]["available_tokens"]
+
+    def test_snapshot_is_kept_in_the_shared_cache(self):
+        assert self.available_tokens() == DEFAULT_TOKENS
+        # Changed without the signal: only the snapshot's expiry would reveal it
+        UserProfile.objects.filter(user=self.user).update(available_tokens=1)
+
+        assert (
+            caches[PROFILES_CACHE].get(profile_snapshot_key(self.user.id))["profile"]["available_tokens"]
+            == DEFAULT_TOKENS
+        )
+        assert self.available_tokens() == DEFAULT_TOKENS
+
+    def test_token_movement_invalidates_the_snapshot(self):
+        assert self.available_tokens() == DEFAULT_TOKENS
+
+        with self.captureOnCommitCallbacks(execute=True):
+            async_to_sync(reserve_tokens)(self.user, 300)
+
+        assert caches[PROFILES_CACHE].get(profile_snapshot_key(self.user.id)) is None
+        assert self.available_tokens() == DEFAULT_TOKENS - 300
+
+    def test_balance_reset_invalidates_the_snapshot(self):
+        assert self.available_tokens() == DEFAULT_TOKENS
+
+        with self.captureOnCommitCallbacks(execute=True):
+            reset_balances(UserProfile.objects.filter(user=self.user), 10)
+
+        assert self.available_tokens() == 10
+
+
+class UserProfileAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username="admin")
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_changelist_queries_do_not_grow_with_the_profiles(self):
+        self.client.get(
+            "/admin/users/userprofile/"
+        )  # Loads what later requests take from a cache, such as the admin theme
+        with CaptureQueriesContext(connections["default"]) as one_row:
+            self.client.get("/admin/users/userprofile/")
+        for index in range(4):
+            User.objects.create_user(username=f"seeker-{index}")
+
+        with self.assertNumQueries(len(one_row)):
+            response = self.client.get("/admin/users/userprofile/")
+        assert response.context["cl"].result_count == 5
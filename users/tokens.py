@@ -0,0 +1,151 @@
+from dataclasses import dataclass
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F, QuerySet
+from django.utils import timezone
+
+from .cache import invalidate_profile
+from .enums import TokenTransactionKindEnum
+from .models import TokenHold, TokenTransaction, UserProfile
+
+
+def _debit(user_id: int, amount: int, kind: TokenTransactionKindEnum, reference: str, *, partial: bool) -> int:
+    """
+    Take `amount` tokens with a single conditional UPDATE and record the movement.
+
+    With `partial`, a balance below `amount` is emptied instead of left untouched.
+    Returns the number of tokens taken. Runs inside the caller's transaction.
+    """
+    profiles = UserProfile.objects.filter(user_id=user_id)
+    updated = profiles.filter(available_tokens__gte=amount).update(available_tokens=F("available_tokens") - amount)
+    taken = amount if updated else 0
+
+    if not taken and partial:
+        available = profiles.select_for_update().values_list("available_tokens", flat=True).first() or 0
+        taken = min(available, amount)
+        profiles.update(available_tokens=F("available_tokens") - taken)
+
+    if taken:
+        TokenTransaction.objects.create(user_id=user_id, kind=kind, amount=-taken, reference=reference)
+        transaction.on_commit(lambda: invalidate_profile(user_id))
+    return taken
+
+
+def _credit(user_id: int, amount: int, kind: TokenTransactionKindEnum, reference: str) -> None:
+    """Give `amount` tokens back and record the movement, inside the caller's transaction."""
+    UserProfile.objects.filter(user_id=user_id).update(available_tokens=F("available_tokens") + amount)
+    TokenTransaction.objects.create(user_id=user_id, kind=kind, amount=amount, reference=reference)
+    transaction.on_commit(lambda: invalidate_profile(user_id))
+
+
+def _release(hold_id: int, held: int, portion: int) -> bool:
+    """
+    Take `portion` off a hold still holding `held` tokens with a single conditional UPDATE,
+    settling it once empty.
+
+    Returns False when the hold was already settled or no longer holds `held` (another
+    process released from it concurrently), so that nothing is committed or refunded twice.
+    """
+    remaining = held - portion
+    return bool(
+        TokenHold.objects.filter(id=hold_id, settled_at__isnull=True, amount=held).update(
+            amount=remaining, settled_at=None if remaining else timezone.now()
+        )
+    )
+
+
+@sync_to_async
+def _reserve(user_id: int, amount: int, reference: str) -> int | None:
+    with transaction.atomic():
+        if not _debit(user_id, amount, TokenTransactionKindEnum.RESERVE, reference, partial=False):
+            return None
+        return TokenHold.objects.create(user_id=user_id, amount=amount, reference=reference).id
+
+
+@sync_to_async
+def _commit(reservation: "TokenReservation", used: int, portion: int) -> bool:
+    if used <= portion:
+        return _release(reservation.id, reservation.amount, portion)  # Nothing to charge on top: one statement
+    with transaction.atomic():
+        released = _release(reservation.id, reservation.amount, portion)
+        if released:
+            kind = TokenTransactionKindEnum.CHARGE
+            _debit(reservation.user_id, used - portion, kind, reservation.reference, partial=True)
+    return released
+
+
+@sync_to_async
+def _refund(reservation: "TokenReservation") -> None:
+    with transaction.atomic():
+        if _release(reservation.id, reservation.amount, reservation.amount):
+            kind = TokenTransactionKindEnum.REFUND
+            _credit(reservation.user_id, reservation.amount, kind, reservation.reference)
+
+
+@dataclass(slots=True)
+class TokenReservation:
+    """
+    Handle on the `TokenHold` of one operation.
+
+    Settle it with `commit` once the work succeeded; used as `async with reservation:`,
+    whatever is still reserved when the block exits (an error return, an exception) is
+    refunded automatically. The hold is the state: handles built for the same hold (e.g. by
+    every attempt of a job) never commit or refund the same tokens twice. The handle tracks
+    what it still holds, so settling a settled handle costs no query.
+    """
+
+    id: int | None  # The TokenHold
+    user_id: int
+    amount: int  # Tokens the hold still holds, as far as this handle knows
+    reference: str = ""
+
+    async def commit(self, used: int, portion: int | None = None) -> None:
+        """
+        Settle `portion` of the reservation (all of it by default) for work that used `used` tokens.
+
+        The reserved tokens are the minimum price; usage beyond them is charged on top, as far
+        as the balance allows. A settled reservation is not charged again.
+        """
+        if not self.amount:
+            return
+        portion = self.amount if portion is None else min(portion, self.amount)
+        released = await _commit(self, used, portion)
+        # A hold released elsewhere is left to the handle that released it
+        self.amount = self.amount - portion if released else 0
+
+    async def refund(self) -> None:
+        """Return the tokens still reserved."""
+        if not self.amount:
+            return
+        await _refund(self)
+        self.amount = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.refund()
+
+
+async def reserve_tokens(user: User, amount: int, reference: str = "") -> TokenReservation | None:
+    """Atomically set aside `amount` tokens; returns None when the balance is too low."""
+    hold_id = await _reserve(user.id, amount, reference)
+    return TokenReservation(id=hold_id, user_id=user.id, amount=amount, reference=reference) if hold_id else None
+
+
+def reset_balances(profiles: QuerySet[UserProfile], balance: int, reference: str = "") -> None:
+    """Set the balance of `profiles`, recording each difference as a grant."""
+    with transaction.atomic():
+        changes = list(
+            profiles.select_for_update().exclude(available_tokens=balance).values_list("user_id", "available_tokens")
+        )
+        UserProfile.objects.filter(user_id__in=[user_id for user_id, _ in changes]).update(available_tokens=balance)
+        TokenTransaction.objects.bulk_create(
+            TokenTransaction(
+                user_id=user_id, kind=TokenTransactionKindEnum.GRANT, amount=balance - tokens, reference=reference
+            )
+            for user_id, tokens in changes
+        )
+        transaction.on_commit(lambda: invalidate_profile(*(user_id for user_id, _ in changes)))